@@ -3,5 +3,16 @@
 # Run pre-start script
 bash /backend/bash_scripts/pre_start.sh
 
-# Run server
-python /backend/service/main.py
+# Remove metrics files of the previous run (multiprocess mode)
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+# Run development server with autoreload
+if [ "$BACKEND_RELOAD" = "1" ]; then
+    exec python /backend/service/main.py
+fi
+
+# Run server, exec replaces the shell, so gunicorn gets SIGTERM of the container
+exec gunicorn service.main:app -c /backend/gunicorn_conf.py
@@ -0,0 +1,434 @@
+"""
+Load test v1 API routes: requests per second and p50/p95/p99 latency per route
+
+Test DB (PSQL_TEST_DB_NAME) is seeded with the test factories, every route
+is loaded by `--concurrency` clients in-process (ASGI transport, no network)
+or over a local uvicorn. Results are compared with the stored baseline,
+exit code is `1` if any route regressed more than `--tolerance`.
+
+Run from `backend/`:
+    python -m benchmarks.api --mode inprocess --requests 500 --concurrency 20
+    python -m benchmarks.api --mode uvicorn --workers 2 --save-baseline
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple
+
+import httpx
+import orjson
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy_utils import create_database, database_exists, drop_database
+
+from db.models import BaseModel
+from service.core import settings
+from service.core.dependencies import get_session_factory
+from service.core.security import create_jwt_token, hash_password
+from service.main import app
+from tests import factories
+from tests.conftests import test_engine
+from tests.factories.utils import fake
+
+BASELINES_DIR = Path(__file__).parent / "baselines"
+PASSWORD = "benchmark-password"
+SEARCH_WORDS = ("people", "world", "system", "report", "million")
+
+
+class Dataset(NamedTuple):
+    """Seeded rows used to build requests"""
+
+    user_ids: List[int]
+    emails: List[str]
+    post_ids: List[int]
+    comment_ids: List[int]
+    headers: List[Dict[str, str]]
+
+
+class Scenario(NamedTuple):
+    """Route under load, `build` returns `httpx` request kwargs of the i-th request"""
+
+    name: str
+    method: str
+    build: Callable[[Dataset, int], Dict[str, Any]]
+
+
+def pick(values: List[Any], i: int) -> Any:
+    return values[i % len(values)]
+
+
+SCENARIOS = [
+    Scenario(
+        "POST /auth/access-token/",
+        "POST",
+        lambda data, i: {
+            "url": "/api/v1/auth/access-token/",
+            "data": {"email": pick(data.emails, i), "password": PASSWORD},
+        },
+    ),
+    Scenario(
+        "GET /user/me/",
+        "GET",
+        lambda data, i: {"url": "/api/v1/user/me/", "headers": pick(data.headers, i)},
+    ),
+    Scenario(
+        "GET /post/{post_id}",
+        "GET",
+        lambda data, i: {
+            "url": f"/api/v1/post/{random.choice(data.post_ids)}",
+            "headers": pick(data.headers, i),
+        },
+    ),
+    Scenario(
+        "GET /post/latest",
+        "GET",
+        lambda data, i: {
+            "url": "/api/v1/post/latest",
+            "headers": pick(data.headers, i),
+        },
+    ),
+    Scenario(
+        "GET /post/cursor/",
+        "GET",
+        lambda data, i: {
+            "url": "/api/v1/post/cursor/",
+            "headers": pick(data.headers, i),
+        },
+    ),
+    Scenario(
+        "GET /post/{post_id}/comments",
+        "GET",
+        lambda data, i: {
+            "url": f"/api/v1/post/{random.choice(data.post_ids)}/comments",
+            "headers": pick(data.headers, i),
+        },
+    ),
+    Scenario(
+        "GET /post/search",
+        "GET",
+        lambda data, i: {
+            "url": "/api/v1/post/search",
+            "params": {"q": pick(SEARCH_WORDS, i)},
+            "headers": pick(data.headers, i),
+        },
+    ),
+    Scenario(
+        "POST /post/",
+        "POST",
+        lambda data, i: {
+            "url": "/api/v1/post/",
+            "json": {"text": fake.text(max_nb_chars=500)},
+            "headers": pick(data.headers, i),
+        },
+    ),
+    Scenario(
+        "GET /comment/{comment_id}",
+        "GET",
+        lambda data, i: {
+            "url": f"/api/v1/comment/{random.choice(data.comment_ids)}",
+            "headers": pick(data.headers, i),
+        },
+    ),
+    Scenario(
+        "POST /comment/",
+        "POST",
+        lambda data, i: {
+            "url": "/api/v1/comment/",
+            "json": {
+                "text": fake.text(max_nb_chars=300),
+                "post_id": random.choice(data.post_ids),
+            },
+            "headers": pick(data.headers, i),
+        },
+    ),
+]
+
+
+def seed(users: int, posts: int, comments: int) -> Dataset:
+    """Create test DB and insert rows built by the test factories"""
+    if not database_exists(settings.PSQL_TEST_DB_URI):
+        create_database(settings.PSQL_TEST_DB_URI)
+    BaseModel.metadata.create_all(test_engine)
+    # Password is hashed once, verification cost is the same for all users
+    password_hash = hash_password(PASSWORD)
+    user_rows = [
+        factories.UserFactory.build(
+            email=f"benchmark-{i}@example.com", password=password_hash
+        )
+        for i in range(users)
+    ]
+    # Rows are read after commit to build requests
+    with Session(test_engine, expire_on_commit=False) as session:
+        session.add_all(user_rows)
+        session.flush()
+        user_ids = [user.id for user in user_rows]
+        post_rows = factories.PostFactory.build_batch(posts)
+        for post in post_rows:
+            post.user_id = random.choice(user_ids)
+        session.add_all(post_rows)
+        session.flush()
+        post_ids = [post.id for post in post_rows]
+        comment_rows = factories.CommentFactory.build_batch(comments)
+        for comment in comment_rows:
+            comment.creator_id = random.choice(user_ids)
+            comment.post_id = random.choice(post_ids)
+        session.add_all(comment_rows)
+        session.commit()
+    return Dataset(
+        user_ids=user_ids,
+        emails=[user.email for user in user_rows],
+        post_ids=post_ids,
+        comment_ids=[comment.id for comment in comment_rows],
+        headers=[
+            {"Authorization": f"Bearer {create_jwt_token(pk)}"} for pk in user_ids
+        ],
+    )
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    """Return RPS, error rate and latency percentiles in ms"""
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": errors / len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50": percentiles[49] * 1000,
+        "p95": percentiles[94] * 1000,
+        "p99": percentiles[98] * 1000,
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    dataset: Dataset,
+    requests: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    """Send `requests` requests by `concurrency` clients, measure each of them"""
+    latencies: List[float] = []
+    errors = 0
+    indexes = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        # Workers share the iterator, so every request is sent once
+        for i in indexes:
+            request = scenario.build(dataset, i)
+            started_at = time.perf_counter()
+            response = await client.request(scenario.method, **request)
+            latencies.append(time.perf_counter() - started_at)
+            if response.status_code >= 400:
+                errors += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started_at)
+
+
+async def run_scenarios(
+    client: httpx.AsyncClient,
+    scenarios: List[Scenario],
+    dataset: Dataset,
+    args: argparse.Namespace,
+) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for scenario in scenarios:
+        # Warm up caches, pools and prepared statements of the route
+        await run_scenario(client, scenario, dataset, args.warmup, args.concurrency)
+        results[scenario.name] = await run_scenario(
+            client, scenario, dataset, args.requests, args.concurrency
+        )
+        print_result(scenario.name, results[scenario.name])
+    return results
+
+
+async def run_inprocess(
+    scenarios: List[Scenario], dataset: Dataset, args: argparse.Namespace
+) -> Dict[str, Dict[str, Any]]:
+    """Run the app in this process with a pooled engine of the test DB"""
+    engine = create_async_engine(
+        settings.PSQL_TEST_ASYNC_DB_URI,
+        pool_size=settings.PSQL_POOL_SIZE,
+        max_overflow=settings.PSQL_POOL_MAX_OVERFLOW,
+    )
+    session_factory = async_sessionmaker(
+        bind=engine, autoflush=False, expire_on_commit=False
+    )
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            return await run_scenarios(client, scenarios, dataset, args)
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+
+
+def start_uvicorn(port: int, workers: int) -> subprocess.Popen:
+    """Start uvicorn serving the test DB and wait until it responds"""
+    env = {
+        **os.environ,
+        "PSQL_DB_NAME": settings.PSQL_TEST_DB_NAME,
+        "RATE_LIMIT_ENABLED": "false",
+    }
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "service.main:app",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+        "--log-level",
+        "warning",
+    ]
+    server = subprocess.Popen(command, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("uvicorn didn't start in 30 seconds")
+
+
+async def run_uvicorn(
+    scenarios: List[Scenario], dataset: Dataset, args: argparse.Namespace
+) -> Dict[str, Dict[str, Any]]:
+    """Run the app in uvicorn workers, requests go over local TCP"""
+    server = start_uvicorn(args.port, args.workers)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=30
+        ) as client:
+            return await run_scenarios(client, scenarios, dataset, args)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def print_result(name: str, result: Dict[str, Any]) -> None:
+    print(
+        f"{name:<32} {result['requests']:>8} {result['errors']:>7} "
+        f"{result['rps']:>9.1f} {result['p50']:>9.1f} "
+        f"{result['p95']:>9.1f} {result['p99']:>9.1f}"
+    )
+
+
+def get_baseline_path(mode: str) -> Path:
+    return BASELINES_DIR / f"api_{mode}.json"
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float,
+) -> List[str]:
+    """Return regressions of p95 latency, RPS and error rate"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["p95"] > base["p95"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {result['p95']:.1f} ms, baseline {base['p95']:.1f} ms"
+            )
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['rps']:.1f} RPS, baseline {base['rps']:.1f} RPS"
+            )
+        if result["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(
+                f"{name}: {result['error_rate']:.1%} errors, "
+                f"baseline {base['error_rate']:.1%}"
+            )
+    return regressions
+
+
+def run(args: argparse.Namespace) -> int:
+    scenarios = [
+        scenario
+        for scenario in SCENARIOS
+        if not args.routes or any(route in scenario.name for route in args.routes)
+    ]
+    # Limits would reject the load of one client
+    settings.RATE_LIMIT_ENABLED = False
+    dataset = seed(args.users, args.posts, args.comments)
+    print(
+        f"{args.mode}, concurrency {args.concurrency}, "
+        f"{args.requests} requests per route (latency in ms)"
+    )
+    print(
+        f"{'route':<32} {'requests':>8} {'errors':>7} {'RPS':>9} "
+        f"{'p50':>9} {'p95':>9} {'p99':>9}"
+    )
+    runner = run_inprocess if args.mode == "inprocess" else run_uvicorn
+    try:
+        results = asyncio.run(runner(scenarios, dataset, args))
+    finally:
+        test_engine.dispose()
+        if not args.keep_data:
+            drop_database(settings.PSQL_TEST_DB_URI)
+
+    baseline_path = args.baseline or get_baseline_path(args.mode)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+        print(f"Baseline is saved to {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"No baseline {baseline_path}, run with --save-baseline to create it")
+        return 0
+    regressions = compare(
+        results, orjson.loads(baseline_path.read_bytes()), args.tolerance
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--requests", type=int, default=500, help="Per route")
+    parser.add_argument("--warmup", type=int, default=20, help="Per route")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--port", type=int, default=8765, help="uvicorn port")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=10000)
+    parser.add_argument(
+        "--routes", nargs="*", help="Run routes containing any of these strings"
+    )
+    parser.add_argument("--baseline", type=Path, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed regression (0.2 = 20%%)"
+    )
+    parser.add_argument(
+        "--keep-data", action="store_true", help="Don't drop the test DB"
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(run(get_parser().parse_args()))
@@ -0,0 +1,115 @@
+"""
+Compare JWT verification cost per request: `jose.jwt.decode` vs `JWTCodec`
+
+Run from `backend/`: python -m benchmarks.auth --number 5000
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Callable
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwt
+
+from service.core import settings
+from service.core.dependencies import get_access_token, get_jwt_token
+from service.core.security import JWTCodec, create_jwt_token
+from service.schemas import v1 as schemas_v1
+
+
+def get_pem_keys(private_key) -> tuple[str, str]:
+    """Return private and public PEM keys"""
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem.decode(), public_pem.decode()
+
+
+def get_codecs(cache_size: int) -> dict[str, JWTCodec]:
+    """Build codecs for all supported algorithm families"""
+    es_private, es_public = get_pem_keys(ec.generate_private_key(ec.SECP256R1()))
+    rs_private, rs_public = get_pem_keys(
+        rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    )
+    return {
+        "HS256": JWTCodec(algorithm="HS256", cache_size=cache_size),
+        "ES256": JWTCodec(
+            algorithm="ES256",
+            private_key=es_private,
+            public_key=es_public,
+            cache_size=cache_size,
+        ),
+        "RS256": JWTCodec(
+            algorithm="RS256",
+            private_key=rs_private,
+            public_key=rs_public,
+            cache_size=cache_size,
+        ),
+    }
+
+
+def measure(name: str, verify: Callable[[], object], number: int) -> None:
+    """Print verification time per request"""
+    started_at = time.perf_counter()
+    for _ in range(number):
+        verify()
+    elapsed = time.perf_counter() - started_at
+    print(f"{name:<40} {elapsed / number * 1e6:>10.1f} us")
+
+
+def measure_dependency(number: int) -> None:
+    """Print `get_jwt_token` + `get_access_token` time per request (app settings)"""
+    token = create_jwt_token(1)
+
+    async def run_dependency() -> float:
+        started_at = time.perf_counter()
+        for _ in range(number):
+            await get_access_token(await get_jwt_token(token))
+        return time.perf_counter() - started_at
+
+    elapsed = asyncio.run(run_dependency())
+    name = f"auth dependency ({settings.HASH_ALGORITHM}, cached)"
+    print(f"{name:<40} {elapsed / number * 1e6:>10.1f} us")
+
+
+def run(number: int) -> None:
+    claims = {"pk": "1", "type": "access", "exp": int(time.time()) + 3600}
+    print(f"{'verifier':<40} {'per request':>13}")
+    hs_token = jwt.encode(claims, settings.SECRET_KEY, algorithm="HS256")
+
+    def decode_with_jose() -> schemas_v1.JWTTokenPayload:
+        # Verification before `JWTCodec`: key is built for every token
+        payload = jwt.decode(hs_token, settings.SECRET_KEY, algorithms=["HS256"])
+        return schemas_v1.JWTTokenPayload(pk=payload["pk"], type=payload["type"])
+
+    measure("HS256: jose.jwt.decode + payload", decode_with_jose, number)
+
+    uncached_codecs = get_codecs(cache_size=0)
+    cached_codecs = get_codecs(cache_size=settings.JWT_CACHE_SIZE)
+    for algorithm, codec in uncached_codecs.items():
+        token = codec.encode(claims)
+        measure(
+            f"{algorithm}: JWTCodec without cache", lambda: codec.decode(token), number
+        )
+        cached_codec = cached_codecs[algorithm]
+        cached_token = cached_codec.encode(claims)
+        measure(
+            f"{algorithm}: JWTCodec with cache",
+            lambda: cached_codec.decode(cached_token),
+            number,
+        )
+    measure_dependency(number)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=5000)
+    args = parser.parse_args()
+    run(args.number)
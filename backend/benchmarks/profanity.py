@@ -0,0 +1,73 @@
+"""
+Compare profanity checks: better_profanity vs compiled `ProfanityMatcher`
+
+Run from `backend/`: python -m benchmarks.profanity --texts 100
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from better_profanity import profanity
+from faker import Factory
+
+from service.moderation import ProfanityMatcher
+
+fake = Factory.create()
+SWEAR_WORDS = ("bitch", "sh1t", "a$$hole", "fvck", "bull shit")
+
+
+def get_texts(count: int, length: int, swear_ratio: float) -> List[str]:
+    """Generate texts, part of them has a swear word inside"""
+    texts = []
+    for _ in range(count):
+        text = fake.text(max_nb_chars=length)
+        if random.random() < swear_ratio:
+            words = text.split()
+            words.insert(random.randint(0, len(words)), random.choice(SWEAR_WORDS))
+            text = " ".join(words)
+        texts.append(text)
+    return texts
+
+
+def measure(name: str, check: Callable[[str], bool], texts: List[str]) -> List[bool]:
+    """Run check for all texts and print time per text"""
+    started_at = time.perf_counter()
+    verdicts = [check(text) for text in texts]
+    elapsed = time.perf_counter() - started_at
+    print(
+        f"{name:<28} {elapsed * 1000:>10.1f} ms {elapsed / len(texts) * 1e6:>10.1f} us"
+    )
+    return verdicts
+
+
+def run(count: int, length: int, swear_ratio: float) -> None:
+    random.seed(0)
+    fake.seed_instance(0)
+    texts = get_texts(count, length, swear_ratio)
+
+    started_at = time.perf_counter()
+    profanity.load_censor_words()
+    print(f"better_profanity load: {(time.perf_counter() - started_at) * 1000:.1f} ms")
+    started_at = time.perf_counter()
+    matcher = ProfanityMatcher()
+    print(f"matcher compile:       {(time.perf_counter() - started_at) * 1000:.1f} ms")
+
+    print(f"{'check':<28} {'total':>13} {'per text':>13}")
+    expected = measure("better_profanity", profanity.contains_profanity, texts)
+    verdicts = measure("matcher (no cache)", matcher.match, texts)
+    measure("matcher (cold cache)", matcher.contains_profanity, texts)
+    measure("matcher (memoized)", matcher.contains_profanity, texts)
+
+    mismatches = sum(a != b for a, b in zip(expected, verdicts))
+    print(f"flagged: {sum(verdicts)}/{count}, verdict mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=100)
+    parser.add_argument("--length", type=int, default=1000)
+    parser.add_argument("--swear-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+    run(args.texts, args.length, args.swear_ratio)
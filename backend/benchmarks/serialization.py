@@ -0,0 +1,125 @@
+"""
+Compare response encoding: FastAPI `response_model` path vs prebuilt serializers
+
+Run from `backend/`: python -m benchmarks.serialization --number 20000
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Iterable
+
+import orjson
+from fastapi.responses import JSONResponse, ORJSONResponse, UJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from db import models
+from db.utils import get_default_now
+from service.core.serializers import Serializer, comment_serializer, post_serializer
+from service.schemas import v1 as schemas_v1
+
+
+def get_objects() -> tuple[models.Post, models.Comment]:
+    """Build post and comment like they are loaded from DB"""
+    now = get_default_now()
+    user = models.User(id=1, email="user@example.com", name="User", created_at=now)
+    post = models.Post(
+        id=1,
+        user_id=user.id,
+        user=user,
+        text="post text " * 100,
+        is_blocked=False,
+        is_pending=False,
+        created_at=now,
+        updated_at=now,
+    )
+    comment = models.Comment(
+        id=1,
+        creator_id=user.id,
+        post_id=post.id,
+        user=user,
+        post=post,
+        text="comment text " * 75,
+        is_blocked=False,
+        is_pending=False,
+        created_at=now,
+        updated_at=now,
+    )
+    return post, comment
+
+
+def measure(
+    name: str, encode: Callable[[Any], Awaitable[bytes]], obj: Any, number: int
+):
+    """Print encoding time per response (all encodings run in one event loop)"""
+
+    async def run_encoder() -> float:
+        started_at = time.perf_counter()
+        for _ in range(number):
+            await encode(obj)
+        return time.perf_counter() - started_at
+
+    elapsed = asyncio.run(run_encoder())
+    print(f"{name:<40} {elapsed / number * 1e6:>10.1f} us")
+
+
+def get_fastapi_encoder(schema: Any, response_class: type) -> Callable:
+    """Validate and encode object like FastAPI does for `response_model`"""
+    field = create_response_field(name=f"Response_{schema.__name__}", type_=schema)
+
+    async def encode(obj: Any) -> bytes:
+        content = await serialize_response(field=field, response_content=obj)
+        return response_class(content).body
+
+    return encode
+
+
+def get_serializer_encoder(
+    serializer: Serializer, expand: Iterable[str] = ()
+) -> Callable:
+    """Encode object with prebuilt serializer"""
+
+    async def encode(obj: Any) -> bytes:
+        return serializer.dump_json(obj, expand)
+
+    return encode
+
+
+def run(number: int) -> None:
+    post, comment = get_objects()
+    print(f"{'encoder':<40} {'per response':>13}")
+    for name, schema, serializer, expand, obj in (
+        ("Post", schemas_v1.Post, post_serializer, (), post),
+        (
+            "Comment",
+            schemas_v1.Comment,
+            comment_serializer,
+            models.Comment.EXPAND_FIELDS,
+            comment,
+        ),
+    ):
+        # Both paths must return the same JSON (comment with expanded post and user)
+        expected = asyncio.run(get_fastapi_encoder(schema, ORJSONResponse)(obj))
+        actual = serializer.dump_json(obj, expand)
+        assert orjson.loads(actual) == orjson.loads(expected)
+        for response_class in (JSONResponse, UJSONResponse, ORJSONResponse):
+            measure(
+                f"{name}: response_model + {response_class.__name__}",
+                get_fastapi_encoder(schema, response_class),
+                obj,
+                number,
+            )
+        measure(
+            f"{name}: prebuilt serializer",
+            get_serializer_encoder(serializer, expand),
+            obj,
+            number,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.number)
@@ -0,0 +1,71 @@
+import argparse
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from sqlalchemy import Date, cast, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from db import models
+from db.session import DBSession
+
+logging.basicConfig(format="%(levelname)s:    %(message)s", level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def rebuild_comment_stats(
+    session: Session, date_from: Optional[date] = None, date_to: Optional[date] = None
+) -> int:
+    """Rebuild comments daily rollup in the session transaction, return days count"""
+    day = cast(models.Comment.created_at, Date)
+    stats_filters = []
+    comment_filters = []
+    # Range on `created_at` itself, so `ix_comment_created_at` is used
+    if date_from:
+        stats_filters.append(models.CommentDailyStats.date >= date_from)
+        comment_filters.append(
+            models.Comment.created_at >= datetime.combine(date_from, time.min)
+        )
+    if date_to:
+        stats_filters.append(models.CommentDailyStats.date <= date_to)
+        comment_filters.append(
+            models.Comment.created_at
+            < datetime.combine(date_to + timedelta(days=1), time.min)
+        )
+
+    counts_query = (
+        select(
+            day,
+            func.count(models.Comment.id).filter(models.Comment.is_blocked),
+            func.count(models.Comment.id).filter(~models.Comment.is_blocked),
+            func.timezone("utc", func.now()),
+        )
+        .where(*comment_filters)
+        .group_by(day)
+    )
+    insert_query = insert(models.CommentDailyStats).from_select(
+        ["date", "blocked_count", "unblocked_count", "created_at"], counts_query
+    )
+
+    session.execute(delete(models.CommentDailyStats).where(*stats_filters))
+    return session.execute(insert_query).rowcount
+
+
+def backfill_comment_stats(
+    date_from: Optional[date] = None, date_to: Optional[date] = None
+) -> None:
+    """Rebuild comments daily rollup from the comment table (in one transaction)"""
+    logger.info("Rebuilding comments daily stats")
+    with DBSession() as session:
+        days = rebuild_comment_stats(session, date_from, date_to)
+        session.commit()
+    logger.info(f"{days} days were rebuilt")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=backfill_comment_stats.__doc__)
+    parser.add_argument("--date-from", type=date.fromisoformat, default=None)
+    parser.add_argument("--date-to", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+    backfill_comment_stats(args.date_from, args.date_to)
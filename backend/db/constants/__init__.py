@@ -1,5 +1,11 @@
 from .constants import PASSWORD_MAX, PASSWORD_MIN
-from .post import MAX_LENGTH_TEXT
+from .post import MAX_LENGTH_TEXT, SEARCH_CONFIG
 from .user import JWTType
 
-__all__ = ("PASSWORD_MIN", "PASSWORD_MAX", "JWTType", "MAX_LENGTH_TEXT")
+__all__ = (
+    "PASSWORD_MIN",
+    "PASSWORD_MAX",
+    "JWTType",
+    "MAX_LENGTH_TEXT",
+    "SEARCH_CONFIG",
+)
@@ -1 +1,3 @@
 MAX_LENGTH_TEXT = 1000
+# Text search configuration of `search_vector` columns and search queries
+SEARCH_CONFIG = "english"
@@ -1,7 +1,7 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 from sqlalchemy import (Delete, Select, Update, and_, delete, func, select,
-                        update)
+                        tuple_, update)
 
 
 class BaseRetrieveMixin:
@@ -17,8 +17,15 @@ class BaseRetrieveMixin:
         return base_query
 
     @classmethod
-    def _get_one(cls, fields: list = None, filters: list = None, **kwargs) -> Select:
-        """Build and return DB query for getting one instance"""
+    def _get_one(
+        cls, fields: list = None, filters: list = None, load: list = None, **kwargs
+    ) -> Select:
+        """
+        Build and return DB query for getting one instance
+
+        `load` is a list of loader options (`joinedload`, `load_only`, ...),
+        relationships aren't loaded without them
+        """
         base_query = (
             select(cls)
             if not fields
@@ -28,11 +35,18 @@ class BaseRetrieveMixin:
             base_query = base_query.filter_by(**kwargs)
         if filters:
             base_query = base_query.where(*filters)
+        if load:
+            base_query = base_query.options(*load)
         return base_query
 
     @classmethod
     def _get_all(
-        cls, fields: list = None, filters: list = None, order_by: list = None, **kwargs
+        cls,
+        fields: list = None,
+        filters: list = None,
+        order_by: list = None,
+        load: list = None,
+        **kwargs,
     ) -> Select:
         """Build and return DB query for getting all instances"""
         base_query = (
@@ -46,8 +60,35 @@ class BaseRetrieveMixin:
             base_query = base_query.where(*filters)
         if order_by:
             base_query = base_query.order_by(*order_by)
+        if load:
+            base_query = base_query.options(*load)
         return base_query
 
+    @classmethod
+    def _get_page(
+        cls,
+        limit: int,
+        after: Optional[Tuple] = None,
+        filters: list = None,
+        load: list = None,
+        **kwargs,
+    ) -> Select:
+        """
+        Build and return DB query for keyset pagination (newest first)
+
+        Rows are ordered by (created_at, id), `after` is a (created_at, id)
+        of the last row from the previous page
+        """
+        base_query = cls._get_all(
+            filters=filters,
+            order_by=[cls.created_at.desc(), cls.id.desc()],
+            load=load,
+            **kwargs,
+        )
+        if after:
+            base_query = base_query.where(tuple_(cls.created_at, cls.id) < after)
+        return base_query.limit(limit)
+
 
 class BaseUpdateMixin:
     @classmethod
@@ -80,17 +121,38 @@ class BaseCRUD(BaseRetrieveMixin, BaseUpdateMixin, BaseDeleteMixin):
         return super()._exists(filters=filters, **kwargs)
 
     @classmethod
-    def get_one(cls, fields: list = None, filters: list = None, **kwargs) -> Select:
+    def get_one(
+        cls, fields: list = None, filters: list = None, load: list = None, **kwargs
+    ) -> Select:
         """Execute DB query and return one instance or None"""
-        return super()._get_one(fields=fields, filters=filters, **kwargs)
+        return super()._get_one(fields=fields, filters=filters, load=load, **kwargs)
 
     @classmethod
     def get_all(
-        cls, fields: list = None, filters: list = None, order_by: list = None, **kwargs
+        cls,
+        fields: list = None,
+        filters: list = None,
+        order_by: list = None,
+        load: list = None,
+        **kwargs,
     ) -> Select:
         """Build and return DB query for getting all instances"""
         return super()._get_all(
-            fields=fields, filters=filters, order_by=order_by, **kwargs
+            fields=fields, filters=filters, order_by=order_by, load=load, **kwargs
+        )
+
+    @classmethod
+    def get_page(
+        cls,
+        limit: int,
+        after: Optional[Tuple] = None,
+        filters: list = None,
+        load: list = None,
+        **kwargs,
+    ) -> Select:
+        """Build and return DB query for getting one page by keyset"""
+        return super()._get_page(
+            limit=limit, after=after, filters=filters, load=load, **kwargs
         )
 
     @classmethod
@@ -0,0 +1,45 @@
+from typing import Any, Dict, List
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from service.core import settings
+
+
+async def bulk_insert(
+    session: AsyncSession, model: Any, rows: List[Dict[str, Any]]
+) -> List[int]:
+    """
+    Insert rows and return their ids in the same order
+
+    Rows must have values of all columns (ORM defaults aren't applied by COPY).
+    Small batches use multi-row INSERT ... RETURNING, big ones use COPY
+    """
+    if not rows:
+        return []
+    if len(rows) >= settings.BULK_COPY_MIN_ITEMS:
+        return await copy_insert(session, model, rows)
+    # Rows are sent as multi-row INSERT statements (up to 1000 rows each),
+    # ids are returned in rows order
+    insert_query = insert(model).returning(model.id, sort_by_parameter_order=True)
+    return list((await session.scalars(insert_query, rows)).all())
+
+
+async def copy_insert(
+    session: AsyncSession, model: Any, rows: List[Dict[str, Any]]
+) -> List[int]:
+    """Reserve ids from the table sequence and COPY rows in session transaction"""
+    table = model.__table__
+    sequence = func.pg_get_serial_sequence(table.name, model.id.key)
+    ids_query = select(func.nextval(sequence)).select_from(
+        func.generate_series(1, len(rows))
+    )
+    ids = list((await session.scalars(ids_query)).all())
+    columns = [model.id.key, *rows[0]]
+    records = [(pk, *row.values()) for pk, row in zip(ids, rows)]
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        table.name, records=records, columns=columns
+    )
+    return ids
@@ -0,0 +1,319 @@
+"""
+EXPLAIN hot queries of the API and flag sequential scans
+
+Queries are built with `BaseCRUD` and controllers helpers, so the plans are
+the ones the API gets. Small tables are always scanned sequentially,
+seed a dataset first or use `--no-seqscan` to find queries without any
+usable index.
+
+Seeded rows are rolled back after the run (`--commit` keeps them), seeding
+needs an explicit `--database-url`, so rows never go to the app DB by mistake.
+
+Run from `backend/`:
+python db/index_advisor.py --database-url postgresql://... --seed-posts 100000
+"""
+
+import argparse
+import logging
+import sys
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, Iterator, List, Tuple
+
+from sqlalchemy import Executable, NullPool, create_engine, text
+from sqlalchemy.orm import Session
+
+from db import models
+from db.backfill_comment_stats import rebuild_comment_stats
+from db.utils import get_default_now
+from service.controllers.v1.comment.utils import (
+    get_comment_subtree_ids_query,
+    get_comment_tree_query,
+    get_daily_counts_query,
+)
+from service.core import settings
+from service.core.search import get_search_query
+
+logging.basicConfig(format="%(levelname)s:    %(message)s", level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 51
+
+SEED_USERS_QUERY = text(
+    """
+    INSERT INTO "user" (email, password, name, created_at)
+    SELECT 'seed-' || gen_random_uuid() || '@example.com', 'seed', 'Seed user', now()
+    FROM generate_series(1, :count)
+    """
+)
+SEED_POSTS_QUERY = text(
+    """
+    WITH users AS (SELECT array_agg(id) AS ids FROM "user")
+    INSERT INTO post (user_id, text, is_blocked, is_pending, created_at, updated_at)
+    SELECT
+        ids[1 + floor(random() * array_length(ids, 1))::int],
+        repeat(md5(g::text), 20),
+        random() < 0.05,
+        false,
+        now() - random() * interval '365 days',
+        now()
+    FROM users, generate_series(1, :count) AS g
+    """
+)
+SEED_COMMENTS_QUERY = text(
+    """
+    WITH
+        users AS (SELECT array_agg(id) AS ids FROM "user"),
+        posts AS (SELECT array_agg(id) AS ids FROM post)
+    INSERT INTO comment (
+        creator_id, post_id, text, is_blocked, is_pending, created_at, updated_at
+    )
+    SELECT
+        users.ids[1 + floor(random() * array_length(users.ids, 1))::int],
+        posts.ids[1 + floor(random() * array_length(posts.ids, 1))::int],
+        repeat(md5(g::text), 10),
+        random() < 0.05,
+        false,
+        now() - random() * interval '365 days',
+        now()
+    FROM users, posts, generate_series(1, :count) AS g
+    """
+)
+# Every second seeded comment becomes a reply to a root comment of its post
+SEED_REPLIES_QUERY = text(
+    """
+    UPDATE comment AS reply SET parent_comment_id = (
+        SELECT root.id FROM comment AS root
+        WHERE root.post_id = reply.post_id
+            AND root.id < reply.id
+            AND root.parent_comment_id IS NULL
+        ORDER BY root.id DESC
+        LIMIT 1
+    )
+    WHERE reply.id % 2 = 0 AND reply.parent_comment_id IS NULL
+    """
+)
+
+
+def seed_dataset(session: Session, users: int, posts: int, comments: int) -> None:
+    """Insert random rows, rebuild comments rollup and ANALYZE (not committed)"""
+    for name, query, count in (
+        ("users", SEED_USERS_QUERY, users),
+        ("posts", SEED_POSTS_QUERY, posts),
+        ("comments", SEED_COMMENTS_QUERY, comments),
+    ):
+        if count:
+            logger.info(f"Seeding {count} {name}")
+            session.execute(query, {"count": count})
+    if comments:
+        session.execute(SEED_REPLIES_QUERY)
+    rebuild_comment_stats(session)
+    # Planner statistics are transactional as well, plans of the same
+    # transaction see seeded rows
+    session.execute(text("ANALYZE"))
+
+
+def get_sample(session: Session) -> Dict[str, Any]:
+    """Return ids of existing rows used as query parameters"""
+    sample_query = models.Comment.get_all(
+        fields=["id", "creator_id", "post_id", "created_at"],
+        order_by=[models.Comment.id.desc()],
+    ).limit(1)
+    row = session.execute(sample_query).first()
+    if row is None:
+        return {
+            "comment_id": 1,
+            "user_id": 1,
+            "post_id": 1,
+            "created_at": get_default_now(),
+        }
+    return {
+        "comment_id": row.id,
+        "user_id": row.creator_id,
+        "post_id": row.post_id,
+        "created_at": row.created_at,
+    }
+
+
+def get_hot_queries(sample: Dict[str, Any]) -> Dict[str, Executable]:
+    """Build queries run by the API (and FK cascades) for sample rows"""
+    post_id, user_id = sample["post_id"], sample["user_id"]
+    comment_id, created_at = sample["comment_id"], sample["created_at"]
+    day_start = datetime.combine(created_at.date(), time.min)
+    return {
+        "post by id": models.Post.get_one(id=post_id, load=[models.Post.load_user()]),
+        "posts page": models.Post.get_page(
+            limit=PAGE_SIZE, load=[models.Post.load_user()]
+        ),
+        "posts page after cursor": models.Post.get_page(
+            limit=PAGE_SIZE, after=(created_at, post_id)
+        ),
+        "unblocked posts page": models.Post.get_page(
+            limit=PAGE_SIZE, filters=[~models.Post.is_blocked]
+        ),
+        "user posts page": models.Post.get_page(limit=PAGE_SIZE, user_id=user_id),
+        "update own post": models.Post.update(
+            new_data={"text": "text"}, id=post_id, user_id=user_id
+        ),
+        "posts search": get_search_query(
+            models.Post, "search words", PAGE_SIZE, load=[models.Post.load_user()]
+        ),
+        "comments search": get_search_query(models.Comment, "search words", PAGE_SIZE),
+        "post comment ids": models.Comment.get_all(fields=["id"], post_id=post_id),
+        "post comments daily counts": get_daily_counts_query(
+            [models.Comment.post_id == post_id]
+        ),
+        "post comments tree": get_comment_tree_query(post_id),
+        "comment by id (expanded)": models.Comment.get_one(
+            id=comment_id,
+            load=models.Comment.get_load_options(models.Comment.EXPAND_FIELDS),
+        ),
+        "comment subtree ids": get_comment_subtree_ids_query(comment_id, user_id),
+        "comments of one day": get_daily_counts_query(
+            [
+                models.Comment.created_at >= day_start,
+                models.Comment.created_at < day_start + timedelta(days=1),
+            ]
+        ),
+        "pending posts sweep": models.Post.get_all(
+            fields=["id"],
+            filters=[models.Post.is_pending, models.Post.updated_at < created_at],
+        ).limit(1000),
+        "pending comments sweep": models.Comment.get_all(
+            fields=["id"],
+            filters=[models.Comment.is_pending, models.Comment.updated_at < created_at],
+        ).limit(1000),
+        "comments daily stats range": models.CommentDailyStats.get_all(
+            filters=[
+                models.CommentDailyStats.date >= created_at.date(),
+                models.CommentDailyStats.date <= created_at.date(),
+            ],
+            order_by=[models.CommentDailyStats.date],
+        ),
+        # Rows looked up by ON DELETE CASCADE
+        "cascade: comment replies": models.Comment.get_all(
+            fields=["id"], parent_comment_id=comment_id
+        ),
+        "cascade: user comments": models.Comment.get_all(
+            fields=["id"], creator_id=user_id
+        ),
+        "cascade: user posts": models.Post.get_all(fields=["id"], user_id=user_id),
+    }
+
+
+def explain(session: Session, query: Executable, analyze: bool) -> Dict[str, Any]:
+    """Return JSON plan of the query (changes are rolled back by the caller)"""
+    compiled = query.compile(dialect=session.get_bind().dialect)
+    options = "FORMAT JSON, ANALYZE" if analyze else "FORMAT JSON"
+    result = session.connection().exec_driver_sql(
+        f"EXPLAIN ({options}) {compiled}", compiled.params
+    )
+    return result.scalar()[0]["Plan"]
+
+
+def iter_plan_nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+
+def find_seq_scans(plan: Dict[str, Any]) -> List[Tuple[str, int]]:
+    """Return (table, estimated rows) of sequential scans in the plan"""
+    return [
+        (node["Relation Name"], node["Plan Rows"])
+        for node in iter_plan_nodes(plan)
+        if node["Node Type"] == "Seq Scan"
+    ]
+
+
+def get_table_rows(session: Session) -> Dict[str, int]:
+    """Return estimated rows count of every table (from the last ANALYZE)"""
+    rows_query = text(
+        "SELECT relname, reltuples::bigint FROM pg_class "
+        "WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+    )
+    return dict(session.execute(rows_query).all())
+
+
+def run_advisor(
+    session: Session,
+    analyze: bool = False,
+    no_seqscan: bool = False,
+    min_table_rows: int = 10_000,
+) -> int:
+    """
+    Print plans summary and return number of queries with sequential scans
+
+    Scans of tables smaller than `min_table_rows` are cheaper than index
+    lookups, so they are reported but not flagged. Changes of `EXPLAIN ANALYZE`
+    are rolled back by the caller
+    """
+    flagged = 0
+    sample = get_sample(session)
+    table_rows = get_table_rows(session)
+    if no_seqscan:
+        # Seq scan is left in a plan only if no index can serve the query
+        session.execute(text("SET LOCAL enable_seqscan = off"))
+    for name, query in get_hot_queries(sample).items():
+        plan = explain(session, query, analyze)
+        seq_scans = find_seq_scans(plan)
+        is_flagged = any(
+            table_rows.get(table, 0) >= min_table_rows for table, _ in seq_scans
+        )
+        status = "SEQ" if is_flagged else "OK"
+        details = ", ".join(
+            f"Seq Scan on {table} (~{rows} of {table_rows.get(table, 0)} rows)"
+            for table, rows in seq_scans
+        )
+        print(
+            f"{status:<4} {name:<32} cost={plan['Total Cost']:<12} "
+            f"{details or plan['Node Type']}"
+        )
+        flagged += is_flagged
+    return flagged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--database-url",
+        help="Sync DB URL (app DB by default), required to seed rows",
+    )
+    parser.add_argument("--seed-users", type=int, default=0)
+    parser.add_argument("--seed-posts", type=int, default=0)
+    parser.add_argument("--seed-comments", type=int, default=0)
+    parser.add_argument(
+        "--commit", action="store_true", help="Keep seeded rows after the run"
+    )
+    parser.add_argument(
+        "--analyze", action="store_true", help="Run queries (EXPLAIN ANALYZE)"
+    )
+    parser.add_argument(
+        "--no-seqscan", action="store_true", help="Disable seq scans in planner"
+    )
+    parser.add_argument(
+        "--min-table-rows",
+        type=int,
+        default=10_000,
+        help="Seq scans of smaller tables aren't flagged",
+    )
+    args = parser.parse_args()
+    seed = args.seed_users or args.seed_posts or args.seed_comments
+    if seed and not args.database_url:
+        parser.error("seeding writes rows, pass --database-url of a disposable DB")
+    engine = create_engine(
+        args.database_url or settings.PSQL_DB_URI, poolclass=NullPool
+    )
+    with Session(engine) as session:
+        if seed:
+            seed_dataset(session, args.seed_users, args.seed_posts, args.seed_comments)
+            if args.commit:
+                session.commit()
+        # Non-zero exit code if any query scans a big table, so it can run in CI
+        flagged = run_advisor(
+            session, args.analyze, args.no_seqscan, args.min_table_rows
+        )
+        session.rollback()
+    engine.dispose()
+    sys.exit(1 if flagged else 0)
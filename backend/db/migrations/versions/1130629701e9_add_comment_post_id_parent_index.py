@@ -0,0 +1,36 @@
+"""add comment post_id parent_comment_id index
+
+Revision ID: 1130629701e9
+Revises: 834140bb0620
+Create Date: 2026-10-18 11:03:27.940115
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "1130629701e9"
+down_revision = "834140bb0620"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Build index without locking writes on a big table
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_comment_post_id_parent_comment_id",
+            "comment",
+            ["post_id", "parent_comment_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_comment_post_id_parent_comment_id",
+            table_name="comment",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,58 @@
+"""add full text search
+
+Revision ID: 5f0c3a9d7b21
+Revises: d2961e0ebfcf
+Create Date: 2026-10-18 22:10:41.306512
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "5f0c3a9d7b21"
+down_revision = "d2961e0ebfcf"
+branch_labels = None
+depends_on = None
+
+# Must match `constants.SEARCH_CONFIG` at the time of the migration
+SEARCH_VECTOR = "to_tsvector('english', coalesce(text, ''))"
+
+
+def upgrade() -> None:
+    # Stored generated column: the table is rewritten once,
+    # run it in a maintenance window on big tables
+    for table in ("post", "comment"):
+        op.add_column(
+            table,
+            sa.Column(
+                "search_vector",
+                postgresql.TSVECTOR(),
+                sa.Computed(SEARCH_VECTOR, persisted=True),
+                nullable=True,
+            ),
+        )
+    # Build indexes without locking writes on big tables
+    with op.get_context().autocommit_block():
+        for table in ("post", "comment"):
+            op.create_index(
+                f"ix_{table}_search_vector",
+                table,
+                ["search_vector"],
+                unique=False,
+                postgresql_using="gin",
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table in ("post", "comment"):
+            op.drop_index(
+                f"ix_{table}_search_vector",
+                table_name=table,
+                postgresql_concurrently=True,
+            )
+    for table in ("post", "comment"):
+        op.drop_column(table, "search_vector")
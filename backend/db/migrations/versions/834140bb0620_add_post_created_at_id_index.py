@@ -0,0 +1,36 @@
+"""add post created_at id index
+
+Revision ID: 834140bb0620
+Revises: 3476ffd77c6a
+Create Date: 2026-10-18 09:12:41.518203
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "834140bb0620"
+down_revision = "3476ffd77c6a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Build index without locking writes on a big table
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_post_created_at_id",
+            "post",
+            ["created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_post_created_at_id",
+            table_name="post",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,54 @@
+"""add comment daily stats
+
+Revision ID: 8bdf9056040f
+Revises: 1130629701e9
+Create Date: 2026-10-18 12:21:09.330472
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8bdf9056040f"
+down_revision = "1130629701e9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "comment_daily_stats",
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("blocked_count", sa.Integer(), nullable=False),
+        sa.Column("unblocked_count", sa.Integer(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("date"),
+    )
+    op.create_index(
+        op.f("ix_comment_daily_stats_id"),
+        "comment_daily_stats",
+        ["id"],
+        unique=False,
+    )
+    # Fill rollup with existing comments
+    op.execute(
+        """
+        INSERT INTO comment_daily_stats
+            (date, blocked_count, unblocked_count, created_at)
+        SELECT
+            CAST(created_at AS DATE),
+            COUNT(id) FILTER (WHERE is_blocked),
+            COUNT(id) FILTER (WHERE NOT is_blocked),
+            timezone('utc', now())
+        FROM comment
+        GROUP BY CAST(created_at AS DATE)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_comment_daily_stats_id"), table_name="comment_daily_stats")
+    op.drop_table("comment_daily_stats")
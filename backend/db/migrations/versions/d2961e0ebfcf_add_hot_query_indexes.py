@@ -0,0 +1,68 @@
+"""add hot query indexes
+
+Revision ID: d2961e0ebfcf
+Revises: e29d3c48371c
+Create Date: 2026-10-18 21:05:13.820681
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d2961e0ebfcf"
+down_revision = "e29d3c48371c"
+branch_labels = None
+depends_on = None
+
+# name, table, columns, partial index condition
+INDEXES = (
+    # User posts newest first, FK cascade on user delete
+    ("ix_post_user_id_created_at_id", "post", ["user_id", "created_at", "id"], None),
+    # Unblocked posts newest first (public listings)
+    ("ix_post_unblocked_created_at_id", "post", ["created_at", "id"], "NOT is_blocked"),
+    # FK cascade on user delete
+    ("ix_comment_creator_id", "comment", ["creator_id"], None),
+    # Replies lookup (subtree CTE, FK cascade on comment delete), roots are skipped
+    (
+        "ix_comment_parent_comment_id",
+        "comment",
+        ["parent_comment_id"],
+        "parent_comment_id IS NOT NULL",
+    ),
+    # Comments by creation day (daily stats backfill)
+    ("ix_comment_created_at", "comment", ["created_at"], None),
+)
+# Indexes duplicating primary keys
+PK_INDEXES = (
+    ("ix_user_id", "user"),
+    ("ix_post_id", "post"),
+    ("ix_comment_id", "comment"),
+    ("ix_comment_daily_stats_id", "comment_daily_stats"),
+)
+
+
+def upgrade() -> None:
+    # Build and drop indexes without locking writes on big tables
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+            )
+        for name, table in PK_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table in PK_INDEXES:
+            op.create_index(
+                name, table, ["id"], unique=False, postgresql_concurrently=True
+            )
+        for name, table, _, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,50 @@
+"""add moderation pending state
+
+Revision ID: e29d3c48371c
+Revises: 8bdf9056040f
+Create Date: 2026-10-18 20:50:48.480595
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e29d3c48371c"
+down_revision = "8bdf9056040f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Constant server default, so existing rows aren't rewritten
+    for table in ("post", "comment"):
+        op.add_column(
+            table,
+            sa.Column(
+                "is_pending", sa.Boolean(), server_default=sa.false(), nullable=False
+            ),
+        )
+    # Build indexes without locking writes on big tables
+    with op.get_context().autocommit_block():
+        for table in ("post", "comment"):
+            op.create_index(
+                f"ix_{table}_is_pending",
+                table,
+                ["id"],
+                unique=False,
+                postgresql_where=sa.text("is_pending"),
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table in ("post", "comment"):
+            op.drop_index(
+                f"ix_{table}_is_pending",
+                table_name=table,
+                postgresql_concurrently=True,
+            )
+    for table in ("post", "comment"):
+        op.drop_column(table, "is_pending")
@@ -1,5 +1,6 @@
 from .base import BaseModel
 from .comment import Comment
+from .comment_daily_stats import CommentDailyStats
 from .post import Post
 from .user import User
 
@@ -12,4 +13,5 @@ __all__ = (
     "Post",
     # comment
     "Comment",
+    "CommentDailyStats",
 )
@@ -12,7 +12,8 @@ from service.utils import camel_to_snake
 class BaseModel(BaseCRUD, DeclarativeBase):
     """Base model"""
 
-    id = Column(Integer, primary_key=True, index=True, doc="Unique element's ID or PK")
+    # Primary key is indexed already, no extra `ix_*_id` index
+    id = Column(Integer, primary_key=True, doc="Unique element's ID or PK")
     created_at = Column(
         DateTime,
         nullable=False,
@@ -1,5 +1,19 @@
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String
-from sqlalchemy.orm import Mapped, relationship
+from typing import Iterable, List
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Computed,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    false,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import Mapped, deferred, joinedload, relationship
+from sqlalchemy.orm.interfaces import ORMOption
 
 from db import constants
 from db.utils import get_default_now
@@ -12,6 +26,16 @@ from .user import User
 class Comment(BaseModel):
     """comment model"""
 
+    __table_args__ = (
+        # Post comments tree (recursive query by parent)
+        Index("ix_comment_post_id_parent_comment_id", "post_id", "parent_comment_id"),
+        # FK cascade on user delete
+        Index("ix_comment_creator_id", "creator_id"),
+        # Comments by creation day (daily stats backfill)
+        Index("ix_comment_created_at", "created_at"),
+    )
+    __mapper_args__ = {"eager_defaults": False}
+
     creator_id = Column(
         Integer,
         ForeignKey(User.id, ondelete="CASCADE"),
@@ -47,5 +71,63 @@ class Comment(BaseModel):
         nullable=False,
         doc="Is the post blocked",
     )
-    user: Mapped[User] = relationship(User, uselist=False, lazy="joined")
-    post: Mapped[Post] = relationship(Post, uselist=False, lazy="joined")
+    is_pending = Column(
+        Boolean,
+        default=False,
+        server_default=false(),
+        nullable=False,
+        doc="Is the comment waiting for moderation",
+    )
+    # Maintained by Postgres, never loaded with the row
+    # (mapper `eager_defaults` is off, so INSERT doesn't return it)
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                f"to_tsvector('{constants.SEARCH_CONFIG}', coalesce(text, ''))",
+                persisted=True,
+            ),
+            doc="Full-text search document of the text",
+        ),
+        raiseload=True,
+    )
+    # Related rows are referenced by id, queries load them only when expanded
+    user: Mapped[User] = relationship(User, uselist=False, lazy="raise")
+    post: Mapped[Post] = relationship(Post, uselist=False, lazy="raise")
+
+    # Relationships which can be expanded in responses (`?expand=post,user`)
+    EXPAND_FIELDS = ("post", "user")
+    # Columns of the export file, in order
+    EXPORT_FIELDS = (
+        "id",
+        "creator_id",
+        "post_id",
+        "parent_comment_id",
+        "text",
+        "is_blocked",
+        "is_pending",
+        "created_at",
+        "updated_at",
+    )
+
+    @classmethod
+    def get_load_options(cls, expand: Iterable[str] = ()) -> List[ORMOption]:
+        """Return loader options for expanded relationships"""
+        options = []
+        if "post" in expand:
+            options.append(joinedload(cls.post).options(Post.load_user()))
+        if "user" in expand:
+            options.append(joinedload(cls.user).load_only(*User.public_columns()))
+        return options
+
+
+# Pending rows lookup for the moderation worker sweep
+Index("ix_comment_is_pending", Comment.id, postgresql_where=Comment.is_pending)
+# Replies lookup (subtree CTE, FK cascade on comment delete), roots are skipped
+Index(
+    "ix_comment_parent_comment_id",
+    Comment.parent_comment_id,
+    postgresql_where=Comment.parent_comment_id.isnot(None),
+)
+# Full-text search
+Index("ix_comment_search_vector", Comment.search_vector, postgresql_using="gin")
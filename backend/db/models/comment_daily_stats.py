@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Date, Integer
+
+from .base import BaseModel
+
+
+class CommentDailyStats(BaseModel):
+    """Pre-aggregated count of comments per creation day"""
+
+    date = Column(Date, unique=True, nullable=False, doc="Comments creation day")
+    blocked_count = Column(
+        Integer, nullable=False, default=0, doc="Count of blocked comments"
+    )
+    unblocked_count = Column(
+        Integer, nullable=False, default=0, doc="Count of unblocked comments"
+    )
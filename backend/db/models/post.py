@@ -1,5 +1,17 @@
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String
-from sqlalchemy.orm import Mapped, relationship
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Computed,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    false,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import Mapped, deferred, joinedload, relationship
+from sqlalchemy.orm.interfaces import ORMOption
 
 from db import constants
 from db.utils import get_default_now
@@ -11,6 +23,14 @@ from .user import User
 class Post(BaseModel):
     """Post model"""
 
+    __table_args__ = (
+        # Keyset pagination by (created_at, id)
+        Index("ix_post_created_at_id", "created_at", "id"),
+        # User posts newest first, FK cascade on user delete
+        Index("ix_post_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+    __mapper_args__ = {"eager_defaults": False}
+
     user_id = Column(
         Integer,
         ForeignKey(User.id, ondelete="CASCADE"),
@@ -28,10 +48,60 @@ class Post(BaseModel):
         nullable=False,
         doc="Is the post blocked",
     )
+    is_pending = Column(
+        Boolean,
+        default=False,
+        server_default=false(),
+        nullable=False,
+        doc="Is the post waiting for moderation",
+    )
+    # Maintained by Postgres, never loaded with the row
+    # (mapper `eager_defaults` is off, so INSERT doesn't return it)
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                f"to_tsvector('{constants.SEARCH_CONFIG}', coalesce(text, ''))",
+                persisted=True,
+            ),
+            doc="Full-text search document of the text",
+        ),
+        raiseload=True,
+    )
     updated_at = Column(
         DateTime,
         nullable=False,
         default=get_default_now,
         doc="Updated at",
     )
-    user: Mapped[User] = relationship(User, uselist=False, lazy="joined")
+    # Not loaded by default, queries add `load_user()` when owner is needed
+    user: Mapped[User] = relationship(User, uselist=False, lazy="raise")
+
+    # Columns of the export file, in order
+    EXPORT_FIELDS = (
+        "id",
+        "user_id",
+        "text",
+        "is_blocked",
+        "is_pending",
+        "created_at",
+        "updated_at",
+    )
+
+    @classmethod
+    def load_user(cls) -> ORMOption:
+        """Loader option joining owner with response columns only"""
+        return joinedload(cls.user).load_only(*User.public_columns())
+
+
+# Pending rows lookup for the moderation worker sweep
+Index("ix_post_is_pending", Post.id, postgresql_where=Post.is_pending)
+# Unblocked posts newest first (public listings)
+Index(
+    "ix_post_unblocked_created_at_id",
+    Post.created_at,
+    Post.id,
+    postgresql_where=~Post.is_blocked,
+)
+# Full-text search
+Index("ix_post_search_vector", Post.search_vector, postgresql_using="gin")
@@ -9,3 +9,8 @@ class User(BaseModel):
     email = Column(String, unique=True, nullable=False, doc="Unique email address")
     password = Column(String, nullable=False, doc="Hashed password")
     name = Column(String(length=40), doc="User name")
+
+    @classmethod
+    def public_columns(cls) -> tuple:
+        """Columns returned in responses, password hash isn't loaded"""
+        return cls.id, cls.email, cls.name
@@ -0,0 +1,161 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Connection, event, exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
+
+from service.core import settings
+from service.core.metrics import DB_POOL_CHECKED_OUT, DB_POOL_TIMEOUTS, DB_POOL_WAIT
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    """Connection checkout counters shared by the pool and its recreated copies"""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.hold_time = 0.0
+        self.max_hold_time = 0.0
+
+    def add_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_time += seconds
+        self.max_wait_time = max(self.max_wait_time, seconds)
+
+    def add_hold(self, seconds: float) -> None:
+        self.checkins += 1
+        self.hold_time += seconds
+        self.max_hold_time = max(self.max_hold_time, seconds)
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool measuring time spent waiting for a connection
+
+    Wait time covers waiting for a free connection, opening a new one
+    and pre-ping (if it's enabled)
+    """
+
+    def connect(self) -> PoolProxiedConnection:
+        started_at = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            wait_time = time.perf_counter() - started_at
+            pool_metrics.add_wait(wait_time)
+            DB_POOL_WAIT.observe(wait_time)
+
+
+def on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    connection_record.info["checked_out_at"] = time.perf_counter()
+    DB_POOL_CHECKED_OUT.inc()
+
+
+def on_checkin(dbapi_connection, connection_record) -> None:
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        pool_metrics.add_hold(time.perf_counter() - checked_out_at)
+        DB_POOL_CHECKED_OUT.dec()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Measure how long connections are held (engine events apply to its pools)"""
+    event.listen(engine.sync_engine, "checkout", on_checkout)
+    event.listen(engine.sync_engine, "checkin", on_checkin)
+
+
+def get_pool_stats(engine: AsyncEngine) -> Dict[str, Any]:
+    """Return pool state and checkout metrics of the current process"""
+    pool = engine.pool
+    checkouts = pool_metrics.checkouts
+    checkins = pool_metrics.checkins
+    return {
+        "pool": pool.__class__.__name__,
+        "size": settings.PSQL_POOL_SIZE,
+        "max_overflow": settings.PSQL_POOL_MAX_OVERFLOW,
+        "timeout": settings.PSQL_POOL_TIMEOUT,
+        "recycle": settings.PSQL_POOL_RECYCLE,
+        "pre_ping": settings.PSQL_POOL_PRE_PING,
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else 0,
+        "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else 0,
+        "checkouts": checkouts,
+        "timeouts": pool_metrics.timeouts,
+        "avg_wait_time": pool_metrics.wait_time / checkouts if checkouts else 0.0,
+        "max_wait_time": pool_metrics.max_wait_time,
+        "avg_hold_time": pool_metrics.hold_time / checkins if checkins else 0.0,
+        "max_hold_time": pool_metrics.max_hold_time,
+    }
+
+
+# Postgres connections limit and connections reserved for superusers
+LIMITS_QUERY = text(
+    "SELECT current_setting('max_connections')::int, "
+    "current_setting('superuser_reserved_connections')::int"
+)
+
+
+def get_available_connections(connection: Connection) -> int:
+    """Return connections which can be used by backend workers"""
+    max_connections, reserved = connection.execute(LIMITS_QUERY).one()
+    # Connections left for migrations, scripts and admin sessions
+    return max_connections - reserved - settings.PSQL_RESERVED_CONNECTIONS
+
+
+def get_workers_count(available_connections: Optional[int]) -> int:
+    """
+    Return `BACKEND_WORKERS` limited by DB connections, so pools
+    of all workers fit Postgres (at least one worker is started)
+    """
+    workers = settings.BACKEND_WORKERS
+    if available_connections is not None:
+        pool_limit = settings.PSQL_POOL_SIZE + settings.PSQL_POOL_MAX_OVERFLOW
+        workers = min(workers, available_connections // pool_limit)
+    return max(workers, 1)
+
+
+def get_required_connections() -> int:
+    """Return max number of connections opened by all backend workers"""
+    pool_limit = settings.PSQL_POOL_SIZE + settings.PSQL_POOL_MAX_OVERFLOW
+    return settings.BACKEND_WORKERS * pool_limit
+
+
+async def check_pool_capacity(engine: AsyncEngine) -> None:
+    """
+    Check that pools of all backend workers fit Postgres `max_connections`
+
+    Logs an error, or raises `RuntimeError` if `PSQL_POOL_CHECK` is "error"
+    """
+    if settings.PSQL_POOL_CHECK == "off":
+        return
+    try:
+        async with engine.connect() as connection:
+            available = await connection.run_sync(get_available_connections)
+    except Exception:
+        logger.exception("Postgres connections limit can't be checked")
+        return
+    required = get_required_connections()
+    if required <= available:
+        return
+    message = (
+        f"{settings.BACKEND_WORKERS} workers x "
+        f"({settings.PSQL_POOL_SIZE} + {settings.PSQL_POOL_MAX_OVERFLOW}) "
+        f"connections = {required}, Postgres allows {available}. "
+        "Decrease BACKEND_WORKERS, PSQL_POOL_SIZE or PSQL_POOL_MAX_OVERFLOW"
+    )
+    if settings.PSQL_POOL_CHECK == "error":
+        raise RuntimeError(message)
+    logger.error(message)
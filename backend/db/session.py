@@ -1,7 +1,12 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from service.core import settings
+from service.core.metrics import instrument_queries
+from service.core.profiling import instrument_profiling
+
+from .pool import InstrumentedAsyncPool, instrument_engine
 
 # Create engine
 engine = create_engine(
@@ -12,3 +17,29 @@ engine = create_engine(
 
 # Crete session maker
 DBSession = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+
+# Create async engine (used by the API, keeps the event loop free during queries)
+async_engine = create_async_engine(
+    settings.PSQL_ASYNC_DB_URI,
+    poolclass=InstrumentedAsyncPool,
+    pool_size=settings.PSQL_POOL_SIZE,
+    max_overflow=settings.PSQL_POOL_MAX_OVERFLOW,
+    pool_timeout=settings.PSQL_POOL_TIMEOUT,
+    pool_recycle=settings.PSQL_POOL_RECYCLE,
+    pool_pre_ping=settings.PSQL_POOL_PRE_PING,
+    # Statement timeout is set once per connection, not per query
+    connect_args={
+        "server_settings": {"statement_timeout": str(settings.PSQL_STATEMENT_TIMEOUT)}
+    },
+    echo=False,
+)
+instrument_engine(async_engine)
+instrument_queries(async_engine)
+instrument_profiling(async_engine)
+
+# Create async session maker
+# `expire_on_commit` is disabled, so instances stay readable after commit
+# without implicit IO (which is not allowed in async context)
+AsyncDBSession = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
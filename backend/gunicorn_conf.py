@@ -0,0 +1,75 @@
+"""
+Gunicorn config of the production server
+
+`gunicorn service.main:app -c gunicorn_conf.py` (see bash_scripts/start.sh)
+"""
+
+import logging
+from typing import Optional
+
+from sqlalchemy import NullPool, create_engine
+
+from db.pool import get_available_connections, get_workers_count
+from db.session import async_engine
+from service.core import settings
+from service.core.metrics import mark_worker_dead
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def fetch_available_connections() -> Optional[int]:
+    """Return connections for backend workers, None if the DB isn't reachable"""
+    if settings.PSQL_POOL_CHECK == "off":
+        return None
+    engine = create_engine(settings.PSQL_DB_URI, poolclass=NullPool)
+    try:
+        with engine.connect() as connection:
+            return get_available_connections(connection)
+    except Exception as e:
+        logger.warning(f"Postgres connections limit can't be checked: {e}")
+        return None
+    finally:
+        engine.dispose()
+
+
+bind = f"{settings.BACKEND_HOST}:{settings.BACKEND_PORT}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = get_workers_count(fetch_available_connections())
+if workers < settings.BACKEND_WORKERS:
+    logger.warning(
+        f"{workers} workers are started instead of {settings.BACKEND_WORKERS}, "
+        "DB pools of more workers don't fit Postgres max_connections"
+    )
+# Pool capacity is checked by every worker on startup
+settings.BACKEND_WORKERS = workers
+if workers > 1 and not settings.REDIS_URL and settings.RESPONSE_CACHE_SIZE:
+    # Invalidation of local response caches isn't seen by other workers
+    logger.warning("Response cache is disabled, set REDIS_URL to share it by workers")
+    settings.RESPONSE_CACHE_SIZE = 0
+
+# App (and profanity wordlists) is imported once by the master,
+# workers share its memory copy-on-write
+preload_app = True
+# Restart workers after some requests to release leaked memory
+max_requests = settings.BACKEND_MAX_REQUESTS
+max_requests_jitter = settings.BACKEND_MAX_REQUESTS_JITTER
+# On SIGTERM workers stop accepting connections, finish requests in flight
+# and background tasks (lifespan shutdown), then they are killed
+graceful_timeout = settings.BACKEND_GRACEFUL_TIMEOUT
+timeout = settings.BACKEND_TIMEOUT
+keepalive = settings.BACKEND_KEEPALIVE
+accesslog = "-"
+# Client IP is taken from X-Forwarded-For of trusted proxies (uvicorn workers
+# read proxy headers), rate limits per IP need it
+forwarded_allow_ips = settings.FORWARDED_ALLOW_IPS
+
+
+def post_fork(server, worker) -> None:
+    # Connections opened before fork must not be shared by workers,
+    # every worker opens its own pool
+    async_engine.sync_engine.dispose(close=False)
+
+
+def child_exit(server, worker) -> None:
+    # Killed workers don't run lifespan shutdown, drop their live gauges here
+    mark_worker_dead(worker.pid)
@@ -3,6 +3,7 @@ from fastapi_pagination import add_pagination
 
 from .comment import comment
 from .post import post
+from .system import system
 from .user import auth, user
 
 router_v1 = APIRouter()
@@ -15,3 +16,4 @@ router_v1.include_router(auth.router, tags=["Auth"], prefix="/auth")
 router_v1.include_router(user.router, tags=["User"], prefix="/user")
 router_v1.include_router(post.router, tags=["Post"], prefix="/post")
 router_v1.include_router(comment.router, tags=["Comment"], prefix="/comment")
+router_v1.include_router(system.router, tags=["System"], prefix="/system")
@@ -1,19 +1,54 @@
 from datetime import date
+from typing import Optional, Tuple
 
-from better_profanity import profanity
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import PositiveInt
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
 
 from db import models
-from db.session import DBSession
-from service.core.dependencies import get_current_user, get_session
+from db.crud.bulk import bulk_insert
+from db.utils import get_default_now
+from service.core.dependencies import get_current_user, get_session, get_session_factory
+from service.core.export import ExportFilters, export_response
+from service.core.profiling import ProfilingRoute
+from service.core.response_cache import (
+    comment_response_cache,
+    dump_response,
+    get_cached_response,
+    get_response_key,
+    invalidate_responses,
+)
+from service.core.search import search_page
+from service.core.serializers import comment_serializer
+from service.moderation import (
+    ModerationTask,
+    is_async_moderation,
+    moderation_worker,
+    profanity_matcher,
+)
 from service.schemas import v1 as schemas_v1
 
-from .utils import get_comments_breakdown
+from .utils import (
+    get_comment_expand,
+    get_comment_subtree_ids_query,
+    get_comments_breakdown,
+    get_stats_delta,
+    subtract_daily_stats,
+    update_daily_stats,
+)
 
-router = APIRouter()
-profanity.load_censor_words()
+router = APIRouter(route_class=ProfilingRoute)
 
 
 @router.post(
@@ -21,67 +56,209 @@ profanity.load_censor_words()
 )
 async def create_comment(
     input_data: schemas_v1.CommentCreate,
+    background_tasks: BackgroundTasks,
+    expand: Tuple[str, ...] = Depends(get_comment_expand),
     current_user: models.User = Depends(get_current_user),
-    session: DBSession = Depends(get_session),
-) -> models.Comment:
+    session: AsyncSession = Depends(get_session),
+) -> Response:
     """
     Obtains a new comment from the input data.
     Return Comment  info\n
+    In async moderation mode comment is created as pending and checked later\n
+    Post and user are returned only with `?expand=post,user`\n
     Responses:\n
     `201` CREATED - Everything is good (SUCCESS Response)\n
     `400` BAD_REQUEST - Comment contains inappropriate language.\n
     `401` UNAUTHORIZED - You have not provided authorization token\n
     `403` FORBIDDEN - Invalid authorization\n
+    `404` NOT_FOUND - Post or parent comment not found\n
     `422` UNPROCESSABLE_ENTITY - Failed field validation\n
     """
-    post_query = select(models.Post).where(models.Post.id == input_data.post_id)
-    with session() as db:
-        post = db.scalars(post_query).unique().one_or_none()
+    # Post row is loaded only if it's expanded in response
+    if "post" in expand:
+        post_query = models.Post.get_one(
+            id=input_data.post_id, load=[models.Post.load_user()]
+        )
+    else:
+        post_query = models.Post.get_one(fields=["id"], id=input_data.post_id)
+    post = (await session.scalars(post_query)).unique().one_or_none()
     if not post:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Post not found",
         )
     if input_data.parent_id:
-        comment = models.Comment(
-            creator_id=current_user.id,
-            text=input_data.text,
-            parent_comment_id=input_data.parent_id,
-            post_id=input_data.post_id,
+        parent_exists_query = models.Comment.exists(
+            id=input_data.parent_id, post_id=input_data.post_id
         )
+        if not (await session.execute(parent_exists_query)).scalar():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Parent comment not found",
+            )
     comment = models.Comment(
-        creator_id=current_user.id, text=input_data.text, post_id=input_data.post_id
+        creator_id=current_user.id,
+        post_id=input_data.post_id,
+        text=input_data.text,
+        parent_comment_id=input_data.parent_id,
+        is_pending=is_async_moderation(),
     )
-    if profanity.contains_profanity(input_data.text):
-        comment.is_blocked = True
-        with session() as db:
-            db.add(comment)
-            db.commit()
-            db.refresh(comment)
+    if not comment.is_pending:
+        comment.is_blocked = profanity_matcher.contains_profanity(input_data.text)
+    session.add(comment)
+    # INSERT ... RETURNING id, no refresh needed (defaults are set on the client)
+    await session.flush()
+    await update_daily_stats(
+        session, {comment.created_at.date(): get_stats_delta(comment.is_blocked)}
+    )
+    if comment.is_pending:
+        # Background tasks run after commit, so worker always finds the comment
+        background_tasks.add_task(
+            moderation_worker.enqueue, [ModerationTask(model="comment", id=comment.id)]
+        )
+    if comment.is_blocked:
+        # Blocked comment is stored anyway, so commit it before the error response
+        await session.commit()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Comment contains inappropriate language.",
         )
+    if "post" in expand:
+        set_committed_value(comment, "post", post)
+    if "user" in expand:
+        set_committed_value(comment, "user", current_user)
+    return comment_serializer.response(comment, status.HTTP_201_CREATED, expand)
 
-    comment.is_blocked = False
-    with session() as db:
-        db.add(comment)
-        db.commit()
-        db.refresh(comment)
 
-    return comment
+@router.post(
+    "/bulk",
+    status_code=status.HTTP_201_CREATED,
+    response_model=schemas_v1.BulkCreateResponse,
+)
+async def create_comments_bulk(
+    input_data: schemas_v1.CommentBulkCreate,
+    background_tasks: BackgroundTasks,
+    current_user: models.User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> ORJSONResponse:
+    """
+    Create many comments at once, result of every item is returned in input order\n
+    Items with unknown post or parent comment aren't created and have `error`\n
+    Comments with inappropriate language are stored as blocked and have `error`\n
+    In async moderation mode comments are created as pending and checked later\n
+    Responses:\n
+    `201` CREATED - Everything is good (SUCCESS Response)\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    `403` FORBIDDEN - Invalid authorization\n
+    `422` UNPROCESSABLE_ENTITY - Failed field validation or too many items\n
+    """
+    items = input_data.items
+    # Posts and parents of all items are checked with one query each
+    post_ids_query = models.Post.get_all(
+        fields=["id"],
+        filters=[models.Post.id.in_({item.post_id for item in items})],
+    )
+    post_ids = set((await session.scalars(post_ids_query)).all())
+    parent_ids = {item.parent_id for item in items if item.parent_id}
+    parent_post_ids = {}
+    if parent_ids:
+        parents_query = models.Comment.get_all(
+            fields=["id", "post_id"], filters=[models.Comment.id.in_(parent_ids)]
+        )
+        parent_post_ids = dict((await session.execute(parents_query)).all())
+    results = []
+    valid_items = []
+    for index, item in enumerate(items):
+        if item.post_id not in post_ids:
+            error = "Post not found"
+        elif item.parent_id and parent_post_ids.get(item.parent_id) != item.post_id:
+            error = "Parent comment not found"
+        else:
+            valid_items.append((index, item))
+            continue
+        results.append(
+            {
+                "index": index,
+                "id": None,
+                "is_blocked": False,
+                "is_pending": False,
+                "error": error,
+            }
+        )
+    is_pending = is_async_moderation()
+    if is_pending:
+        verdicts = [False] * len(valid_items)
+    else:
+        verdicts = await profanity_matcher.check_batch(
+            item.text for _, item in valid_items
+        )
+    # COPY doesn't apply ORM defaults, so every column is set here
+    now = get_default_now()
+    rows = [
+        {
+            "creator_id": current_user.id,
+            "post_id": item.post_id,
+            "parent_comment_id": item.parent_id,
+            "text": item.text,
+            "is_blocked": is_blocked,
+            "is_pending": is_pending,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for (_, item), is_blocked in zip(valid_items, verdicts)
+    ]
+    comment_ids = await bulk_insert(session, models.Comment, rows)
+    blocked = sum(verdicts)
+    await update_daily_stats(
+        session, {now.date(): (blocked, len(comment_ids) - blocked)}
+    )
+    if is_pending:
+        # Background tasks run after commit, so worker always finds the comments
+        background_tasks.add_task(
+            moderation_worker.enqueue,
+            [
+                ModerationTask(model="comment", id=comment_id)
+                for comment_id in comment_ids
+            ],
+        )
+    for (index, _), comment_id, is_blocked in zip(valid_items, comment_ids, verdicts):
+        results.append(
+            {
+                "index": index,
+                "id": comment_id,
+                "is_blocked": is_blocked,
+                "is_pending": is_pending,
+                "error": (
+                    "Comment contains inappropriate language." if is_blocked else None
+                ),
+            }
+        )
+    results.sort(key=lambda result: result["index"])
+    return ORJSONResponse(
+        {
+            "created": len(comment_ids),
+            "blocked": blocked,
+            "failed": len(items) - len(comment_ids),
+            "items": results,
+        },
+        status_code=status.HTTP_201_CREATED,
+    )
 
 
 @router.put("/{comment_id}", response_model=schemas_v1.Comment)
 async def update_comment(
     comment_id: PositiveInt,
     input_data: schemas_v1.CommentUpdate,
+    background_tasks: BackgroundTasks,
+    expand: Tuple[str, ...] = Depends(get_comment_expand),
     current_user: models.User = Depends(get_current_user),
-    session: DBSession = Depends(get_session),
-) -> models.Comment:
+    session: AsyncSession = Depends(get_session),
+) -> Response:
     """
     Updates a comment from the input data.
     Return Comment  info\n
+    In async moderation mode comment is marked as pending and checked later\n
+    Post and user are returned only with `?expand=post,user`\n
     Responses:\n
     `201` CREATED - Everything is good (SUCCESS Response)\n
     `400` BAD_REQUEST - Comment not found or you can't edit it.\n
@@ -90,41 +267,47 @@ async def update_comment(
     `403` FORBIDDEN - Invalid authorization\n
     `422` UNPROCESSABLE_ENTITY - Failed field validation\n
     """
-    comment_query = select(models.Comment).where(
-        models.Comment.id == comment_id,
-        models.Comment.creator_id == current_user.id,
+    comment_query = models.Comment.get_one(
+        id=comment_id,
+        creator_id=current_user.id,
+        load=models.Comment.get_load_options(expand),
     )
-    with session() as db:
-        comment = db.scalars(comment_query).unique().one_or_none()
+    comment = (await session.scalars(comment_query)).unique().one_or_none()
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Comment not found or you can't edit it",
         )
-    if profanity.contains_profanity(input_data.text):
+    comment.text = input_data.text
+    comment.updated_at = get_default_now()
+    if is_async_moderation():
+        comment.is_pending = True
+        background_tasks.add_task(
+            moderation_worker.enqueue, [ModerationTask(model="comment", id=comment.id)]
+        )
+    elif profanity_matcher.contains_profanity(input_data.text):
+        if not comment.is_blocked:
+            # Move comment from unblocked to blocked counter of its day
+            await update_daily_stats(session, {comment.created_at.date(): (1, -1)})
         comment.is_blocked = True
-        comment.text = input_data.text
-        with session() as db:
-            db.add(comment)
-            db.commit()
-            db.refresh(comment)
+        await session.commit()
+        await invalidate_responses(comment_ids=[comment.id])
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Comment contains inappropriate language.",
         )
-    comment.text = input_data.text
-    with session() as db:
-        db.add(comment)
-        db.commit()
-        db.refresh(comment)
-    return comment
+    await session.flush()
+    # Background tasks run after commit, so cache isn't filled with old version
+    background_tasks.add_task(invalidate_responses, comment_ids=[comment.id])
+    return comment_serializer.response(comment, expand=expand)
 
 
 @router.delete("/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_comment(
     comment_id: PositiveInt,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(get_current_user),
-    session: DBSession = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ) -> None:
     """
     Delete comment\n
@@ -133,54 +316,136 @@ async def delete_comment(
     `204` OK - Everything is good (SUCCESS Response)\n
     `401` UNAUTHORIZED - You have not provided authorization token\n
     """
+    # Replies are removed by FK cascade, so they leave the rollup
+    # and response cache as well
+    subtree_ids_query = get_comment_subtree_ids_query(comment_id, current_user.id)
+    subtree_ids = (await session.scalars(subtree_ids_query)).all()
+    if not subtree_ids:
+        return
+    await subtract_daily_stats(session, [models.Comment.id.in_(subtree_ids)])
     delete_query = models.Comment.delete().where(
         models.Comment.id == comment_id, models.Comment.creator_id == current_user.id
     )
-    with session() as db:
-        db.execute(delete_query)
-        db.commit()
+    await session.execute(delete_query)
+    background_tasks.add_task(invalidate_responses, comment_ids=subtree_ids)
     return
 
 
+@router.get(
+    "/search", response_model=schemas_v1.CursorPage[schemas_v1.CommentSearchResult]
+)
+async def search_comments(
+    q: str = Query(..., min_length=1, max_length=256, description="Search query"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` of previous page"),
+    size: int = Query(20, ge=1, le=100),
+    expand: Tuple[str, ...] = Depends(get_comment_expand),
+    session: AsyncSession = Depends(get_session),
+    _: models.User = Depends(get_current_user),
+):
+    """
+    Full-text search of unblocked comments, best match first\n
+    `q` supports web search syntax: `"exact phrase"`, `or`, `-excluded`\n
+    `headline` is HTML escaped text with matches wrapped in `<mark>`\n
+    Post and user are returned only with `?expand=post,user`\n
+    Responses:\n
+    `200` OK - Everything is good (SUCCESS Response)\n
+    `400` BAD_REQUEST - Invalid cursor\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    `422` UNPROCESSABLE_ENTITY - Failed field validation\n
+    """
+    page = await search_page(
+        session,
+        models.Comment,
+        q,
+        size=size,
+        cursor=cursor,
+        load=models.Comment.get_load_options(expand),
+    )
+    page["items"] = [
+        {
+            **comment_serializer.dump(comment, expand),
+            "rank": rank,
+            "headline": headline,
+        }
+        for comment, rank, headline in page["items"]
+    ]
+    return ORJSONResponse(page)
+
+
+@router.get("/export/", response_class=StreamingResponse)
+async def export_comments(
+    params: ExportFilters = Depends(),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+    _: models.User = Depends(get_current_user),
+) -> StreamingResponse:
+    """
+    Download comments as NDJSON (`?format=ndjson`, default) or CSV (`?format=csv`)\n
+    `user_id` filters comments by creator\n
+    Rows are streamed from a server-side cursor ordered by id,
+    memory usage doesn't depend on the number of rows\n
+    Responses:\n
+    `200` OK - Everything is good (SUCCESS Response)\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    `422` UNPROCESSABLE_ENTITY - Failed field validation\n
+    """
+    export_query = models.Comment.get_all(
+        fields=models.Comment.EXPORT_FIELDS,
+        filters=params.get_filters(models.Comment, models.Comment.creator_id),
+        order_by=[models.Comment.id],
+    )
+    return export_response(
+        session_factory, export_query, params.export_format, "comments"
+    )
+
+
 @router.get("/{comment_id}", response_model=schemas_v1.Comment)
 async def get_comment_by_id(
     comment_id: PositiveInt,
+    request: Request,
+    expand: Tuple[str, ...] = Depends(get_comment_expand),
     current_user: models.User = Depends(get_current_user),
-    session: DBSession = Depends(get_session),
-) -> models.Comment:
+    session: AsyncSession = Depends(get_session),
+) -> Response:
     """
      Return Comment  info\n
+    Response is cached, send `ETag` in `If-None-Match` to get `304`\n
+    Post and user are returned only with `?expand=post,user`\n
     Responses:\n
     `200` OK - Everything is good (SUCCESS Response)\n
+    `304` NOT_MODIFIED - Comment wasn't changed since `If-None-Match` ETag\n
     `404` NOT_FOUND - Post not found\n
     `401` UNAUTHORIZED - You have not provided authorization token\n
     `422` UNPROCESSABLE_ENTITY - Failed field validation\n
     """
-
-    comment_query = select(models.Comment).where(models.Comment.id == comment_id)
-    with session() as db:
-        comment = db.scalars(comment_query).unique().one_or_none()
-    if not comment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Comment not found",
+    cache_key = get_response_key(comment_id, expand)
+    cached = await comment_response_cache.get(cache_key)
+    if cached is None:
+        comment_query = models.Comment.get_one(
+            id=comment_id, load=models.Comment.get_load_options(expand)
         )
-    return comment
+        comment = (await session.scalars(comment_query)).unique().one_or_none()
+        if not comment:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Comment not found",
+            )
+        cached = dump_response(comment_serializer, comment, expand)
+        await comment_response_cache.set(cache_key, cached)
+    return get_cached_response(request, cached)
 
 
 @router.get("/daily-breakdown/", response_model=schemas_v1.DailyCommentStatsResponse)
-def get_comments_daily_breakdown(
+async def get_comments_daily_breakdown(
     date_from: date = Query(...),
     date_to: date = Query(...),
     current_user: models.User = Depends(get_current_user),
-    session: DBSession = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
     """
-     Return Comment  info\n
+    Return count of blocked and unblocked comments per day (from daily rollup)\n
     Responses:\n
     `200` OK - Everything is good (SUCCESS Response)\n
-    `404` NOT_FOUND - Post not found\n
     `401` UNAUTHORIZED - You have not provided authorization token\n
     `422` UNPROCESSABLE_ENTITY - Failed field validation\n
     """
-    return get_comments_breakdown(session, date_from, date_to)
+    return await get_comments_breakdown(session, date_from, date_to)
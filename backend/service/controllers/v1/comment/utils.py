@@ -1,51 +1,206 @@
+from collections import defaultdict
 from datetime import date
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from sqlalchemy import Date, cast, func
-from sqlalchemy.orm import Session
+import orjson
+from fastapi import HTTPException, Query, status
+from sqlalchemy import Date, Select, and_, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
 from db import models
 from service.schemas import v1 as schemas_v1
 
 
-def get_comments_breakdown(db: Session, date_from: date, date_to: date):
-    results = (
-        db.query(
-            cast(models.Comment.created_at, Date).label("date"),
-            models.Comment.is_blocked,
-            func.count(models.Comment.id).label("count"),
-        )
-        .filter(
-            models.Comment.created_at >= date_from,
-            models.Comment.created_at <= date_to,
+def get_comment_expand(
+    expand: Optional[str] = Query(
+        None, description="Comma-separated relationships to include: `post`, `user`"
+    ),
+) -> Tuple[str, ...]:
+    """Return sorted relationships to expand in comment response or raise `422`"""
+    if not expand:
+        return ()
+    fields = sorted({field.strip() for field in expand.split(",") if field.strip()})
+    unknown_fields = [
+        field for field in fields if field not in models.Comment.EXPAND_FIELDS
+    ]
+    if unknown_fields:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown expand fields: {', '.join(unknown_fields)}",
         )
-        .group_by(cast(models.Comment.created_at, Date), models.Comment.is_blocked)
-        .all()
+    return tuple(fields)
+
+
+def get_stats_delta(is_blocked: bool, count: int = 1) -> Tuple[int, int]:
+    """Return (blocked, unblocked) rollup change for `count` comments"""
+    return (count, 0) if is_blocked else (0, count)
+
+
+def get_daily_counts_query(filters: list = None) -> Select:
+    """Build DB query counting comments per creation day and `is_blocked`"""
+    day = cast(models.Comment.created_at, Date)
+    counts_query = select(
+        day.label("date"),
+        models.Comment.is_blocked,
+        func.count(models.Comment.id).label("count"),
+    ).group_by(day, models.Comment.is_blocked)
+    if filters:
+        counts_query = counts_query.where(*filters)
+    return counts_query
+
+
+def get_comment_subtree_ids_query(comment_id: int, creator_id: int) -> Select:
+    """Build recursive CTE query for ids of the comment and all its replies"""
+    subtree = (
+        select(models.Comment.id)
+        .where(models.Comment.id == comment_id, models.Comment.creator_id == creator_id)
+        .cte(name="comment_subtree", recursive=True)
+    )
+    reply = aliased(models.Comment, name="reply")
+    subtree = subtree.union_all(
+        select(reply.id).join(subtree, reply.parent_comment_id == subtree.c.id)
     )
+    return select(subtree.c.id)
 
-    daily_stats = {}
-    total_blocked = 0
-    total_unblocked = 0
-
-    for result in results:
-        date_str = result.date.strftime("%Y-%m-%d")
-        if date_str not in daily_stats:
-            daily_stats[date_str] = {
-                "date": result.date,
-                "blocked_count": 0,
-                "unblocked_count": 0,
-            }
-        if result.is_blocked:
-            daily_stats[date_str]["blocked_count"] += result.count
-            total_blocked += result.count
-        else:
-            daily_stats[date_str]["unblocked_count"] += result.count
-            total_unblocked += result.count
+
+async def update_daily_stats(
+    db: AsyncSession, deltas: Dict[date, Tuple[int, int]]
+) -> None:
+    """
+    Apply (blocked, unblocked) changes to the comments rollup
+
+    All days are changed with a single INSERT ... ON CONFLICT DO UPDATE,
+    so concurrent requests increment counters atomically
+    """
+    rows = [
+        {"date": day, "blocked_count": blocked, "unblocked_count": unblocked}
+        for day, (blocked, unblocked) in deltas.items()
+        if blocked or unblocked
+    ]
+    if not rows:
+        return
+    upsert_query = insert(models.CommentDailyStats).values(rows)
+    upsert_query = upsert_query.on_conflict_do_update(
+        index_elements=[models.CommentDailyStats.date],
+        set_={
+            "blocked_count": models.CommentDailyStats.blocked_count
+            + upsert_query.excluded.blocked_count,
+            "unblocked_count": models.CommentDailyStats.unblocked_count
+            + upsert_query.excluded.unblocked_count,
+        },
+    )
+    await db.execute(upsert_query)
+
+
+async def subtract_daily_stats(db: AsyncSession, filters: list) -> None:
+    """Remove comments matched by filters from the rollup (call before delete)"""
+    deltas = defaultdict(lambda: (0, 0))
+    for row in await db.execute(get_daily_counts_query(filters)):
+        blocked, unblocked = get_stats_delta(row.is_blocked, -row.count)
+        deltas[row.date] = (
+            deltas[row.date][0] + blocked,
+            deltas[row.date][1] + unblocked,
+        )
+    await update_daily_stats(db, deltas)
+
+
+async def get_comments_breakdown(db: AsyncSession, date_from: date, date_to: date):
+    """Read comments count per day from the rollup (one row per day)"""
+    stats_query = models.CommentDailyStats.get_all(
+        filters=[
+            models.CommentDailyStats.date >= date_from,
+            models.CommentDailyStats.date <= date_to,
+            models.CommentDailyStats.blocked_count
+            + models.CommentDailyStats.unblocked_count
+            > 0,
+        ],
+        order_by=[models.CommentDailyStats.date],
+    )
+    daily_stats = (await db.scalars(stats_query)).all()
 
     breakdown = [
-        schemas_v1.DailyCommentStats(**stats) for stats in daily_stats.values()
+        schemas_v1.DailyCommentStats(
+            date=stats.date,
+            blocked_count=stats.blocked_count,
+            unblocked_count=stats.unblocked_count,
+        )
+        for stats in daily_stats
     ]
 
     return {
-        "blocked": total_blocked,
-        "unblocked": total_unblocked,
+        "blocked": sum(stats.blocked_count for stats in breakdown),
+        "unblocked": sum(stats.unblocked_count for stats in breakdown),
+        "breakdown": breakdown,
     }
+
+
+def get_comment_tree_query(post_id: int, max_depth: Optional[int] = None) -> Select:
+    """
+    Build recursive CTE query for all post comments (or `max_depth` levels)
+
+    Rows are ordered by depth, so parent is always returned before its replies
+    """
+    tree_columns = (
+        models.Comment.id,
+        models.Comment.parent_comment_id,
+        models.Comment.creator_id,
+        models.Comment.text,
+        models.Comment.is_blocked,
+        models.Comment.created_at,
+        models.Comment.updated_at,
+    )
+    tree = (
+        select(*tree_columns, literal(1).label("depth"))
+        .where(
+            models.Comment.post_id == post_id,
+            models.Comment.parent_comment_id.is_(None),
+        )
+        .cte("comment_tree", recursive=True)
+    )
+    reply = aliased(models.Comment, name="reply")
+    replies = select(
+        *[getattr(reply, column.key) for column in tree_columns],
+        (tree.c.depth + 1).label("depth"),
+    ).join(
+        tree,
+        # `post_id` lets both parts use (post_id, parent_comment_id) index
+        and_(reply.post_id == post_id, reply.parent_comment_id == tree.c.id),
+    )
+    if max_depth:
+        replies = replies.where(tree.c.depth < max_depth)
+    tree = tree.union_all(replies)
+    return select(tree).order_by(tree.c.depth, tree.c.created_at, tree.c.id)
+
+
+def build_comment_tree(rows) -> List[Dict[str, Any]]:
+    """Assemble comment rows (ordered by depth) into nested tree in O(n)"""
+    nodes: Dict[int, Dict[str, Any]] = {}
+    roots = []
+    for row in rows:
+        node = {
+            "id": row.id,
+            "parent_id": row.parent_comment_id,
+            "creator_id": row.creator_id,
+            "text": row.text,
+            "is_blocked": row.is_blocked,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "depth": row.depth,
+            "children": [],
+        }
+        nodes[row.id] = node
+        if row.parent_comment_id is None:
+            roots.append(node)
+        else:
+            nodes[row.parent_comment_id]["children"].append(node)
+    return roots
+
+
+async def stream_json_list(items: List[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Encode JSON list item by item, so the whole body isn't built in memory"""
+    yield b"["
+    for i, item in enumerate(items):
+        yield (b"," if i else b"") + orjson.dumps(item)
+    yield b"]"
@@ -1,12 +1,15 @@
 from typing import Dict
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST
 
 from db.session import DBSession
 from service.core import settings
+from service.core.metrics import generate_metrics
+from service.core.profiling import ProfilingRoute
 from service.schemas import v1 as schemas_v1
 
-router = APIRouter()
+router = APIRouter(route_class=ProfilingRoute)
 
 
 @router.get("/", response_model=schemas_v1.HomeResponse)
@@ -23,3 +26,9 @@ async def home(request: Request) -> Dict[str, Dict[str, str]]:
             "adminer": f"{request.url}adminer",
         },
     }
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Return metrics of all backend workers in Prometheus text format"""
+    return Response(generate_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -1,27 +1,67 @@
-from better_profanity import profanity
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi_pagination import Page
 from fastapi_pagination.ext.sqlalchemy import paginate
 from pydantic import PositiveInt
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
 
 from db import models
-from db.session import DBSession
-from service.core.dependencies import get_current_user, get_session
+from db.crud.bulk import bulk_insert
+from db.utils import get_default_now
+from service.core.dependencies import get_current_user, get_session, get_session_factory
+from service.core.export import ExportFilters, export_response
+from service.core.pagination import paginate_keyset
+from service.core.profiling import ProfilingRoute
+from service.core.response_cache import (
+    dump_response,
+    get_cached_response,
+    get_post_comment_ids,
+    invalidate_responses,
+    post_response_cache,
+)
+from service.core.search import search_page
+from service.core.serializers import post_serializer
+from service.core.timeline import LATEST_FEED, FeedPost, post_timelines
+from service.moderation import (
+    ModerationTask,
+    is_async_moderation,
+    moderation_worker,
+    profanity_matcher,
+)
 from service.schemas import v1 as schemas_v1
 
-router = APIRouter()
-profanity.load_censor_words()
+from ..comment.utils import (
+    build_comment_tree,
+    get_comment_tree_query,
+    stream_json_list,
+    subtract_daily_stats,
+)
+
+router = APIRouter(route_class=ProfilingRoute)
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas_v1.Post)
 async def create_posts(
     input_data: schemas_v1.PostCreate,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(get_current_user),
-    session: DBSession = Depends(get_session),
-) -> models.Post:
+    session: AsyncSession = Depends(get_session),
+) -> Response:
     """
     Return Post  info\n
+    In async moderation mode post is created as pending and checked later\n
     Responses:\n
     `201` CREATED - Everything is good (SUCCESS Response)\n
     `400` BAD_REQUEST - Post contains inappropriate language.\n
@@ -29,37 +69,123 @@ async def create_posts(
     `403` FORBIDDEN - Invalid authorization\n
     `422` UNPROCESSABLE_ENTITY - Failed field validation\n
     """
-    if profanity.contains_profanity(input_data.text):
-        post = models.Post(
-            user_id=current_user.id, text=input_data.text, is_blocked=True
-        )
-        with session() as db:
-            db.add(post)
-            db.commit()
-            db.refresh(post)
+    post = models.Post(
+        user=current_user, text=input_data.text, is_pending=is_async_moderation()
+    )
+    if not post.is_pending:
+        post.is_blocked = profanity_matcher.contains_profanity(input_data.text)
+    session.add(post)
+    if post.is_blocked:
+        # Blocked post is stored anyway, so commit it before the error response
+        await session.commit()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Post contains inappropriate language.",
         )
+    # INSERT ... RETURNING id, no refresh needed (defaults are set on the client)
+    await session.flush()
+    if post.is_pending:
+        # Background tasks run after commit, so worker always finds the post,
+        # it adds the post to timelines if it's clean
+        background_tasks.add_task(
+            moderation_worker.enqueue, [ModerationTask(model="post", id=post.id)]
+        )
+    else:
+        background_tasks.add_task(
+            post_timelines.add_posts,
+            [FeedPost(id=post.id, user_id=current_user.id, created_at=post.created_at)],
+        )
+    return post_serializer.response(post, status.HTTP_201_CREATED)
 
-    post = models.Post(user_id=current_user.id, text=input_data.text, is_blocked=False)
-    with session() as db:
-        db.add(post)
-        db.commit()
-        db.refresh(post)
 
-    return post
+@router.post(
+    "/bulk",
+    status_code=status.HTTP_201_CREATED,
+    response_model=schemas_v1.BulkCreateResponse,
+)
+async def create_posts_bulk(
+    input_data: schemas_v1.PostBulkCreate,
+    background_tasks: BackgroundTasks,
+    current_user: models.User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> ORJSONResponse:
+    """
+    Create many posts at once, result of every item is returned in input order\n
+    Posts with inappropriate language are stored as blocked and have `error`\n
+    In async moderation mode posts are created as pending and checked later\n
+    Responses:\n
+    `201` CREATED - Everything is good (SUCCESS Response)\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    `403` FORBIDDEN - Invalid authorization\n
+    `422` UNPROCESSABLE_ENTITY - Failed field validation or too many items\n
+    """
+    texts = [item.text for item in input_data.items]
+    is_pending = is_async_moderation()
+    if is_pending:
+        verdicts = [False] * len(texts)
+    else:
+        verdicts = await profanity_matcher.check_batch(texts)
+    # COPY doesn't apply ORM defaults, so every column is set here
+    now = get_default_now()
+    rows = [
+        {
+            "user_id": current_user.id,
+            "text": text,
+            "is_blocked": is_blocked,
+            "is_pending": is_pending,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for text, is_blocked in zip(texts, verdicts)
+    ]
+    post_ids = await bulk_insert(session, models.Post, rows)
+    if not is_pending:
+        background_tasks.add_task(
+            post_timelines.add_posts,
+            [
+                FeedPost(id=post_id, user_id=current_user.id, created_at=now)
+                for post_id, is_blocked in zip(post_ids, verdicts)
+                if not is_blocked
+            ],
+        )
+    if is_pending:
+        # Background tasks run after commit, so worker always finds the posts
+        background_tasks.add_task(
+            moderation_worker.enqueue,
+            [ModerationTask(model="post", id=post_id) for post_id in post_ids],
+        )
+    items = [
+        {
+            "index": index,
+            "id": post_id,
+            "is_blocked": is_blocked,
+            "is_pending": is_pending,
+            "error": "Post contains inappropriate language." if is_blocked else None,
+        }
+        for index, (post_id, is_blocked) in enumerate(zip(post_ids, verdicts))
+    ]
+    return ORJSONResponse(
+        {
+            "created": len(post_ids),
+            "blocked": sum(verdicts),
+            "failed": 0,
+            "items": items,
+        },
+        status_code=status.HTTP_201_CREATED,
+    )
 
 
 @router.put("/{post_id}", response_model=schemas_v1.Post)
 async def update_post(
     post_id: PositiveInt,
     input_data: schemas_v1.PostCreate,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(get_current_user),
-    session: DBSession = Depends(get_session),
-) -> models.Post:
+    session: AsyncSession = Depends(get_session),
+) -> Response:
     """
     Return Post  info\n
+    In async moderation mode post is marked as pending and checked later\n
     Responses:\n
     `200` OK - Everything is good (SUCCESS Response)\n
     `400` BAD_REQUEST - Post contains inappropriate language.\n
@@ -68,41 +194,56 @@ async def update_post(
     `403` FORBIDDEN - Invalid authorization\n
     `422` UNPROCESSABLE_ENTITY - Failed field validation\n
     """
-    post_query = select(models.Post).where(
-        models.Post.id == post_id, models.Post.user_id == current_user.id
+    is_pending = is_async_moderation()
+    is_blocked = not is_pending and profanity_matcher.contains_profanity(
+        input_data.text
     )
-    with session() as db:
-        post = db.scalars(post_query).unique().one_or_none()
+    new_data = {"text": input_data.text, "updated_at": get_default_now()}
+    if is_pending:
+        new_data["is_pending"] = True
+    if is_blocked:
+        new_data["is_blocked"] = True
+    # Load and update post with one UPDATE ... RETURNING query
+    update_query = models.Post.update(
+        new_data=new_data, id=post_id, user_id=current_user.id
+    ).returning(models.Post)
+    post = (await session.scalars(update_query)).one_or_none()
     if not post:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Post not found or you can't edit it.",
         )
-    if profanity.contains_profanity(input_data.text):
-        post.text = input_data.text
-        post.is_blocked = True
-        with session() as db:
-            db.add(post)
-            db.commit()
-            db.refresh(post)
+    # Post is nested in cached comments, so they are invalidated as well
+    comment_ids = await get_post_comment_ids(session, post.id)
+    if is_blocked:
+        await session.commit()
+        await invalidate_responses(post_ids=[post.id], comment_ids=comment_ids)
+        await post_timelines.remove_posts(
+            [FeedPost(id=post.id, user_id=post.user_id, created_at=post.created_at)]
+        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Post contains inappropriate language.",
         )
-    post.text = input_data.text
-    with session() as db:
-        db.add(post)
-        db.commit()
-        db.refresh(post)
-
-    return post
+    # Background tasks run after commit, so cache isn't filled with old version
+    background_tasks.add_task(
+        invalidate_responses, post_ids=[post.id], comment_ids=comment_ids
+    )
+    if is_pending:
+        background_tasks.add_task(
+            moderation_worker.enqueue, [ModerationTask(model="post", id=post.id)]
+        )
+    # RETURNING doesn't join relationships, post owner is the current user
+    set_committed_value(post, "user", current_user)
+    return post_serializer.response(post)
 
 
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_post(
     post_id: PositiveInt,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(get_current_user),
-    session: DBSession = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ) -> None:
     """
     Delete post\n
@@ -111,44 +252,153 @@ async def delete_post(
     `204` OK - Everything is good (SUCCESS Response)\n
     `401` UNAUTHORIZED - You have not provided authorization token\n
     """
-    delete_query = models.Post.delete().where(
-        models.Post.id == post_id, models.Post.user_id == current_user.id
+    # Post comments are removed by FK cascade, so they leave the rollup
+    # and response cache as well
+    own_post_query = models.Post.get_one(
+        fields=["id"], id=post_id, user_id=current_user.id
+    )
+    own_post_filters = [models.Comment.post_id.in_(own_post_query)]
+    await subtract_daily_stats(session, own_post_filters)
+    comment_ids_query = models.Comment.get_all(fields=["id"], filters=own_post_filters)
+    comment_ids = (await session.scalars(comment_ids_query)).all()
+    delete_query = (
+        models.Post.delete()
+        .where(models.Post.id == post_id, models.Post.user_id == current_user.id)
+        .returning(models.Post.created_at)
+    )
+    created_at = (await session.scalars(delete_query)).one_or_none()
+    if created_at is None:
+        return
+    background_tasks.add_task(
+        invalidate_responses, post_ids=[post_id], comment_ids=comment_ids
+    )
+    background_tasks.add_task(
+        post_timelines.remove_posts,
+        [FeedPost(id=post_id, user_id=current_user.id, created_at=created_at)],
     )
-    with session() as db:
-        db.execute(delete_query)
-        db.commit()
     return
 
 
+@router.get("/latest", response_model=schemas_v1.CursorPage[schemas_v1.Post])
+async def get_latest_posts(
+    cursor: Optional[str] = Query(None, description="`next_cursor` of previous page"),
+    size: int = Query(50, ge=1, le=100),
+    session: AsyncSession = Depends(get_session),
+    _: models.User = Depends(get_current_user),
+):
+    """
+    Get the latest unblocked posts of all users, newest first\n
+    Pending posts appear after moderation\n
+    Recent pages are served from the precomputed timeline\n
+    Responses:\n
+    `200` OK - Everything is good (SUCCESS Response)\n
+    `400` BAD_REQUEST - Invalid cursor\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    """
+    page = await post_timelines.get_page(
+        session,
+        LATEST_FEED,
+        [~models.Post.is_blocked, ~models.Post.is_pending],
+        size=size,
+        cursor=cursor,
+    )
+    page["items"] = [post_serializer.dump(post) for post in page["items"]]
+    return ORJSONResponse(page)
+
+
+@router.get(
+    "/search", response_model=schemas_v1.CursorPage[schemas_v1.PostSearchResult]
+)
+async def search_posts(
+    q: str = Query(..., min_length=1, max_length=256, description="Search query"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` of previous page"),
+    size: int = Query(20, ge=1, le=100),
+    session: AsyncSession = Depends(get_session),
+    _: models.User = Depends(get_current_user),
+):
+    """
+    Full-text search of unblocked posts, best match first (not pending)\n
+    `q` supports web search syntax: `"exact phrase"`, `or`, `-excluded`\n
+    `headline` is HTML escaped text with matches wrapped in `<mark>`\n
+    Responses:\n
+    `200` OK - Everything is good (SUCCESS Response)\n
+    `400` BAD_REQUEST - Invalid cursor\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    `422` UNPROCESSABLE_ENTITY - Failed field validation\n
+    """
+    page = await search_page(
+        session,
+        models.Post,
+        q,
+        size=size,
+        cursor=cursor,
+        load=[models.Post.load_user()],
+    )
+    page["items"] = [
+        {**post_serializer.dump(post), "rank": rank, "headline": headline}
+        for post, rank, headline in page["items"]
+    ]
+    return ORJSONResponse(page)
+
+
+@router.get("/export/", response_class=StreamingResponse)
+async def export_posts(
+    params: ExportFilters = Depends(),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+    _: models.User = Depends(get_current_user),
+) -> StreamingResponse:
+    """
+    Download posts as NDJSON (`?format=ndjson`, default) or CSV (`?format=csv`)\n
+    Rows are streamed from a server-side cursor ordered by id,
+    memory usage doesn't depend on the number of rows\n
+    Responses:\n
+    `200` OK - Everything is good (SUCCESS Response)\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    `422` UNPROCESSABLE_ENTITY - Failed field validation\n
+    """
+    export_query = models.Post.get_all(
+        fields=models.Post.EXPORT_FIELDS,
+        filters=params.get_filters(models.Post, models.Post.user_id),
+        order_by=[models.Post.id],
+    )
+    return export_response(session_factory, export_query, params.export_format, "posts")
+
+
 @router.get("/{post_id}", response_model=schemas_v1.Post)
 async def get_post_by_id(
     post_id: PositiveInt,
+    request: Request,
     _: models.User = Depends(get_current_user),
-    session: DBSession = Depends(get_session),
-) -> models.Post:
+    session: AsyncSession = Depends(get_session),
+) -> Response:
     """
     Return Post  info\n
+    Response is cached, send `ETag` in `If-None-Match` to get `304`\n
     Responses:\n
     `200` OK - Everything is good (SUCCESS Response)\n
+    `304` NOT_MODIFIED - Post wasn't changed since `If-None-Match` ETag\n
     `404` NOT_FOUND - Post not found\n
     `401` UNAUTHORIZED - You have not provided authorization token\n
     `403` FORBIDDEN - Invalid authorization\n
     `422` UNPROCESSABLE_ENTITY - Failed field validation\n
     """
-    post_query = select(models.Post).where(models.Post.id == post_id)
-    with session() as db:
-        post = db.scalars(post_query).unique().one_or_none()
-    if not post:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Post not found",
-        )
-    return post
+    cached = await post_response_cache.get(post_id)
+    if cached is None:
+        post_query = models.Post.get_one(id=post_id, load=[models.Post.load_user()])
+        post = (await session.scalars(post_query)).unique().one_or_none()
+        if not post:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Post not found",
+            )
+        cached = dump_response(post_serializer, post)
+        await post_response_cache.set(post_id, cached)
+    return get_cached_response(request, cached)
 
 
 @router.get("/", response_model=Page[schemas_v1.Post])
 async def get_posts_list(
-    session: DBSession = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     _: models.Post = Depends(get_current_user),
 ):
     """
@@ -157,7 +407,58 @@ async def get_posts_list(
     `200` OK - Everything is good (SUCCESS Response)\n
     `401` UNAUTHORIZED - You have not provided authorization token\n
     """
-    post_list_query = select(models.Post)
+    post_list_query = models.Post.get_all(load=[models.Post.load_user()])
+
+    return await paginate(session, post_list_query)
+
+
+@router.get("/cursor/", response_model=schemas_v1.CursorPage[schemas_v1.Post])
+async def get_posts_cursor_page(
+    cursor: Optional[str] = Query(None, description="`next_cursor` of previous page"),
+    size: int = Query(50, ge=1, le=100),
+    session: AsyncSession = Depends(get_session),
+    _: models.User = Depends(get_current_user),
+):
+    """
+    Get Post List with keyset (cursor) pagination, newest first\n
+    Page cost doesn't depend on page number, total count isn't returned\n
+    Responses:\n
+    `200` OK - Everything is good (SUCCESS Response)\n
+    `400` BAD_REQUEST - Invalid cursor\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    """
+    page = await paginate_keyset(
+        session,
+        models.Post,
+        size=size,
+        cursor=cursor,
+        load=[models.Post.load_user()],
+    )
+    page["items"] = [post_serializer.dump(post) for post in page["items"]]
+    return ORJSONResponse(page)
+
 
-    with session() as db:
-        return paginate(db, post_list_query)
+@router.get("/{post_id}/comments", response_model=List[schemas_v1.CommentTreeNode])
+async def get_post_comments_tree(
+    post_id: PositiveInt,
+    max_depth: Optional[PositiveInt] = Query(None, description="Max nesting level"),
+    session: AsyncSession = Depends(get_session),
+    _: models.User = Depends(get_current_user),
+) -> StreamingResponse:
+    """
+    Get post discussion as a tree of comments (loaded with one query)\n
+    Responses:\n
+    `200` OK - Everything is good (SUCCESS Response)\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    `404` NOT_FOUND - Post not found\n
+    `422` UNPROCESSABLE_ENTITY - Failed field validation\n
+    """
+    post_exists = (await session.execute(models.Post.exists(id=post_id))).scalar()
+    if not post_exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Post not found",
+        )
+    rows = await session.execute(get_comment_tree_query(post_id, max_depth))
+    tree = build_comment_tree(rows)
+    return StreamingResponse(stream_json_list(tree), media_type="application/json")
@@ -0,0 +1,85 @@
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Depends
+
+from db.pool import get_pool_stats
+from db.session import async_engine
+from service.core.cache import user_cache
+from service.core.dependencies import get_admin_user
+from service.core.profiling import ProfilingRoute
+from service.core.rate_limit import rate_limiter
+from service.core.response_cache import comment_response_cache, post_response_cache
+from service.core.security import jwt_codec, password_hasher
+from service.core.timeline import post_timelines
+from service.moderation import moderation_worker, profanity_matcher
+from service.schemas import v1 as schemas_v1
+
+# Metrics of the workers are for operators only
+router = APIRouter(route_class=ProfilingRoute, dependencies=[Depends(get_admin_user)])
+
+
+@router.get("/password-hasher/", response_model=schemas_v1.ExecutorStats)
+async def password_hasher_stats() -> Dict[str, Any]:
+    """
+    Return password hasher pool metrics (queue depth, rejected tasks)\n
+    Responses:\n
+    `200` OK - Everything is good (SUCCESS Response)\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    `403` FORBIDDEN - Invalid authorization or user isn't an admin\n
+    """
+    return password_hasher.stats()
+
+
+@router.get("/caches/", response_model=List[schemas_v1.CacheStats])
+async def caches_stats() -> List[Dict[str, Any]]:
+    """
+    Return caches metrics (size, hits and misses)\n
+    Responses:\n
+    `200` OK - Everything is good (SUCCESS Response)\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    `403` FORBIDDEN - Invalid authorization or user isn't an admin\n
+    """
+    return [
+        user_cache.stats(),
+        post_response_cache.stats(),
+        comment_response_cache.stats(),
+        profanity_matcher.stats(),
+        jwt_codec.stats(),
+        post_timelines.stats(),
+    ]
+
+
+@router.get("/moderation/", response_model=schemas_v1.ModerationStats)
+async def moderation_stats() -> Dict[str, Any]:
+    """
+    Return moderation worker metrics (mode, queue depth, checked rows)\n
+    Responses:\n
+    `200` OK - Everything is good (SUCCESS Response)\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    `403` FORBIDDEN - Invalid authorization or user isn't an admin\n
+    """
+    return moderation_worker.stats()
+
+
+@router.get("/db-pool/", response_model=schemas_v1.PoolStats)
+async def db_pool_stats() -> Dict[str, Any]:
+    """
+    Return DB connection pool metrics (checked out connections, wait time)\n
+    Responses:\n
+    `200` OK - Everything is good (SUCCESS Response)\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    `403` FORBIDDEN - Invalid authorization or user isn't an admin\n
+    """
+    return get_pool_stats(async_engine)
+
+
+@router.get("/rate-limits/", response_model=schemas_v1.RateLimitStats)
+async def rate_limits_stats() -> Dict[str, Any]:
+    """
+    Return rate limit rules and shed load (429 limited, 503 shed requests)\n
+    Responses:\n
+    `200` OK - Everything is good (SUCCESS Response)\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    `403` FORBIDDEN - Invalid authorization or user isn't an admin\n
+    """
+    return rate_limiter.stats()
@@ -1,21 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import UJSONResponse
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from db import constants, models
-from db.session import DBSession
 from service.core import settings
-from service.core.dependencies import get_refresh_token, get_session
-from service.core.security import (create_jwt_token, hash_password,
-                                   verify_password)
+from service.core.dependencies import (
+    get_refresh_token,
+    get_session,
+    get_session_factory,
+)
+from service.core.profiling import ProfilingRoute
+from service.core.security import (
+    async_hash_password,
+    async_verify_password,
+    create_jwt_token,
+)
 from service.schemas import v1 as schemas_v1
 
-router = APIRouter()
+router = APIRouter(route_class=ProfilingRoute)
 
 
 @router.post("/access-token/", response_model=schemas_v1.JWTTokensResponse)
 async def login(
-    form_data: schemas_v1.Auth = Depends(), session: DBSession = Depends(get_session)
-) -> UJSONResponse:
+    form_data: schemas_v1.Auth = Depends(),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+) -> ORJSONResponse:
     """
     Login\n
     Obtain email and password, and return access and refresh tokens for future requests\n
@@ -24,21 +33,22 @@ async def login(
     `403` FORBIDDEN - Invalid password\n
     `404` NOT_FOUND - User is inactive or not found\n
     `422` UNPROCESSABLE_ENTITY - Failed field validation\n
+    `503` SERVICE_UNAVAILABLE - Too many authentication requests\n
     """
-    # Get user
+    # Get user, connection is returned to the pool before password check
     user_query = models.User.get_one(email=form_data.email)
-    with session() as db:
-        user = db.scalars(user_query).one_or_none()
+    async with session_factory() as session:
+        user = (await session.scalars(user_query)).one_or_none()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
     # Verify password
-    if not verify_password(form_data.password, user.password):
+    if not await async_verify_password(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Invalid credentials"
         )
-    return UJSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "access_token": create_jwt_token(user.id),
@@ -55,8 +65,8 @@ async def login(
 @router.post("/refresh-token/", response_model=schemas_v1.JWTTokensResponse)
 async def refresh_token(
     token_data: schemas_v1.JWTTokenPayload = Depends(get_refresh_token),
-    session: DBSession = Depends(get_session),
-) -> UJSONResponse:
+    session: AsyncSession = Depends(get_session),
+) -> ORJSONResponse:
     """
     Refresh token\n
     Obtain refresh token  return access tokens and refresh token\n
@@ -68,10 +78,9 @@ async def refresh_token(
     """
     # Checking existing user
     exists_query = models.User.exists(
-        id=token_data.pk,
+        id=int(token_data.pk),
     )
-    with session() as db:
-        user_exists = db.execute(exists_query).scalar()
+    user_exists = (await session.execute(exists_query)).scalar()
 
     if not user_exists:
         raise HTTPException(
@@ -79,7 +88,7 @@ async def refresh_token(
             detail="User blocked or not found",
         )
     # Return new JWT tokens
-    return UJSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "access_token": create_jwt_token(token_data.pk),
@@ -100,8 +109,8 @@ async def refresh_token(
 )
 async def user_sign_up(
     form_data: schemas_v1.SignUp = Depends(),
-    session: DBSession = Depends(get_session),
-) -> UJSONResponse:
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+) -> ORJSONResponse:
     """
     Sign Up User. Return User\n
     Responses:\n
@@ -109,10 +118,12 @@ async def user_sign_up(
     `404` NOT_FOUND - Group not found\n
     `409` CONFLICT - User with this email exists\n
     `422` UNPROCESSABLE_ENTITY - Failed field validation\n
+    `503` SERVICE_UNAVAILABLE - Too many authentication requests\n
     """
+    # Short sessions, so connection isn't held while password is hashed
     email_exists_query = models.User.exists(email=form_data.email)
-    with session() as db:
-        email_exists = db.execute(email_exists_query).scalar()
+    async with session_factory() as session:
+        email_exists = (await session.execute(email_exists_query)).scalar()
     if email_exists:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -122,16 +133,14 @@ async def user_sign_up(
     user = models.User(
         name=form_data.name,
         email=form_data.email,
-        password=hash_password(form_data.password),
+        password=await async_hash_password(form_data.password),
     )
-
-    with session() as db:
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+    async with session_factory() as session:
+        session.add(user)
+        await session.commit()
 
     # Return JWT tokens
-    return UJSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_201_CREATED,
         content={
             "access_token": create_jwt_token(user.id),
@@ -1,18 +1,25 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
+from pydantic import PositiveInt
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from db import models
-from db.session import DBSession
 from service.core.dependencies import (get_access_token, get_current_user,
                                        get_session)
+from service.core.profiling import ProfilingRoute
+from service.core.serializers import post_serializer
+from service.core.timeline import get_user_feed, post_timelines
 from service.schemas import v1 as schemas_v1
 
-router = APIRouter()
+router = APIRouter(route_class=ProfilingRoute)
 
 
 @router.get("/me/", response_model=schemas_v1.UserBase)
 async def user_me(
     token_payload: schemas_v1.JWTTokenPayload = Depends(get_access_token),
-    session: DBSession = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     user: models.User = Depends(get_current_user),
 ) -> models.User:
     """
@@ -24,3 +31,34 @@ async def user_me(
     `422` UNPROCESSABLE_ENTITY - Failed field validation\n
     """
     return user
+
+
+@router.get("/{user_id}/posts", response_model=schemas_v1.CursorPage[schemas_v1.Post])
+async def get_user_posts(
+    user_id: PositiveInt,
+    cursor: Optional[str] = Query(None, description="`next_cursor` of previous page"),
+    size: int = Query(50, ge=1, le=100),
+    session: AsyncSession = Depends(get_session),
+    _: models.User = Depends(get_current_user),
+):
+    """
+    Get unblocked posts of the user, newest first\n
+    Recent pages are served from the precomputed timeline\n
+    Responses:\n
+    `200` OK - Everything is good (SUCCESS Response)\n
+    `400` BAD_REQUEST - Invalid cursor\n
+    `401` UNAUTHORIZED - You have not provided authorization token\n
+    """
+    page = await post_timelines.get_page(
+        session,
+        get_user_feed(user_id),
+        [
+            models.Post.user_id == user_id,
+            ~models.Post.is_blocked,
+            ~models.Post.is_pending,
+        ],
+        size=size,
+        cursor=cursor,
+    )
+    page["items"] = [post_serializer.dump(post) for post in page["items"]]
+    return ORJSONResponse(page)
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+import ujson
+from redis import RedisError
+from redis.asyncio import Redis
+
+from service.core import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """In-process LRU cache with TTL and hit/miss counters"""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return value without changing LRU order and hit/miss counters"""
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            return None
+        return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value for `ttl` seconds (cache TTL by default)"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCache:
+    """Shared cache tier (between all workers) backed by Redis"""
+
+    def __init__(self, url: str, prefix: str, ttl: int) -> None:
+        self.client = Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key: Hashable) -> str:
+        return f"{self.prefix}:{key}"
+
+    async def get(self, key: Hashable) -> Optional[bytes]:
+        try:
+            value = await self.client.get(self._key(key))
+        except RedisError as e:
+            # Redis is a cache only, DB is used if it's unavailable
+            self.errors += 1
+            logger.warning(f"Redis cache get failed: {e}")
+            return None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: Hashable, value: bytes | str) -> None:
+        try:
+            await self.client.set(self._key(key), value, ex=self.ttl)
+        except RedisError as e:
+            self.errors += 1
+            logger.warning(f"Redis cache set failed: {e}")
+
+    async def delete(self, key: Hashable) -> None:
+        try:
+            await self.client.delete(self._key(key))
+        except RedisError as e:
+            self.errors += 1
+            logger.warning(f"Redis cache delete failed: {e}")
+
+
+class TieredCache:
+    """
+    In-process LRU cache in front of optional Redis cache
+
+    Local tier stores python objects, Redis tier stores values
+    serialized with `dumps` and restored with `loads`
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: int,
+        redis_url: Optional[str] = None,
+        dumps: Callable[[Any], str] = ujson.dumps,
+        loads: Callable[[bytes | str], Any] = ujson.loads,
+    ) -> None:
+        self.name = name
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.remote = (
+            RedisCache(url=redis_url, prefix=f"cache:{name}", ttl=ttl)
+            if redis_url
+            else None
+        )
+        self.dumps = dumps
+        self.loads = loads
+        # Redis deletes started by `discard`, referenced until they are done
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None or self.remote is None:
+            return value
+        raw_value = await self.remote.get(key)
+        if raw_value is None:
+            return None
+        value = self.loads(raw_value)
+        self.local.set(key, value)
+        return value
+
+    async def set(self, key: Hashable, value: Any) -> None:
+        self.local.set(key, value)
+        if self.remote is not None:
+            await self.remote.set(key, self.dumps(value))
+
+    async def delete(self, key: Hashable) -> None:
+        self.local.delete(key)
+        if self.remote is not None:
+            await self.remote.delete(key)
+
+    def discard(self, key: Hashable) -> None:
+        """Sync version of `delete` (for ORM events), Redis key is removed in task"""
+        self.local.delete(key)
+        if self.remote is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.remote.delete(key))
+        self.tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Cache {self.name} delete failed: {task.exception()}")
+
+    def clear(self) -> None:
+        """Clear local tier"""
+        self.local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache metrics"""
+        return {
+            "name": self.name,
+            "size": len(self.local),
+            "maxsize": self.local.maxsize,
+            "ttl": self.local.ttl,
+            "hits": self.local.hits,
+            "misses": self.local.misses,
+            "redis_enabled": self.remote is not None,
+            "redis_hits": self.remote.hits if self.remote else 0,
+            "redis_misses": self.remote.misses if self.remote else 0,
+            "redis_errors": self.remote.errors if self.remote else 0,
+        }
+
+
+# Authenticated users cache, keyed by JWT `pk`
+user_cache = TieredCache(
+    name="user",
+    maxsize=settings.USER_CACHE_SIZE,
+    ttl=settings.USER_CACHE_TTL,
+    redis_url=settings.REDIS_URL,
+)
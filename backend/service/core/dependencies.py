@@ -1,17 +1,46 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict
+
 from fastapi import Depends, HTTPException, status
 from jose import jwt
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
 
 from db import constants, models
-from db.session import DBSession
+from db.session import AsyncDBSession
 from service.core import settings
 from service.schemas import v1 as schemas_v1
 
-from .security import APIKeyHeader
+from .cache import user_cache
+from .profiling import profile_span
+from .security import APIKeyHeader, jwt_codec
+
+# User fields kept in cache, password hash is never cached
+CACHED_USER_FIELDS = ("id", "email", "name", "created_at")
+
 
+def get_session_factory() -> async_sessionmaker[AsyncSession]:
+    """Return async DB session maker"""
+    return AsyncDBSession
 
-def get_session() -> DBSession:
-    """Return DB session and close after using"""
-    return DBSession
+
+async def get_session(
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+) -> AsyncIterator[AsyncSession]:
+    """
+    Yield request-scoped DB session (unit of work)
+
+    Session is committed once, after the endpoint returns,
+    and rolled back if the endpoint raises an error
+    """
+    async with session_factory() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
 
 
 async def get_jwt_token(
@@ -19,16 +48,14 @@ async def get_jwt_token(
 ) -> schemas_v1.JWTTokenPayload:
     """Get JWT access or refresh token"""
 
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.HASH_ALGORITHM]
-        )
-        return schemas_v1.JWTTokenPayload(pk=payload["pk"], type=payload["type"])
-    except jwt.JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Could not validate credentials",
-        )
+    with profile_span("get_jwt_token"):
+        try:
+            return jwt_codec.decode(token)
+        except jwt.JWTError:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Could not validate credentials",
+            )
 
 
 async def get_access_token(
@@ -56,16 +83,73 @@ async def get_refresh_token(
 
 
 async def get_current_user(
-    session: DBSession = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     token_payload: schemas_v1.JWTTokenPayload = Depends(get_access_token),
 ) -> models.User:
-    """Return current user instance"""
-    user_query = models.User.get_one(id=token_payload.pk)
-    with session() as db:
-        user = db.scalars(user_query).one_or_none()
-    if not user:
+    """Return current user instance (from cache if possible)"""
+    with profile_span("get_current_user"):
+        pk = int(token_payload.pk)
+        user_data = await user_cache.get(pk)
+        if user_data is not None:
+            return await load_cached_user(session, user_data)
+
+        user_query = models.User.get_one(id=pk)
+        user = (await session.scalars(user_query)).one_or_none()
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Could not validate credentials",
+            )
+        await user_cache.set(pk, dump_cached_user(user))
+        return user
+
+
+async def get_admin_user(
+    current_user: models.User = Depends(get_current_user),
+) -> models.User:
+    """Return current user if its email is in `ADMIN_EMAILS`"""
+    if current_user.email not in settings.ADMIN_EMAILS:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Could not validate credentials",
+            detail="Admin access required",
         )
-    return user
+    return current_user
+
+
+def dump_cached_user(user: models.User) -> Dict[str, Any]:
+    """Convert user instance to JSON compatible dict for cache"""
+    user_data = {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+    user_data["created_at"] = user_data["created_at"].isoformat()
+    return user_data
+
+
+async def load_cached_user(
+    session: AsyncSession, user_data: Dict[str, Any]
+) -> models.User:
+    """Attach cached user to the request session without DB query"""
+    user = models.User(
+        **{**user_data, "created_at": datetime.fromisoformat(user_data["created_at"])}
+    )
+    # Mark instance as loaded from DB, so merge doesn't emit SELECT
+    make_transient_to_detached(user)
+    return await session.merge(user, load=False)
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def invalidate_cached_user(mapper, connection, target: models.User) -> None:
+    """
+    Drop changed user from cache after commit
+
+    Events are emitted on flush, a concurrent request could cache the old
+    row again before the commit. ORM bulk UPDATE/DELETE statements don't
+    emit these events, call `user_cache.discard(pk)` after them
+    """
+    session = object_session(target)
+    session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def discard_changed_users(session: Session) -> None:
+    for pk in session.info.pop("changed_user_ids", ()):
+        user_cache.discard(pk)
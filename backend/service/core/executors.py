@@ -0,0 +1,82 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+
+class ExecutorSaturated(Exception):
+    """Raised when executor queue is full and new task can't be accepted"""
+
+
+class BoundedExecutor:
+    """
+    Run blocking (CPU bound) functions in a worker pool outside the event loop
+
+    Pool accepts at most `max_workers + queue_limit` tasks at the same time,
+    all others are rejected with `ExecutorSaturated` (backpressure).
+    Counters are changed only from the event loop, so no locks are needed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        queue_limit: int,
+        use_processes: bool = False,
+    ) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self.use_processes = use_processes
+        # Pool is created on first use, so it isn't inherited by forked workers
+        self._executor: Optional[Executor] = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=self.name
+                )
+        return self._executor
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.queue_limit
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """Run function in the pool or raise ExecutorSaturated"""
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise ExecutorSaturated(f"{self.name} executor is saturated")
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, partial(func, *args))
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return current executor metrics"""
+        return {
+            "name": self.name,
+            "pool": "process" if self.use_processes else "thread",
+            "max_workers": self.max_workers,
+            "queue_limit": self.queue_limit,
+            "running": min(self.in_flight, self.max_workers),
+            "queue_depth": max(self.in_flight - self.max_workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        """Stop pool workers"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
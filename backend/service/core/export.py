@@ -0,0 +1,122 @@
+import csv
+import io
+from datetime import date, datetime, time, timedelta
+from enum import Enum
+from typing import AsyncIterator, List, Optional, Sequence
+
+import orjson
+from fastapi import HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Column, Row, Select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from service.core import settings
+
+
+class ExportFormat(str, Enum):
+    """Export file formats"""
+
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+class ExportFilters:
+    """Export query parameters shared by posts and comments"""
+
+    def __init__(
+        self,
+        export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+        user_id: Optional[int] = Query(None, description="Author id"),
+        date_from: Optional[date] = Query(None, description="Created on or after"),
+        date_to: Optional[date] = Query(None, description="Created on or before"),
+        is_blocked: Optional[bool] = Query(None),
+    ) -> None:
+        if date_from and date_to and date_from > date_to:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="date_from must not be after date_to",
+            )
+        self.export_format = export_format
+        self.user_id = user_id
+        self.date_from = date_from
+        self.date_to = date_to
+        self.is_blocked = is_blocked
+
+    def get_filters(self, model, user_column: Column) -> list:
+        """Build filters of the model query, `user_column` is the author FK"""
+        filters = []
+        if self.user_id is not None:
+            filters.append(user_column == self.user_id)
+        if self.date_from:
+            filters.append(
+                model.created_at >= datetime.combine(self.date_from, time.min)
+            )
+        if self.date_to:
+            next_day = datetime.combine(self.date_to + timedelta(days=1), time.min)
+            filters.append(model.created_at < next_day)
+        if self.is_blocked is not None:
+            filters.append(model.is_blocked == self.is_blocked)
+        return filters
+
+
+def encode_ndjson(columns: List[str], rows: Sequence[Row]) -> bytes:
+    return b"".join(orjson.dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def encode_csv(rows: Sequence[Sequence]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # Dates are written in ISO format, same as in NDJSON
+    writer.writerows(
+        [value.isoformat() if isinstance(value, datetime) else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+async def stream_export(
+    session_factory: async_sessionmaker[AsyncSession],
+    query: Select,
+    export_format: ExportFormat,
+) -> AsyncIterator[bytes]:
+    """
+    Encode query rows chunk by chunk from a server-side cursor
+
+    Request session is closed before the body is sent, so the export
+    has its own session (and holds one pool connection while streaming)
+    """
+    query = query.execution_options(yield_per=settings.EXPORT_CHUNK_SIZE)
+    async with session_factory() as session:
+        result = await session.stream(query)
+        columns = list(result.keys())
+        if export_format == ExportFormat.CSV:
+            yield encode_csv([columns])
+        async for rows in result.partitions():
+            if export_format == ExportFormat.CSV:
+                yield encode_csv(rows)
+            else:
+                yield encode_ndjson(columns, rows)
+
+
+def export_response(
+    session_factory: async_sessionmaker[AsyncSession],
+    query: Select,
+    export_format: ExportFormat,
+    name: str,
+) -> StreamingResponse:
+    """Return streaming response with the file of query rows"""
+    return StreamingResponse(
+        stream_export(session_factory, query, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{name}.{export_format.value}"'
+            )
+        },
+    )
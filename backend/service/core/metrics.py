@@ -0,0 +1,222 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from service.core import settings
+
+# Seconds, from cached responses to slow exports
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CHECK_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+QUERY_OPERATIONS = {"select", "insert", "update", "delete", "with"}
+
+# Values of every worker are written to files in PROMETHEUS_MULTIPROC_DIR,
+# gauges are summed over live workers
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "status"]
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response is sent",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests in flight", multiprocess_mode="livesum"
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "DB queries per request",
+    ["method", "route"],
+    buckets=QUERIES_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "DB queries time per request",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "DB query time (requests and background workers)",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity_connections",
+    "Pool size and max overflow",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections in use",
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Connection checkout time", buckets=LATENCY_BUCKETS
+)
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Connection checkout timeouts")
+MODERATION_CHECK_DURATION = Histogram(
+    "moderation_check_duration_seconds",
+    "Profanity check time of one text",
+    ["cache"],
+    buckets=CHECK_BUCKETS,
+)
+MODERATION_BATCH_DURATION = Histogram(
+    "moderation_batch_duration_seconds",
+    "Async moderation batch time",
+    buckets=LATENCY_BUCKETS,
+)
+MODERATION_ROWS = Counter(
+    "moderation_rows_total", "Moderated rows", ["model", "verdict"]
+)
+
+
+class QueryStats:
+    """DB queries of the current request"""
+
+    __slots__ = ("count", "time")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.time = 0.0
+
+
+request_queries: ContextVar[Optional[QueryStats]] = ContextVar(
+    "request_queries", default=None
+)
+
+
+def get_operation(statement: str) -> str:
+    operation = statement.lstrip().split(" ", 1)[0].lower()
+    return operation if operation in QUERY_OPERATIONS else "other"
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, many) -> None:
+    # Queries of one connection are sequential, so one start time is enough
+    conn.info["query_started_at"] = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, many) -> None:
+    started_at = conn.info.pop("query_started_at", None)
+    if started_at is None:
+        return
+    duration = time.perf_counter() - started_at
+    DB_QUERY_DURATION.labels(get_operation(statement)).observe(duration)
+    # Greenlets of async engine share the context of the request task
+    stats = request_queries.get()
+    if stats is not None:
+        stats.count += 1
+        stats.time += duration
+
+
+def instrument_queries(engine: AsyncEngine) -> None:
+    """Measure every query of the engine and count queries per request"""
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+
+
+def get_route_path(scope: Scope) -> str:
+    """
+    Return path template of the request route
+
+    Middleware responses (429 of rate limits, 503 of load shedding) are sent
+    before routing, so their route is matched like the router does
+    """
+    route = scope.get("route")
+    if route is None:
+        partial = None
+        for app_route in scope["app"].router.routes:
+            match, _ = app_route.matches(scope)
+            if match == Match.FULL:
+                route = app_route
+                break
+            if match == Match.PARTIAL and partial is None:
+                partial = app_route
+        route = route or partial
+    return getattr(route, "path", "unmatched")
+
+
+class MetricsMiddleware:
+    """
+    Count requests and measure their latency and DB queries per route
+
+    Route is the path template (e.g. `/api/v1/post/{post_id}`), so labels
+    don't grow with ids. Latency and queries are taken when the last body
+    chunk is sent, background tasks after the response aren't included
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+        started_at = time.perf_counter()
+        stats = QueryStats()
+        token = request_queries.set(stats)
+        status_code = 500
+        observed = False
+
+        def observe() -> None:
+            nonlocal observed
+            observed = True
+            route_path = get_route_path(scope)
+            method = scope["method"]
+            REQUESTS.labels(method, route_path, str(status_code)).inc()
+            REQUEST_DURATION.labels(method, route_path).observe(
+                time.perf_counter() - started_at
+            )
+            REQUEST_DB_QUERIES.labels(method, route_path).observe(stats.count)
+            REQUEST_DB_DURATION.labels(method, route_path).observe(stats.time)
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                observe()
+
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            request_queries.reset(token)
+            if not observed:
+                observe()
+
+
+def is_multiprocess() -> bool:
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def generate_metrics() -> bytes:
+    """Return metrics in Prometheus text format (of all workers in multiprocess mode)"""
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_worker_dead(pid: Optional[int] = None) -> None:
+    """Drop live gauges of the stopped worker (current process by default)"""
+    if is_multiprocess():
+        multiprocess.mark_process_dead(pid or os.getpid())
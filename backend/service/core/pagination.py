@@ -0,0 +1,76 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import ujson
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import BaseModel
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    """Create opaque cursor from the last row keyset"""
+    data = ujson.dumps([created_at.isoformat(), pk])
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Return keyset (created_at, id) from cursor or raise `400`"""
+    try:
+        created_at, pk = ujson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = datetime.fromisoformat(created_at)
+        # `created_at` columns are naive, aware value can't be compared with them
+        if created_at.tzinfo is not None:
+            raise ValueError("Cursor timestamp has time zone")
+        return created_at, int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+def encode_rank_cursor(rank: float, pk: int) -> str:
+    """Create opaque cursor from the last search result (rank, id)"""
+    return base64.urlsafe_b64encode(ujson.dumps([rank, pk]).encode()).decode()
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, int]:
+    """Return search keyset (rank, id) from cursor or raise `400`"""
+    try:
+        rank, pk = ujson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+async def paginate_keyset(
+    session: AsyncSession,
+    model: type[BaseModel],
+    size: int,
+    cursor: Optional[str] = None,
+    filters: list = None,
+    load: list = None,
+    **kwargs,
+) -> Dict[str, Any]:
+    """
+    Return one page of rows ordered by (created_at, id) newest first
+
+    One extra row is fetched to know if the next page exists,
+    so no COUNT(*) query is needed
+    """
+    after = decode_cursor(cursor) if cursor else None
+    page_query = model.get_page(
+        limit=size + 1, after=after, filters=filters, load=load, **kwargs
+    )
+    items: List[BaseModel] = list((await session.scalars(page_query)).unique())
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return {"items": items, "next_cursor": next_cursor, "size": size}
@@ -0,0 +1,345 @@
+import functools
+import inspect
+import logging
+import os
+import queue
+import random
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from service.core import settings
+
+from .metrics import get_operation
+
+logger = logging.getLogger(__name__)
+
+# Statements which can be explained without side effects (EXPLAIN doesn't run them)
+EXPLAIN_OPERATIONS = {"select", "insert", "update", "delete", "with"}
+
+
+# Listener threads of the file loggers, they write queued records to files
+file_listeners: Dict[str, QueueListener] = {}
+
+
+def get_file_logger(name: str, file_name: str) -> logging.Logger:
+    """
+    Return logger writing JSON lines to a rotating file in `PROFILING_LOG_DIR`
+
+    Records are queued, the file is written by a listener thread,
+    so the event loop isn't blocked by disk I/O
+    """
+    file_logger = logging.getLogger(name)
+    if name not in file_listeners:
+        os.makedirs(settings.PROFILING_LOG_DIR, exist_ok=True)
+        handler = RotatingFileHandler(
+            os.path.join(settings.PROFILING_LOG_DIR, file_name),
+            maxBytes=settings.PROFILING_LOG_MAX_BYTES,
+            backupCount=settings.PROFILING_LOG_BACKUPS,
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        records = queue.SimpleQueue()
+        listener = QueueListener(records, handler)
+        listener.start()
+        file_listeners[name] = listener
+        file_logger.handlers = [QueueHandler(records)]
+        file_logger.setLevel(logging.INFO)
+        file_logger.propagate = False
+    return file_logger
+
+
+def stop_file_loggers() -> None:
+    """Write queued records and close log files (call on shutdown)"""
+    for name, listener in list(file_listeners.items()):
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        logging.getLogger(name).handlers.clear()
+    file_listeners.clear()
+
+
+def write_record(name: str, file_name: str, record: Dict[str, Any]) -> None:
+    get_file_logger(name, file_name).info(orjson.dumps(record).decode())
+
+
+def to_ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+class RequestProfile:
+    """Spans and SQL statements of one profiled request, offsets are in ms"""
+
+    def __init__(self, method: str, path: str) -> None:
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.started_at = time.perf_counter()
+        self.handler_started_at = self.started_at
+        self.endpoint_finished_at = self.started_at
+        self.spans: List[Dict[str, Any]] = []
+        self.queries: List[Dict[str, Any]] = []
+
+    def add_span(self, name: str, started_at: float) -> None:
+        self.spans.append(
+            {
+                "name": name,
+                "start": to_ms(started_at - self.started_at),
+                "duration": to_ms(time.perf_counter() - started_at),
+            }
+        )
+
+    def add_query(
+        self, statement: str, started_at: float, duration: float, rows: Optional[int]
+    ) -> None:
+        self.queries.append(
+            {
+                "statement": statement,
+                "start": to_ms(started_at - self.started_at),
+                "duration": to_ms(duration),
+                "rows": rows,
+            }
+        )
+
+    def to_dict(self, status_code: int) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": status_code,
+            "duration": to_ms(time.perf_counter() - self.started_at),
+            "db_queries": len(self.queries),
+            "db_duration": round(sum(query["duration"] for query in self.queries), 3),
+            "spans": self.spans,
+            "queries": self.queries,
+        }
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "current_profile", default=None
+)
+
+
+class profile_span:
+    """
+    Record a span of the profiled request (no-op if it isn't profiled)
+
+    Usage: `with profile_span("moderation"): ...`
+    """
+
+    __slots__ = ("name", "profile", "started_at")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.profile = current_profile.get()
+
+    def __enter__(self) -> "profile_span":
+        if self.profile is not None:
+            self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.profile is not None:
+            self.profile.add_span(self.name, self.started_at)
+
+
+def profile_endpoint(endpoint: Callable) -> Callable:
+    """Wrap endpoint, so the profile has dependencies, endpoint and serialization"""
+
+    def start(profile: RequestProfile) -> float:
+        # Request parsing and dependencies are resolved before the endpoint
+        profile.add_span("dependencies", profile.handler_started_at)
+        return time.perf_counter()
+
+    def finish(profile: RequestProfile, started_at: float) -> None:
+        profile.add_span("endpoint", started_at)
+        profile.endpoint_finished_at = time.perf_counter()
+
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            profile = current_profile.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            started_at = start(profile)
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                finish(profile, started_at)
+
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        # Sync endpoints run in the thread pool with a copy of the context
+        profile = current_profile.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        started_at = start(profile)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            finish(profile, started_at)
+
+    return wrapper
+
+
+class ProfilingRoute(APIRoute):
+    """
+    Route splitting profiled requests into dependencies, endpoint
+    and serialization (response model validation and rendering)
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs: Any) -> None:
+        # Signature is read through `__wrapped__`, so dependencies are the same
+        super().__init__(path, profile_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def profiled_handler(request: Request) -> Response:
+            profile = current_profile.get()
+            if profile is None:
+                return await handler(request)
+            profile.route = self.path
+            profile.handler_started_at = time.perf_counter()
+            try:
+                response = await handler(request)
+            except Exception:
+                if profile.endpoint_finished_at < profile.handler_started_at:
+                    # Dependency or validation failed, endpoint wasn't called
+                    profile.add_span("dependencies", profile.handler_started_at)
+                raise
+            if profile.endpoint_finished_at > profile.handler_started_at:
+                profile.add_span("serialization", profile.endpoint_finished_at)
+            return response
+
+        return profiled_handler
+
+
+def is_profiled(scope: Scope) -> bool:
+    """Check profiling header or sample the request"""
+    header = settings.PROFILING_HEADER.lower().encode()
+    for name, value in scope["headers"]:
+        if name == header:
+            return value == b"1"
+    return random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests with `PROFILING_HEADER: 1` or sampled ones
+    and write their breakdown to the profile log (if `PROFILING_ENABLED`)
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not settings.PROFILING_ENABLED
+            or not is_profiled(scope)
+        ):
+            return await self.app(scope, receive, send)
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = current_profile.set(profile)
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_profile.reset(token)
+            write_record(
+                "profiling.requests", "profile.log", profile.to_dict(status_code)
+            )
+
+
+def get_row_count(cursor) -> Optional[int]:
+    if cursor.rowcount >= 0:
+        return cursor.rowcount
+    # asyncpg adapter buffers SELECT rows and reports rowcount -1
+    rows = getattr(cursor, "_rows", None)
+    return len(rows) if rows is not None else None
+
+
+def explain(conn, statement: str, parameters: Any) -> Optional[str]:
+    """
+    Return plan of the statement, it's run in a new cursor of the same connection
+
+    EXPLAIN runs in a savepoint, so its error doesn't abort the transaction
+    """
+    if get_operation(statement) not in EXPLAIN_OPERATIONS:
+        return None
+    explain_cursor = conn.connection.cursor()
+    try:
+        explain_cursor.execute("SAVEPOINT profiling_explain")
+        try:
+            explain_cursor.execute(f"EXPLAIN {statement}", parameters)
+            plan = "\n".join(row[0] for row in explain_cursor.fetchall())
+        except Exception:
+            explain_cursor.execute("ROLLBACK TO SAVEPOINT profiling_explain")
+            raise
+        explain_cursor.execute("RELEASE SAVEPOINT profiling_explain")
+        return plan
+    except Exception as e:
+        logger.warning(f"Slow query can't be explained: {e}")
+        return None
+    finally:
+        explain_cursor.close()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, many) -> None:
+    conn.info["profile_query_started_at"] = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, many) -> None:
+    started_at = conn.info.pop("profile_query_started_at", None)
+    if started_at is None:
+        return
+    duration = time.perf_counter() - started_at
+    profile = current_profile.get()
+    threshold = settings.SLOW_QUERY_THRESHOLD
+    is_slow = bool(threshold) and duration >= threshold
+    if profile is None and not is_slow:
+        return
+    rows = get_row_count(cursor)
+    if profile is not None:
+        profile.add_query(statement, started_at, duration, rows)
+    if is_slow:
+        plan = None
+        if settings.SLOW_QUERY_EXPLAIN and not many:
+            plan = explain(conn, statement, parameters)
+        # Parameters aren't written, they can have personal data
+        write_record(
+            "profiling.slow_queries",
+            "slow_queries.log",
+            {
+                "time": time.time(),
+                "route": profile.route if profile else None,
+                "duration": to_ms(duration),
+                "rows": rows,
+                "statement": statement,
+                "plan": plan,
+            },
+        )
+
+
+def instrument_profiling(engine: AsyncEngine) -> None:
+    """Add statements to request profiles and log slow queries of the engine"""
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
@@ -0,0 +1,352 @@
+import logging
+import math
+import time
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import Request, status
+from fastapi.responses import ORJSONResponse
+from jose import JWTError
+from redis import RedisError
+from redis.asyncio import Redis
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from service.core import settings
+
+from .cache import LRUCache
+from .security import jwt_codec
+
+logger = logging.getLogger(__name__)
+
+RATE_PERIODS = {"second": 1, "minute": 60, "hour": 60 * 60}
+
+
+class Rate(NamedTuple):
+    """`count` requests per `period` seconds, bursts up to `count` are allowed"""
+
+    count: int
+    period: int
+
+    @property
+    def per_second(self) -> float:
+        return self.count / self.period
+
+    def __str__(self) -> str:
+        return f"{self.count}/{self.period}s"
+
+
+def parse_rate(value: Optional[str]) -> Optional[Rate]:
+    """Parse rate like "100/minute", empty value or "0" means no limit"""
+    if not value or value == "0":
+        return None
+    count, _, period = value.partition("/")
+    if period not in RATE_PERIODS or not count.isdigit():
+        raise ValueError(f"Invalid rate {value!r}, expected e.g. '100/minute'")
+    return Rate(count=int(count), period=RATE_PERIODS[period])
+
+
+class RateLimitRule(NamedTuple):
+    """
+    Limit of requests matched by method and path prefix
+
+    `key` is "user" (JWT `pk`, client IP for anonymous requests) or "ip".
+    `concurrency` is the max number of requests in flight per worker
+    """
+
+    name: str
+    methods: Tuple[str, ...]
+    paths: Tuple[str, ...]
+    rate: Optional[Rate]
+    key: str = "user"
+    concurrency: int = 0
+
+    def matches(self, method: str, path: str) -> bool:
+        return method in self.methods and path.startswith(self.paths)
+
+
+def get_rate_limit_rules() -> List[RateLimitRule]:
+    """Return route rules (first match is used), default rule is the last one"""
+    return [
+        RateLimitRule(
+            name="auth",
+            methods=("POST",),
+            paths=("/api/v1/auth/",),
+            rate=parse_rate(settings.RATE_LIMIT_AUTH),
+            key="ip",
+        ),
+        RateLimitRule(
+            name="bulk",
+            methods=("POST",),
+            paths=("/api/v1/post/bulk", "/api/v1/comment/bulk"),
+            rate=parse_rate(settings.RATE_LIMIT_BULK),
+            concurrency=settings.CONCURRENCY_LIMIT_BULK,
+        ),
+        RateLimitRule(
+            name="write",
+            methods=("POST", "PUT", "DELETE"),
+            paths=("/api/v1/post/", "/api/v1/comment/"),
+            rate=parse_rate(settings.RATE_LIMIT_WRITE),
+        ),
+        RateLimitRule(
+            name="export",
+            methods=("GET",),
+            paths=("/api/v1/post/export/", "/api/v1/comment/export/"),
+            rate=None,
+            concurrency=settings.CONCURRENCY_LIMIT_EXPORT,
+        ),
+        RateLimitRule(
+            name="search",
+            methods=("GET",),
+            paths=("/api/v1/post/search", "/api/v1/comment/search"),
+            rate=parse_rate(settings.RATE_LIMIT_SEARCH),
+            concurrency=settings.CONCURRENCY_LIMIT_SEARCH,
+        ),
+        RateLimitRule(
+            name="default",
+            methods=("GET", "POST", "PUT", "PATCH", "DELETE"),
+            paths=("/api/",),
+            rate=parse_rate(settings.RATE_LIMIT_DEFAULT),
+        ),
+    ]
+
+
+class MemoryTokenBuckets:
+    """Per worker buckets, limits are multiplied by the number of workers"""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int) -> None:
+        # Bucket is full again after its period, so it expires then
+        self.buckets = LRUCache(maxsize=max_keys, ttl=max(RATE_PERIODS.values()))
+        self.errors = 0
+
+    async def take(self, key: str, rate: Rate) -> float:
+        """Take one token, return 0 if allowed or seconds until the next token"""
+        return (await self.take_all([(key, rate)]))[0]
+
+    async def take_all(self, buckets: List[Tuple[str, Rate]]) -> List[float]:
+        """
+        Take one token from every bucket if all of them have one
+
+        Return seconds until the next token of every bucket (0 if it has one),
+        nothing is taken if any of them is empty
+        """
+        now = time.monotonic()
+        states = []
+        for key, rate in buckets:
+            tokens, updated_at = self.buckets.get(key) or (rate.count, now)
+            tokens = min(rate.count, tokens + (now - updated_at) * rate.per_second)
+            states.append((key, rate, tokens))
+        waits = [
+            (1 - tokens) / rate.per_second if tokens < 1 else 0.0
+            for _, rate, tokens in states
+        ]
+        if not any(waits):
+            for key, rate, tokens in states:
+                self.buckets.set(key, (tokens - 1, now), ttl=rate.period)
+        return waits
+
+    def clear(self) -> None:
+        self.buckets.clear()
+
+
+# Refill buckets and take one token from every bucket atomically if all of them
+# have one. ARGV is now and (per second, burst, ttl) of every key, wait times
+# are returned as strings (Lua numbers are converted to integer replies)
+TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tokens = {}
+local waits = {}
+local limited = false
+for i, key in ipairs(KEYS) do
+    local per_second = tonumber(ARGV[i * 3 - 1])
+    local burst = tonumber(ARGV[i * 3])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local value = tonumber(state[1]) or burst
+    local updated_at = tonumber(state[2]) or now
+    tokens[i] = math.min(burst, value + math.max(0, now - updated_at) * per_second)
+    waits[i] = '0'
+    if tokens[i] < 1 then
+        waits[i] = tostring((1 - tokens[i]) / per_second)
+        limited = true
+    end
+end
+if not limited then
+    for i, key in ipairs(KEYS) do
+        redis.call('HSET', key, 'tokens', tokens[i] - 1, 'ts', now)
+        redis.call('EXPIRE', key, ARGV[i * 3 + 1])
+    end
+end
+return waits
+"""
+
+
+class RedisTokenBuckets:
+    """
+    Buckets shared by all backend workers
+
+    Requests are allowed if Redis is unavailable (limits aren't enforced
+    instead of failing every request)
+    """
+
+    name = "redis"
+    prefix = "rate"
+
+    def __init__(self, url: str) -> None:
+        self.client = Redis.from_url(url, decode_responses=True)
+        self.take_script = self.client.register_script(TAKE_SCRIPT)
+        self.errors = 0
+
+    async def take(self, key: str, rate: Rate) -> float:
+        """Take one token, return 0 if allowed or seconds until the next token"""
+        return (await self.take_all([(key, rate)]))[0]
+
+    async def take_all(self, buckets: List[Tuple[str, Rate]]) -> List[float]:
+        """Take one token from every bucket if all of them have one (see memory)"""
+        keys = [f"{self.prefix}:{key}" for key, _ in buckets]
+        args = [time.time()]
+        for _, rate in buckets:
+            args += [rate.per_second, rate.count, rate.period]
+        try:
+            waits = await self.take_script(keys=keys, args=args)
+        except RedisError as e:
+            self.errors += 1
+            logger.warning(f"Redis rate limit failed: {e}")
+            return [0.0] * len(buckets)
+        return [float(wait) for wait in waits]
+
+    def clear(self) -> None:
+        """Redis buckets are shared, they aren't cleared by one worker"""
+
+
+class RateLimiter:
+    """Route rules, token buckets, in-flight counters and shed load metrics"""
+
+    def __init__(
+        self,
+        rules: List[RateLimitRule],
+        buckets: MemoryTokenBuckets | RedisTokenBuckets,
+    ) -> None:
+        self.rules = rules
+        self.buckets = buckets
+        self.in_flight: Counter[str] = Counter()
+        self.allowed: Counter[str] = Counter()
+        self.limited: Counter[str] = Counter()
+        self.shed: Counter[str] = Counter()
+
+    def get_rules(self, method: str, path: str) -> List[RateLimitRule]:
+        """Return the first matched route rule and the default rule"""
+        rules = []
+        for rule in self.rules:
+            if rule.matches(method, path) and (not rules or rule.name == "default"):
+                rules.append(rule)
+        return rules
+
+    def clear(self) -> None:
+        self.buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return rules and counters of the current worker"""
+        return {
+            "enabled": settings.RATE_LIMIT_ENABLED,
+            "storage": self.buckets.name,
+            "redis_errors": self.buckets.errors,
+            "rules": [
+                {
+                    "name": rule.name,
+                    "key": rule.key,
+                    "rate": str(rule.rate) if rule.rate else None,
+                    "concurrency": rule.concurrency,
+                    "in_flight": self.in_flight[rule.name],
+                    "allowed": self.allowed[rule.name],
+                    "limited": self.limited[rule.name],
+                    "shed": self.shed[rule.name],
+                }
+                for rule in self.rules
+            ],
+        }
+
+
+def get_client_key(request: Request, key: str) -> str:
+    """
+    Return bucket owner: verified user id or client IP
+
+    Behind a proxy the IP is taken from `X-Forwarded-For` by the server
+    (if the proxy is in `FORWARDED_ALLOW_IPS`), otherwise it's the proxy IP
+    """
+    if key == "user":
+        token = request.headers.get("authorization", "").split(" ")[-1]
+        if token:
+            try:
+                # Verified tokens are cached, so this is a dict lookup
+                return f"user:{jwt_codec.decode(token).pk}"
+            except JWTError:
+                pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    """
+    Reject requests over the rate (`429`) or concurrency limit (`503`)
+
+    Both responses have `Retry-After`. Pure ASGI middleware, so streaming
+    responses hold their concurrency slot until the body is sent.
+    Tokens are taken only if the request is allowed by all rules
+    """
+
+    def __init__(self, app: ASGIApp, limiter: Optional[RateLimiter] = None) -> None:
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+        limiter = self.limiter
+        rules = limiter.get_rules(scope["method"], scope["path"])
+        if not rules:
+            return await self.app(scope, receive, send)
+        rule = rules[0]
+        if rule.concurrency and limiter.in_flight[rule.name] >= rule.concurrency:
+            limiter.shed[rule.name] += 1
+            response = ORJSONResponse(
+                {"detail": "Server is busy, try again later"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "1"},
+            )
+            return await response(scope, receive, send)
+        request = Request(scope)
+        rate_rules = [rate_rule for rate_rule in rules if rate_rule.rate is not None]
+        buckets = [
+            (
+                f"{rate_rule.name}:{get_client_key(request, rate_rule.key)}",
+                rate_rule.rate,
+            )
+            for rate_rule in rate_rules
+        ]
+        waits = await limiter.buckets.take_all(buckets) if buckets else []
+        if any(waits):
+            for rate_rule, wait in zip(rate_rules, waits):
+                if wait:
+                    limiter.limited[rate_rule.name] += 1
+            response = ORJSONResponse(
+                {"detail": "Too many requests, try again later"},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(math.ceil(max(waits)))},
+            )
+            return await response(scope, receive, send)
+        limiter.allowed[rule.name] += 1
+        limiter.in_flight[rule.name] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.in_flight[rule.name] -= 1
+
+
+def get_token_buckets() -> MemoryTokenBuckets | RedisTokenBuckets:
+    """Create buckets storage (Redis if `REDIS_URL` is set)"""
+    if settings.REDIS_URL:
+        return RedisTokenBuckets(settings.REDIS_URL)
+    return MemoryTokenBuckets(settings.RATE_LIMIT_MAX_KEYS)
+
+
+rate_limiter = RateLimiter(get_rate_limit_rules(), get_token_buckets())
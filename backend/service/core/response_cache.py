@@ -0,0 +1,87 @@
+from hashlib import blake2b
+from itertools import combinations
+from typing import Dict, Iterable, List
+
+from fastapi import Request, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import models
+from service.core import settings
+from service.core.cache import TieredCache
+from service.core.serializers import Serializer
+
+# All `?expand=` sets of comment response, each one is cached separately
+COMMENT_EXPAND_VARIANTS = [
+    variant
+    for size in range(len(models.Comment.EXPAND_FIELDS) + 1)
+    for variant in combinations(models.Comment.EXPAND_FIELDS, size)
+]
+
+
+def create_response_cache(name: str) -> TieredCache:
+    """
+    Create cache of serialized responses
+
+    Redis is the only tier if it's enabled, so invalidation is seen by all
+    workers. Without Redis the local tier is used by a single worker only,
+    gunicorn config sets `RESPONSE_CACHE_SIZE=0` for more workers (others
+    would serve stale bodies and `304` until TTL)
+    """
+    return TieredCache(
+        name=name,
+        maxsize=0 if settings.REDIS_URL else settings.RESPONSE_CACHE_SIZE,
+        ttl=settings.RESPONSE_CACHE_TTL,
+        redis_url=settings.REDIS_URL,
+    )
+
+
+# Serialized responses keyed by id, invalidated on update and delete
+post_response_cache = create_response_cache("post_response")
+comment_response_cache = create_response_cache("comment_response")
+
+
+def get_response_key(pk: int, expand: Iterable[str] = ()) -> str:
+    """Return cache key of response with expanded relationships"""
+    return ":".join([str(pk), *sorted(expand)])
+
+
+def dump_response(
+    serializer: Serializer, instance: models.BaseModel, expand: Iterable[str] = ()
+) -> Dict:
+    """Serialize instance and compute its ETag"""
+    body = serializer.dump_json(instance, expand)
+    # ETag is a body digest, `is_blocked` and nested objects change it as well
+    etag = blake2b(body, digest_size=16).hexdigest()
+    return {"etag": f'"{etag}"', "body": body.decode()}
+
+
+def get_cached_response(request: Request, cached: Dict) -> Response:
+    """Return `304` if client has the same version or cached body"""
+    headers = {"ETag": cached["etag"], "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    client_etags = {
+        etag.strip().removeprefix("W/") for etag in if_none_match.split(",")
+    }
+    if cached["etag"] in client_etags or "*" in client_etags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=cached["body"], media_type=ORJSONResponse.media_type, headers=headers
+    )
+
+
+async def get_post_comment_ids(session: AsyncSession, post_id: int) -> List[int]:
+    """Return ids of post comments (post is nested in cached comments)"""
+    comment_ids_query = models.Comment.get_all(fields=["id"], post_id=post_id)
+    return (await session.scalars(comment_ids_query)).all()
+
+
+async def invalidate_responses(
+    post_ids: Iterable[int] = (), comment_ids: Iterable[int] = ()
+) -> None:
+    """Remove cached posts and comments (call after commit)"""
+    for post_id in post_ids:
+        await post_response_cache.delete(post_id)
+    for comment_id in comment_ids:
+        for expand in COMMENT_EXPAND_VARIANTS:
+            await comment_response_cache.delete(get_response_key(comment_id, expand))
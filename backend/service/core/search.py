@@ -0,0 +1,79 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Select, cast, func, select, tuple_
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import constants
+from db.models import BaseModel
+from service.core import settings
+
+from .pagination import decode_rank_cursor, encode_rank_cursor
+
+
+def escape_html(text):
+    """SQL expression escaping HTML, so only headline markers are tags"""
+    for char, entity in (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;")):
+        text = func.replace(text, char, entity)
+    return text
+
+
+def get_search_query(
+    model: type[BaseModel],
+    q: str,
+    limit: int,
+    after: Optional[Tuple[float, int]] = None,
+    load: list = None,
+) -> Select:
+    """
+    Build DB query for a page of unblocked rows matching `q`, best match first
+
+    Pending rows are skipped until they are checked. Rows are found with the GIN index of `search_vector` and ordered by
+    (rank, id), `after` is a (rank, id) of the last row from the previous page.
+    Headlines are built only for the rows of the page
+    """
+    config = cast(constants.SEARCH_CONFIG, REGCONFIG)
+    ts_query = func.websearch_to_tsquery(config, q)
+    rank = func.ts_rank_cd(model.search_vector, ts_query)
+    matches_query = select(model.id, rank.label("rank")).where(
+        model.search_vector.bool_op("@@")(ts_query),
+        ~model.is_blocked,
+        ~model.is_pending,
+    )
+    if after:
+        matches_query = matches_query.where(tuple_(rank, model.id) < after)
+    page = matches_query.order_by(rank.desc(), model.id.desc()).limit(limit).subquery()
+    headline = func.ts_headline(
+        config,
+        escape_html(model.text),
+        ts_query,
+        settings.SEARCH_HEADLINE_OPTIONS,
+    )
+    page_query = (
+        select(model, page.c.rank, headline.label("headline"))
+        .join(page, model.id == page.c.id)
+        .order_by(page.c.rank.desc(), page.c.id.desc())
+    )
+    if load:
+        page_query = page_query.options(*load)
+    return page_query
+
+
+async def search_page(
+    session: AsyncSession,
+    model: type[BaseModel],
+    q: str,
+    size: int,
+    cursor: Optional[str] = None,
+    load: list = None,
+) -> Dict[str, Any]:
+    """Return one page of search results as (instance, rank, headline) rows"""
+    after = decode_rank_cursor(cursor) if cursor else None
+    page_query = get_search_query(model, q, size + 1, after=after, load=load)
+    rows: List[Any] = list((await session.execute(page_query)).unique())
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last_row = rows[-1]
+        next_cursor = encode_rank_cursor(last_row.rank, last_row[0].id)
+    return {"items": rows, "next_cursor": next_cursor, "size": size}
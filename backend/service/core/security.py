@@ -1,19 +1,115 @@
 import base64
+import time
 from datetime import datetime, timedelta
+from hashlib import blake2b
+from pathlib import Path
 from string import ascii_letters
-from typing import Final, Optional
+from typing import Any, Dict, Final, Optional
 
 from fastapi import HTTPException, Request, status
 from fastapi.openapi.models import APIKey, APIKeyIn
 from fastapi.security.api_key import APIKeyBase
-from jose import jwt
+from jose import jwk, jwt
 from passlib.context import CryptContext
+from pydantic import ValidationError
 
 from db.constants import JWTType
 from service.core import settings
+from service.schemas import v1 as schemas_v1
+
+from .cache import LRUCache
+from .executors import BoundedExecutor, ExecutorSaturated
 
 HASH_ALGORITHM: Final[str] = "HS256"
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Dedicated pool for bcrypt, keeps event loop free during login/sign-up bursts
+password_hasher = BoundedExecutor(
+    name="password_hasher",
+    max_workers=settings.PASSWORD_HASHER_WORKERS,
+    queue_limit=settings.PASSWORD_HASHER_QUEUE_LIMIT,
+    use_processes=settings.PASSWORD_HASHER_POOL == "process",
+)
+
+
+class JWTCodec:
+    """
+    Sign and verify JWT tokens with keys constructed once
+
+    Verified payloads are cached by token hash until the token expires,
+    so repeated requests with the same token skip signature and claims checks
+    """
+
+    name = "jwt"
+
+    def __init__(
+        self,
+        algorithm: str = settings.HASH_ALGORITHM,
+        secret_key: Optional[str] = settings.SECRET_KEY,
+        private_key: Optional[str] = None,
+        public_key: Optional[str] = None,
+        cache_size: int = settings.JWT_CACHE_SIZE,
+        cache_ttl: int = settings.JWT_CACHE_TTL,
+    ) -> None:
+        self.algorithm = algorithm
+        if algorithm.startswith("HS"):
+            self.signing_key = jwk.construct(secret_key, algorithm)
+            self.verification_key = self.signing_key
+        else:
+            if not public_key:
+                raise ValueError(f"Public key is required for {algorithm} tokens")
+            self.verification_key = jwk.construct(public_key, algorithm)
+            # Services which only verify tokens don't have the private key
+            self.signing_key = (
+                jwk.construct(private_key, algorithm) if private_key else None
+            )
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        if self.signing_key is None:
+            raise RuntimeError("JWT private key isn't configured")
+        return jwt.encode(claims, self.signing_key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> schemas_v1.JWTTokenPayload:
+        """Return verified token payload or raise `JWTError`"""
+        key = blake2b(token.encode(), digest_size=16).digest()
+        payload = self.cache.get(key)
+        if payload is not None:
+            return payload
+        claims = jwt.decode(token, self.verification_key, algorithms=[self.algorithm])
+        try:
+            payload = schemas_v1.JWTTokenPayload(pk=claims["pk"], type=claims["type"])
+        except (KeyError, ValidationError):
+            raise jwt.JWTError("Invalid token payload")
+        # Cached payload must not outlive the token
+        expires_in = claims["exp"] - time.time() if "exp" in claims else None
+        self.cache.set(key, payload, ttl=expires_in)
+        return payload
+
+    def stats(self) -> Dict[str, Any]:
+        """Return verified tokens cache metrics"""
+        return {
+            "name": self.name,
+            "size": len(self.cache),
+            "maxsize": self.cache.maxsize,
+            "ttl": self.cache.ttl,
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+            "redis_enabled": False,
+            "redis_hits": 0,
+            "redis_misses": 0,
+            "redis_errors": 0,
+        }
+
+
+def read_key_file(path: Optional[str]) -> Optional[str]:
+    """Return PEM key from file (keys are read once at startup)"""
+    return Path(path).read_text() if path else None
+
+
+jwt_codec = JWTCodec(
+    private_key=read_key_file(settings.JWT_PRIVATE_KEY_PATH),
+    public_key=read_key_file(settings.JWT_PUBLIC_KEY_PATH),
+)
 
 
 def create_jwt_token(pk: int | str, jwt_type: JWTType = JWTType.ACCESS) -> str:
@@ -34,10 +130,7 @@ def create_jwt_token(pk: int | str, jwt_type: JWTType = JWTType.ACCESS) -> str:
         "exp": expire,
         "type": jwt_type.value,
     }
-    encoded_jwt = jwt.encode(
-        to_encode, settings.SECRET_KEY, algorithm=settings.HASH_ALGORITHM
-    )
-    return encoded_jwt
+    return jwt_codec.encode(to_encode)
 
 
 class APIKeyHeader(APIKeyBase):
@@ -77,6 +170,28 @@ def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def run_in_password_hasher(func, *args):
+    """Run password function in the hasher pool, `503` if pool is saturated"""
+    try:
+        return await password_hasher.run(func, *args)
+    except ExecutorSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, try again later",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def async_verify_password(password: str, hashed_password: str) -> bool:
+    """Verify password in the hasher pool"""
+    return await run_in_password_hasher(verify_password, password, hashed_password)
+
+
+async def async_hash_password(password: str) -> str:
+    """Create hashed password in the hasher pool"""
+    return await run_in_password_hasher(hash_password, password)
+
+
 def create_tmp_token(pk: int | str, exp: float = settings.TMP_TOKEN_LIFETIME) -> str:
     """
     Generate and return token
@@ -0,0 +1,106 @@
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+    get_args,
+    get_origin,
+)
+
+import orjson
+from fastapi import Response, status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+from service.schemas import v1 as schemas_v1
+
+# Built serializers by schema (nested and recursive schemas are built once)
+_serializers: Dict[Type[BaseModel], "Serializer"] = {}
+
+
+def get_nested_schema(annotation: Any) -> Tuple[Optional[Type[BaseModel]], bool]:
+    """Return nested schema of field annotation and is it a list"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    origin = get_origin(annotation)
+    if origin in (list, List):
+        schema, _ = get_nested_schema(get_args(annotation)[0])
+        return schema, True
+    if origin is Union:
+        # Optional[Schema]
+        for arg in get_args(annotation):
+            schema, is_list = get_nested_schema(arg)
+            if schema is not None:
+                return schema, is_list
+    return None, False
+
+
+class Serializer:
+    """
+    Dump trusted ORM objects to JSON with response schema fields
+
+    Fields are read once from the schema, so objects loaded from DB are
+    serialized without pydantic validation (FastAPI `response_model` path).
+    Optional nested objects are expandable: they are dumped only if listed
+    in `expand`, so their relationships don't have to be loaded
+    """
+
+    def __init__(self, schema: Type[BaseModel]) -> None:
+        self.schema = schema
+        _serializers[schema] = self
+        self.fields = []
+        for name, field in schema.model_fields.items():
+            default = None if field.default is PydanticUndefined else field.default
+            nested_schema, is_list = get_nested_schema(field.annotation)
+            nested = get_serializer(nested_schema) if nested_schema else None
+            expandable = not is_list and nested is not None and not field.is_required()
+            self.fields.append((name, default, nested, is_list, expandable))
+
+    def dump(self, obj: Any, expand: Iterable[str] = ()) -> Dict[str, Any]:
+        """Return dict with JSON types (datetimes are encoded by orjson)"""
+        data = {}
+        for name, default, nested, is_list, expandable in self.fields:
+            if expandable and name not in expand:
+                data[name] = default
+                continue
+            value = getattr(obj, name, default)
+            if nested is not None and value is not None:
+                if is_list:
+                    value = [nested.dump(item) for item in value]
+                else:
+                    value = nested.dump(value)
+            data[name] = value
+        return data
+
+    def dump_json(self, obj: Any, expand: Iterable[str] = ()) -> bytes:
+        return orjson.dumps(self.dump(obj, expand))
+
+    def response(
+        self,
+        obj: Any,
+        status_code: int = status.HTTP_200_OK,
+        expand: Iterable[str] = (),
+    ) -> Response:
+        """Return ready response, FastAPI doesn't validate it again"""
+        return Response(
+            content=self.dump_json(obj, expand),
+            status_code=status_code,
+            media_type=ORJSONResponse.media_type,
+        )
+
+
+def get_serializer(schema: Type[BaseModel]) -> Serializer:
+    """Return serializer of schema (built on first call)"""
+    serializer = _serializers.get(schema)
+    if serializer is None:
+        serializer = Serializer(schema)
+    return serializer
+
+
+post_serializer = get_serializer(schemas_v1.Post)
+comment_serializer = get_serializer(schemas_v1.Comment)
@@ -13,6 +13,18 @@ class Settings(BaseSettings):
     SERVER_HOST: str = os.getenv("SERVER_HOST")
     BACKEND_HOST: str = os.getenv("BACKEND_HOST", "0.0.0.0")
     BACKEND_PORT: int = os.getenv("BACKEND_PORT", 8000)
+    # Every worker has its own DB pool, see PSQL_POOL_SIZE. Workers are async,
+    # so one per CPU is enough (gunicorn starts fewer if DB pools don't fit)
+    BACKEND_WORKERS: int = os.getenv("BACKEND_WORKERS", os.cpu_count())
+    # Worker is restarted after this number of requests (plus random jitter,
+    # so workers don't restart at once), 0 disables restarts
+    BACKEND_MAX_REQUESTS: int = os.getenv("BACKEND_MAX_REQUESTS", 10_000)
+    BACKEND_MAX_REQUESTS_JITTER: int = os.getenv("BACKEND_MAX_REQUESTS_JITTER", 1_000)
+    # Seconds to finish requests in flight after SIGTERM
+    BACKEND_GRACEFUL_TIMEOUT: int = os.getenv("BACKEND_GRACEFUL_TIMEOUT", 30)
+    # Worker is killed and restarted if it doesn't respond for this time
+    BACKEND_TIMEOUT: int = os.getenv("BACKEND_TIMEOUT", 60)
+    BACKEND_KEEPALIVE: int = os.getenv("BACKEND_KEEPALIVE", 5)
 
     PROJECT_NAME: str = os.getenv("PROJECT_NAME")
     VERSION: str = os.getenv("VERSION")
@@ -34,10 +46,22 @@ class Settings(BaseSettings):
         elif isinstance(value, (list, str)):
             return value
 
+    # ADMIN_EMAILS is a JSON-formatted list of users allowed to read `/system/`
+    # metrics, e.g: '["admin@example.com"]'
+    ADMIN_EMAILS: List[str] = []
+
     #######
     # JWT #
     #######
-    HASH_ALGORITHM: str = "HS256"
+    # HS256 signs with SECRET_KEY, RS256/ES256 use PEM keys below, so other
+    # services can verify tokens with the public key only
+    HASH_ALGORITHM: str = os.getenv("HASH_ALGORITHM", "HS256")
+    # Private key is needed only to issue tokens
+    JWT_PRIVATE_KEY_PATH: Optional[str] = os.getenv("JWT_PRIVATE_KEY_PATH")
+    JWT_PUBLIC_KEY_PATH: Optional[str] = os.getenv("JWT_PUBLIC_KEY_PATH")
+    # Verified tokens (keyed by token hash), entries expire with the token
+    JWT_CACHE_SIZE: int = os.getenv("JWT_CACHE_SIZE", 10_000)
+    JWT_CACHE_TTL: int = os.getenv("JWT_CACHE_TTL", 60 * 5)  # 5 minutes
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 1 day
     JWT_REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 30  # 1 month
 
@@ -46,6 +70,15 @@ class Settings(BaseSettings):
     #############
     TMP_TOKEN_LIFETIME: int = 30  # 30 minutes
 
+    ###################
+    # PASSWORD HASHER #
+    ###################
+    # bcrypt runs in a separate pool: "thread" (bcrypt releases the GIL) or "process"
+    PASSWORD_HASHER_POOL: str = os.getenv("PASSWORD_HASHER_POOL", "thread")
+    PASSWORD_HASHER_WORKERS: int = os.getenv("PASSWORD_HASHER_WORKERS", 2)
+    # Max number of waiting tasks, all next requests get `503`
+    PASSWORD_HASHER_QUEUE_LIMIT: int = os.getenv("PASSWORD_HASHER_QUEUE_LIMIT", 32)
+
     #############
     # DATABASES #
     #############
@@ -58,6 +91,24 @@ class Settings(BaseSettings):
     PSQL_DB_URI: Optional[str] = None
     PSQL_TEST_DB_URI: Optional[str] = None
 
+    # Async pool of every backend worker, up to
+    # BACKEND_WORKERS * (PSQL_POOL_SIZE + PSQL_POOL_MAX_OVERFLOW) connections
+    PSQL_POOL_SIZE: int = os.getenv("PSQL_POOL_SIZE", 5)
+    PSQL_POOL_MAX_OVERFLOW: int = os.getenv("PSQL_POOL_MAX_OVERFLOW", 5)
+    # Seconds to wait for a free connection before an error
+    PSQL_POOL_TIMEOUT: float = os.getenv("PSQL_POOL_TIMEOUT", 10)
+    # Connections older than this number of seconds are reopened
+    PSQL_POOL_RECYCLE: int = os.getenv("PSQL_POOL_RECYCLE", 60 * 30)
+    # Pre-ping costs a round-trip on every checkout, without it a dropped
+    # connection fails one query and the pool is invalidated
+    PSQL_POOL_PRE_PING: bool = os.getenv("PSQL_POOL_PRE_PING", False)
+    # Server-side timeout of API queries in milliseconds (0 - no timeout)
+    PSQL_STATEMENT_TIMEOUT: int = os.getenv("PSQL_STATEMENT_TIMEOUT", 30_000)
+    # Startup check of pools size against max_connections: "warn", "error", "off"
+    PSQL_POOL_CHECK: str = os.getenv("PSQL_POOL_CHECK", "warn")
+    # Connections kept free for migrations, scripts and admin sessions
+    PSQL_RESERVED_CONNECTIONS: int = os.getenv("PSQL_RESERVED_CONNECTIONS", 5)
+
     @field_validator("PSQL_DB_URI")
     def build_db_uri(cls, v: Optional[str], info: ConfigDict) -> Any:
         values = info.data
@@ -82,6 +133,145 @@ class Settings(BaseSettings):
             values.get("PSQL_TEST_DB_NAME"),
         )
 
+    # Async PSQL (asyncpg driver)
+    PSQL_ASYNC_DB_URI: Optional[str] = None
+    PSQL_TEST_ASYNC_DB_URI: Optional[str] = None
+
+    @field_validator("PSQL_ASYNC_DB_URI")
+    def build_async_db_uri(cls, v: Optional[str], info: ConfigDict) -> Any:
+        values = info.data
+        if isinstance(v, str):
+            return v
+        return "postgresql+asyncpg://{}:{}@{}:5432/{}".format(
+            values.get("PSQL_USER"),
+            values.get("PSQL_PASSWORD"),
+            values.get("PSQL_SERVER"),
+            values.get("PSQL_DB_NAME"),
+        )
+
+    @field_validator("PSQL_TEST_ASYNC_DB_URI")
+    def build_test_async_db_uri(cls, v: Optional[str], info: ConfigDict) -> Any:
+        values = info.data
+        if isinstance(v, str):
+            return v
+        return "postgresql+asyncpg://{}:{}@{}:5432/{}".format(
+            values.get("PSQL_USER"),
+            values.get("PSQL_PASSWORD"),
+            values.get("PSQL_SERVER"),
+            values.get("PSQL_TEST_DB_NAME"),
+        )
+
+    #########
+    # CACHE #
+    #########
+    # Redis is optional, in-process cache is used only if it isn't set
+    # e.g: redis://redis:6379/0
+    REDIS_URL: Optional[str] = os.getenv("REDIS_URL")
+    USER_CACHE_SIZE: int = os.getenv("USER_CACHE_SIZE", 10_000)
+    USER_CACHE_TTL: int = os.getenv("USER_CACHE_TTL", 60)  # 1 minute
+    # Serialized GET /post/{id} and GET /comment/{id} responses
+    RESPONSE_CACHE_SIZE: int = os.getenv("RESPONSE_CACHE_SIZE", 10_000)
+    RESPONSE_CACHE_TTL: int = os.getenv("RESPONSE_CACHE_TTL", 60 * 5)  # 5 minutes
+
+    # Feeds of the last unblocked posts (GET /post/latest, GET /user/{id}/posts),
+    # stored in Redis if REDIS_URL is set
+    TIMELINE_SIZE: int = os.getenv("TIMELINE_SIZE", 500)
+    # In-process feeds are rebuilt from DB after TTL (posts of other workers)
+    TIMELINE_TTL: int = os.getenv("TIMELINE_TTL", 30)
+    TIMELINE_MAX_FEEDS: int = os.getenv("TIMELINE_MAX_FEEDS", 1000)
+    # Inactive Redis feeds expire (rebuilt on the next read)
+    TIMELINE_REDIS_TTL: int = os.getenv("TIMELINE_REDIS_TTL", 60 * 60 * 24)  # 1 day
+
+    ##############
+    # MODERATION #
+    ##############
+    # Memoized profanity verdicts (keyed by text hash)
+    PROFANITY_CACHE_SIZE: int = os.getenv("PROFANITY_CACHE_SIZE", 10_000)
+    PROFANITY_CACHE_TTL: int = os.getenv("PROFANITY_CACHE_TTL", 60 * 60 * 24)  # 1 day
+    # "sync" - text is checked in the request, "async" - post/comment is stored
+    # as pending and checked by background worker (write doesn't wait for it)
+    MODERATION_MODE: str = os.getenv("MODERATION_MODE", "sync")
+    # Async mode queue: "memory" (per backend worker) or "redis" (REDIS_URL stream)
+    MODERATION_QUEUE: str = os.getenv("MODERATION_QUEUE", "memory")
+    MODERATION_BATCH_SIZE: int = os.getenv("MODERATION_BATCH_SIZE", 100)
+    MODERATION_BATCH_WAIT: float = os.getenv("MODERATION_BATCH_WAIT", 0.1)  # seconds
+    # Rows pending longer than this are enqueued again (lost tasks, restarts)
+    MODERATION_SWEEP_INTERVAL: int = os.getenv("MODERATION_SWEEP_INTERVAL", 60)
+
+    ########
+    # BULK #
+    ########
+    # Max items of POST /post/bulk and POST /comment/bulk
+    BULK_CREATE_MAX_ITEMS: int = os.getenv("BULK_CREATE_MAX_ITEMS", 5000)
+    # Batches of this size and bigger are inserted with COPY
+    BULK_COPY_MIN_ITEMS: int = os.getenv("BULK_COPY_MIN_ITEMS", 1000)
+
+    ##########
+    # EXPORT #
+    ##########
+    # Rows fetched from the server-side cursor and sent per chunk
+    EXPORT_CHUNK_SIZE: int = os.getenv("EXPORT_CHUNK_SIZE", 1000)
+
+    ##########
+    # SEARCH #
+    ##########
+    # `ts_headline` options of search results, text is HTML escaped
+    SEARCH_HEADLINE_OPTIONS: str = os.getenv(
+        "SEARCH_HEADLINE_OPTIONS",
+        "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2",
+    )
+
+    ##############
+    # RATE LIMIT #
+    ##############
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", True)
+    # Token buckets, e.g. "100/minute" (second, minute, hour), "0" - no limit.
+    # Buckets are shared by workers if REDIS_URL is set, otherwise per worker
+    # Every /api/ request, per user (client IP for anonymous requests)
+    RATE_LIMIT_DEFAULT: str = os.getenv("RATE_LIMIT_DEFAULT", "1200/minute")
+    # Sign in, sign up and token refresh, per client IP
+    RATE_LIMIT_AUTH: str = os.getenv("RATE_LIMIT_AUTH", "30/minute")
+    # Post and comment create, update and delete, per user
+    RATE_LIMIT_WRITE: str = os.getenv("RATE_LIMIT_WRITE", "120/minute")
+    RATE_LIMIT_BULK: str = os.getenv("RATE_LIMIT_BULK", "10/minute")
+    RATE_LIMIT_SEARCH: str = os.getenv("RATE_LIMIT_SEARCH", "120/minute")
+    # Max in-process buckets (least recently used are dropped)
+    RATE_LIMIT_MAX_KEYS: int = os.getenv("RATE_LIMIT_MAX_KEYS", 100_000)
+    # Max requests in flight per worker, others get 503 (0 - no limit)
+    CONCURRENCY_LIMIT_BULK: int = os.getenv("CONCURRENCY_LIMIT_BULK", 4)
+    CONCURRENCY_LIMIT_EXPORT: int = os.getenv("CONCURRENCY_LIMIT_EXPORT", 2)
+    CONCURRENCY_LIMIT_SEARCH: int = os.getenv("CONCURRENCY_LIMIT_SEARCH", 20)
+    # Comma separated IPs of proxies (Traefik, nginx) trusted to send client IP
+    # in X-Forwarded-For, "*" trusts every peer. Anonymous rate limits are per
+    # client IP, without it all clients behind a proxy share its bucket
+    FORWARDED_ALLOW_IPS: str = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+    ###########
+    # METRICS #
+    ###########
+    # GET /metrics in Prometheus format. With several workers set
+    # PROMETHEUS_MULTIPROC_DIR env to an empty directory, so it has all of them
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", True)
+
+    #############
+    # PROFILING #
+    #############
+    # Requests with PROFILING_HEADER: 1 or sampled ones are profiled (spans and
+    # SQL statements), profiles are written to PROFILING_LOG_DIR/profile.log
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", False)
+    PROFILING_HEADER: str = os.getenv("PROFILING_HEADER", "X-Profile")
+    PROFILING_SAMPLE_RATE: float = os.getenv("PROFILING_SAMPLE_RATE", 0.0)
+    PROFILING_LOG_DIR: str = os.getenv(
+        "PROFILING_LOG_DIR",
+        os.path.abspath(os.path.join(os.path.dirname(__file__), "../../logs")),
+    )
+    PROFILING_LOG_MAX_BYTES: int = os.getenv("PROFILING_LOG_MAX_BYTES", 10_000_000)
+    PROFILING_LOG_BACKUPS: int = os.getenv("PROFILING_LOG_BACKUPS", 5)
+    # Queries slower than this (seconds) are written to slow_queries.log,
+    # 0 - disabled. EXPLAIN adds a round trip to every slow query
+    SLOW_QUERY_THRESHOLD: float = os.getenv("SLOW_QUERY_THRESHOLD", 0)
+    SLOW_QUERY_EXPLAIN: bool = os.getenv("SLOW_QUERY_EXPLAIN", False)
+
     ###########
     # ADMINER #
     ###########
@@ -0,0 +1,410 @@
+import logging
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from redis import RedisError
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import models
+from service.core import settings
+
+from .cache import LRUCache
+from .pagination import decode_cursor, encode_cursor, paginate_keyset
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+LATEST_FEED = "latest"
+
+# (created_at in microseconds, post id), feeds are ordered by it newest first
+FeedEntry = Tuple[int, int]
+
+
+class FeedPost(NamedTuple):
+    """Post added to or removed from timelines"""
+
+    id: int
+    user_id: int
+    created_at: datetime
+
+
+def get_score(created_at: datetime) -> int:
+    """Return exact microseconds timestamp (Postgres timestamps precision)"""
+    return (created_at - EPOCH) // timedelta(microseconds=1)
+
+
+def get_created_at(score: int) -> datetime:
+    return EPOCH + timedelta(microseconds=score)
+
+
+def get_user_feed(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def get_post_feeds(post: FeedPost) -> List[str]:
+    return [LATEST_FEED, get_user_feed(post.user_id)]
+
+
+class MemoryFeed:
+    """Feed entries, `trimmed` if older posts of the feed are only in DB"""
+
+    __slots__ = ("keys", "trimmed")
+
+    def __init__(self, keys: List[Tuple[int, int]], trimmed: bool) -> None:
+        self.keys = keys
+        self.trimmed = trimmed
+
+
+class MemoryTimelines:
+    """
+    Per worker timelines, rebuilt from DB when they expire
+
+    Posts created by other workers appear after the rebuild,
+    so `ttl` is the max delay of the feed
+    """
+
+    name = "memory"
+
+    def __init__(self, size: int, ttl: int, max_feeds: int) -> None:
+        self.size = size
+        # Feed entries are stored negated, ascending, so `bisect` finds cursors
+        self.feeds = LRUCache(maxsize=max_feeds, ttl=ttl)
+
+    async def get(
+        self, feed: str, after: Optional[FeedEntry], limit: int
+    ) -> Optional[List[FeedEntry]]:
+        """Return up to `limit` entries after `after` or None if DB must be used"""
+        memory_feed = self.feeds.get(feed)
+        if memory_feed is None:
+            return None
+        keys = memory_feed.keys
+        start = bisect_right(keys, (-after[0], -after[1])) if after else 0
+        end = start + limit
+        page = keys[start:end]
+        if len(page) < limit and memory_feed.trimmed:
+            # Older posts were trimmed from the timeline (the feed can be
+            # shorter than its size after removes, so the flag is checked)
+            return None
+        return [(-score, -pk) for score, pk in page]
+
+    async def set(self, feed: str, entries: List[FeedEntry]) -> None:
+        keys = sorted((-score, -pk) for score, pk in entries)
+        # Rebuild loads up to `size` posts, there can be older ones
+        self.feeds.set(feed, MemoryFeed(keys, trimmed=len(keys) >= self.size))
+
+    async def add(self, feed: str, entries: List[FeedEntry]) -> None:
+        """Add entries to the feed if it's loaded (missing feed is built on read)"""
+        memory_feed = self.feeds.peek(feed)
+        if memory_feed is None:
+            return
+        keys = memory_feed.keys
+        for score, pk in entries:
+            # Approved post can be in the feed already (like in a sorted set)
+            key = (-score, -pk)
+            index = bisect_left(keys, key)
+            if index == len(keys) or keys[index] != key:
+                keys.insert(index, key)
+        size = self.size
+        if len(keys) > size:
+            del keys[size:]
+            memory_feed.trimmed = True
+
+    async def remove(self, feed: str, post_ids: List[int]) -> None:
+        memory_feed = self.feeds.peek(feed)
+        if memory_feed is None:
+            return
+        removed = {-pk for pk in post_ids}
+        memory_feed.keys = [key for key in memory_feed.keys if key[1] not in removed]
+
+    def clear(self) -> None:
+        self.feeds.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self.feeds),
+            "maxsize": self.feeds.maxsize,
+            "ttl": self.feeds.ttl,
+            "hits": self.feeds.hits,
+            "misses": self.feeds.misses,
+            "redis_enabled": False,
+            "redis_hits": 0,
+            "redis_misses": 0,
+            "redis_errors": 0,
+        }
+
+
+# Page of the feed, `false` (None) if the feed is missing or trimmed before the page
+# (KEYS[2] exists if older posts of the feed were trimmed)
+GET_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return false end
+local start = 0
+if ARGV[1] ~= '' then
+    local rank = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+    if not rank then return false end
+    start = rank + 1
+end
+local limit = tonumber(ARGV[2])
+local page = redis.call('ZREVRANGE', KEYS[1], start, start + limit - 1, 'WITHSCORES')
+if #page < limit * 2 and redis.call('EXISTS', KEYS[2]) == 1 then
+    return false
+end
+return page
+"""
+# Missing feed isn't created, so it's never served partially. Updated feed
+# (and its trimmed flag) lives `ttl` more seconds
+ADD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+for i = 3, #ARGV, 2 do
+    redis.call('ZADD', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+local trimmed = redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -tonumber(ARGV[1]) - 1)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+if trimmed > 0 then
+    redis.call('SET', KEYS[2], 1, 'EX', ARGV[2])
+else
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+end
+return 1
+"""
+
+
+class RedisTimelines:
+    """
+    Sorted sets shared by all backend workers, updated on every write
+
+    Score is `created_at` in microseconds, member is zero-padded id,
+    so posts with the same `created_at` are ordered by id.
+    Redis is a cache only, DB is used if it's unavailable
+    """
+
+    name = "redis"
+    prefix = "timeline"
+
+    def __init__(self, url: str, size: int, ttl: int) -> None:
+        self.client = Redis.from_url(url, decode_responses=True)
+        self.size = size
+        self.ttl = ttl
+        self.get_script = self.client.register_script(GET_SCRIPT)
+        self.add_script = self.client.register_script(ADD_SCRIPT)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, feed: str) -> str:
+        return f"{self.prefix}:{feed}"
+
+    def _trimmed_key(self, feed: str) -> str:
+        return f"{self.prefix}:{feed}:trimmed"
+
+    @staticmethod
+    def _member(pk: int) -> str:
+        return f"{pk:012d}"
+
+    async def get(
+        self, feed: str, after: Optional[FeedEntry], limit: int
+    ) -> Optional[List[FeedEntry]]:
+        """Return up to `limit` entries after `after` or None if DB must be used"""
+        args = [self._member(after[1]) if after else "", limit]
+        keys = [self._key(feed), self._trimmed_key(feed)]
+        try:
+            page = await self.get_script(keys=keys, args=args)
+        except RedisError as e:
+            self.errors += 1
+            logger.warning(f"Redis timeline get failed: {e}")
+            return None
+        if page is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [
+            (int(float(score)), int(member))
+            for member, score in zip(page[::2], page[1::2])
+        ]
+
+    async def set(self, feed: str, entries: List[FeedEntry]) -> None:
+        key = self._key(feed)
+        trimmed_key = self._trimmed_key(feed)
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.delete(key, trimmed_key)
+                if entries:
+                    pipe.zadd(key, {self._member(pk): score for score, pk in entries})
+                    pipe.expire(key, self.ttl)
+                # Rebuild loads up to `size` posts, there can be older ones
+                if len(entries) >= self.size:
+                    pipe.set(trimmed_key, 1, ex=self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            self.errors += 1
+            logger.warning(f"Redis timeline set failed: {e}")
+
+    async def add(self, feed: str, entries: List[FeedEntry]) -> None:
+        args = [self.size, self.ttl]
+        for score, pk in entries:
+            args += [score, self._member(pk)]
+        try:
+            await self.add_script(
+                keys=[self._key(feed), self._trimmed_key(feed)], args=args
+            )
+        except RedisError as e:
+            self.errors += 1
+            logger.warning(f"Redis timeline add failed: {e}")
+
+    async def remove(self, feed: str, post_ids: List[int]) -> None:
+        try:
+            await self.client.zrem(
+                self._key(feed), *[self._member(pk) for pk in post_ids]
+            )
+        except RedisError as e:
+            self.errors += 1
+            logger.warning(f"Redis timeline remove failed: {e}")
+
+    def clear(self) -> None:
+        """Redis feeds are shared, they aren't cleared by one worker"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": 0,
+            "maxsize": 0,
+            "ttl": self.ttl,
+            "hits": 0,
+            "misses": 0,
+            "redis_enabled": True,
+            "redis_hits": self.hits,
+            "redis_misses": self.misses,
+            "redis_errors": self.errors,
+        }
+
+
+class PostTimelines:
+    """
+    Newest first post ids of the latest feed and user feeds
+
+    Feeds keep the last `TIMELINE_SIZE` unblocked posts and are updated
+    after post create, block and delete. Posts are loaded by ids,
+    so deleted or blocked rows are never returned even if a feed is stale
+    """
+
+    def __init__(self, storage: MemoryTimelines | RedisTimelines) -> None:
+        self.storage = storage
+
+    async def get_page(
+        self,
+        session: AsyncSession,
+        feed: str,
+        filters: list,
+        size: int,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Return one page of feed posts (same as `paginate_keyset` page)
+
+        Missing feed is rebuilt from DB on the first page read,
+        pages older than the timeline are read from DB
+        """
+        after = decode_cursor(cursor) if cursor else None
+        after_entry = (get_score(after[0]), after[1]) if after else None
+        entries = await self.storage.get(feed, after_entry, size + 1)
+        if entries is None and after is None:
+            entries = await self.rebuild(session, feed, filters)
+            entries = entries[: size + 1]
+        if entries is None:
+            return await paginate_keyset(
+                session,
+                models.Post,
+                size=size,
+                cursor=cursor,
+                filters=filters,
+                load=[models.Post.load_user()],
+            )
+        page_entries = entries[:size]
+        posts_query = models.Post.get_all(
+            filters=[models.Post.id.in_([pk for _, pk in page_entries]), *filters],
+            load=[models.Post.load_user()],
+        )
+        posts = {
+            post.id: post for post in (await session.scalars(posts_query)).unique()
+        }
+        next_cursor = None
+        if len(entries) > size:
+            # Cursor is the last entry, so filtered out posts don't end the feed
+            score, pk = page_entries[-1]
+            next_cursor = encode_cursor(get_created_at(score), pk)
+        return {
+            "items": [posts[pk] for _, pk in page_entries if pk in posts],
+            "next_cursor": next_cursor,
+            "size": size,
+        }
+
+    async def rebuild(
+        self, session: AsyncSession, feed: str, filters: list
+    ) -> List[FeedEntry]:
+        """
+        Load the last posts of the feed from DB (one index range scan)
+
+        Posts committed after the read were skipped by `add_posts` (the feed
+        was missing), so the feed is read again after it's stored
+        (Read Committed statement sees them) and new entries are added
+        """
+        entries = await self._load_entries(session, filters)
+        await self.storage.set(feed, entries)
+        loaded = set(entries)
+        entries = await self._load_entries(session, filters)
+        new_entries = [entry for entry in entries if entry not in loaded]
+        if new_entries:
+            await self.storage.add(feed, new_entries)
+        return entries
+
+    async def _load_entries(
+        self, session: AsyncSession, filters: list
+    ) -> List[FeedEntry]:
+        entries_query = models.Post.get_all(
+            fields=["id", "created_at"],
+            filters=filters,
+            order_by=[models.Post.created_at.desc(), models.Post.id.desc()],
+        ).limit(self.storage.size)
+        rows = (await session.execute(entries_query)).all()
+        return [(get_score(row.created_at), row.id) for row in rows]
+
+    async def add_posts(self, posts: Iterable[FeedPost]) -> None:
+        """Add new unblocked posts to their feeds (call after commit)"""
+        for feed, feed_posts in self._group_by_feed(posts).items():
+            entries = [(get_score(post.created_at), post.id) for post in feed_posts]
+            await self.storage.add(feed, entries)
+
+    async def remove_posts(self, posts: Iterable[FeedPost]) -> None:
+        """Remove deleted or blocked posts from their feeds"""
+        for feed, feed_posts in self._group_by_feed(posts).items():
+            await self.storage.remove(feed, [post.id for post in feed_posts])
+
+    @staticmethod
+    def _group_by_feed(posts: Iterable[FeedPost]) -> Dict[str, List[FeedPost]]:
+        feeds = defaultdict(list)
+        for post in posts:
+            for feed in get_post_feeds(post):
+                feeds[feed].append(post)
+        return feeds
+
+    def clear(self) -> None:
+        self.storage.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return timelines metrics (in the caches format)"""
+        return {"name": "post_timeline", **self.storage.stats()}
+
+
+def get_timelines_storage() -> MemoryTimelines | RedisTimelines:
+    """Create storage selected in settings (Redis if `REDIS_URL` is set)"""
+    if settings.REDIS_URL:
+        return RedisTimelines(
+            settings.REDIS_URL, settings.TIMELINE_SIZE, settings.TIMELINE_REDIS_TTL
+        )
+    return MemoryTimelines(
+        settings.TIMELINE_SIZE, settings.TIMELINE_TTL, settings.TIMELINE_MAX_FEEDS
+    )
+
+
+post_timelines = PostTimelines(get_timelines_storage())
@@ -1,21 +1,46 @@
-import multiprocessing
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI, Request, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import ValidationException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import UJSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi_pagination import add_pagination
 
+from db.pool import check_pool_capacity
+from db.session import AsyncDBSession, async_engine
 from service.controllers.v1.api import router_v1
 from service.controllers.v1.home import home
 from service.core import settings
+from service.core.metrics import DB_POOL_CAPACITY, MetricsMiddleware, mark_worker_dead
+from service.core.profiling import ProfilingMiddleware, stop_file_loggers
+from service.core.rate_limit import RateLimitMiddleware
+from service.core.security import password_hasher
+from service.moderation import is_async_moderation, moderation_worker
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await check_pool_capacity(async_engine)
+    DB_POOL_CAPACITY.set(settings.PSQL_POOL_SIZE + settings.PSQL_POOL_MAX_OVERFLOW)
+    if is_async_moderation():
+        moderation_worker.start(AsyncDBSession)
+    yield
+    # Stop background workers and worker pools on shutdown
+    await moderation_worker.stop()
+    password_hasher.shutdown()
+    await async_engine.dispose()
+    stop_file_loggers()
+    mark_worker_dead()
+
 
 app = FastAPI(
     title=f"{settings.PROJECT_NAME}",
     version=settings.VERSION,
     openapi_url=f"/openapi.json",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 add_pagination(app)
@@ -23,12 +48,15 @@ add_pagination(app)
 
 @app.exception_handler(ValidationException)
 async def validation_exception_handler(request: Request, exc: ValidationException):
-    return UJSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content=jsonable_encoder({"detail": exc.errors()}),
     )
 
 
+# Added before CORS middleware, so rejected requests get CORS headers too
+app.add_middleware(RateLimitMiddleware)
+
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -39,20 +67,24 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Outermost middlewares, so rejected requests are measured too
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(home.router, tags=["Home"])
 app.include_router(router_v1, prefix=f"/api/v1")
 
-# Params
-max_workers_count = multiprocessing.cpu_count() * 2 + 1
-
 
 if __name__ == "__main__":
+    # Development server with autoreload (one process),
+    # production server is gunicorn, see gunicorn_conf.py
     uvicorn.run(
         "main:app",
         host=settings.BACKEND_HOST,
         port=settings.BACKEND_PORT,
         log_level="info",
         reload=True,
-        workers=max_workers_count,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.FORWARDED_ALLOW_IPS,
     )
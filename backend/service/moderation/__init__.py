@@ -0,0 +1,14 @@
+from .pipeline import ModerationWorker  # noqa
+from .pipeline import ModerationTask, is_async_moderation, moderation_worker
+from .profanity import ProfanityMatcher, profanity_matcher  # noqa
+
+__all__ = (
+    # Profanity
+    "ProfanityMatcher",
+    "profanity_matcher",
+    # Pipeline
+    "ModerationTask",
+    "ModerationWorker",
+    "is_async_moderation",
+    "moderation_worker",
+)
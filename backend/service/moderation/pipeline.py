@@ -0,0 +1,330 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections import Counter, defaultdict, deque
+from datetime import timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from redis import ResponseError
+from redis.asyncio import Redis
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db import models
+from db.utils import get_default_now
+from service.controllers.v1.comment.utils import update_daily_stats
+from service.core import settings
+from service.core.metrics import MODERATION_BATCH_DURATION, MODERATION_ROWS
+from service.core.response_cache import invalidate_responses
+from service.core.timeline import FeedPost, post_timelines
+
+from .profanity import ProfanityMatcher, profanity_matcher
+
+logger = logging.getLogger(__name__)
+
+# Models checked by the moderation worker
+MODERATED_MODELS = {"post": models.Post, "comment": models.Comment}
+
+
+def is_async_moderation() -> bool:
+    """Check if posts and comments are moderated by the background worker"""
+    return settings.MODERATION_MODE == "async"
+
+
+class ModerationTask(NamedTuple):
+    """Pending post or comment, its text is read by the worker"""
+
+    model: str
+    id: int
+
+
+class MemoryModerationQueue:
+    """In-process queue, tasks are checked by the worker of the same process"""
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self.tasks: deque[ModerationTask] = deque()
+
+    async def setup(self) -> None:
+        pass
+
+    async def put(self, tasks: List[ModerationTask]) -> None:
+        self.tasks.extend(tasks)
+
+    async def get_batch(self, size: int, wait: float) -> List[ModerationTask]:
+        """Return up to `size` tasks, wait for `wait` seconds if there are none"""
+        if not self.tasks:
+            # Collect tasks for a while instead of waking up for every task
+            await asyncio.sleep(wait)
+        batch = []
+        while self.tasks and len(batch) < size:
+            batch.append(self.tasks.popleft())
+        return batch
+
+    def depth(self) -> Optional[int]:
+        return len(self.tasks)
+
+
+class RedisModerationQueue:
+    """
+    Redis stream shared by all backend workers (one consumer group)
+
+    Tasks are read without acknowledgement, rows left pending after a failure
+    are enqueued again by the worker sweep
+    """
+
+    name = "redis"
+    stream = "moderation"
+    group = "moderation-workers"
+    max_length = 100_000
+
+    def __init__(self, url: str) -> None:
+        self.client = Redis.from_url(url, decode_responses=True)
+
+    @property
+    def consumer(self) -> str:
+        # Computed on every call, pid changes in forked workers
+        return f"{socket.gethostname()}-{os.getpid()}"
+
+    async def setup(self) -> None:
+        try:
+            await self.client.xgroup_create(
+                self.stream, self.group, id="0", mkstream=True
+            )
+        except ResponseError as e:
+            # Group is already created by another worker
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def put(self, tasks: List[ModerationTask]) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for task in tasks:
+                pipe.xadd(
+                    self.stream,
+                    {"model": task.model, "id": task.id},
+                    maxlen=self.max_length,
+                    approximate=True,
+                )
+            await pipe.execute()
+
+    async def get_batch(self, size: int, wait: float) -> List[ModerationTask]:
+        """Return up to `size` tasks, block for `wait` seconds if there are none"""
+        response = await self.client.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.stream: ">"},
+            count=size,
+            block=int(wait * 1000),
+            noack=True,
+        )
+        return [
+            ModerationTask(model=fields["model"], id=int(fields["id"]))
+            for _, messages in response or []
+            for _, fields in messages
+        ]
+
+    def depth(self) -> Optional[int]:
+        # Stream length isn't the number of unread tasks
+        return None
+
+
+class ModerationWorker:
+    """
+    Background task checking pending posts and comments in batches
+
+    Endpoints store rows with `is_pending` and enqueue them after commit,
+    worker checks current texts with one `check_batch` call per model,
+    blocks bad rows (keeping comments rollup in sync) and clears `is_pending`
+    """
+
+    def __init__(
+        self,
+        queue: MemoryModerationQueue | RedisModerationQueue,
+        matcher: ProfanityMatcher = profanity_matcher,
+        batch_size: int = settings.MODERATION_BATCH_SIZE,
+        batch_wait: float = settings.MODERATION_BATCH_WAIT,
+        sweep_interval: int = settings.MODERATION_SWEEP_INTERVAL,
+    ) -> None:
+        self.queue = queue
+        self.matcher = matcher
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.sweep_interval = sweep_interval
+        self.session_factory: Optional[async_sessionmaker] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.checked = 0
+        self.blocked = 0
+        self.errors = 0
+        self.last_batch_time = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def enqueue(self, tasks: List[ModerationTask]) -> None:
+        """Add tasks to the queue (called after commit)"""
+        try:
+            await self.queue.put(tasks)
+        except Exception:
+            # Rows stay pending and are enqueued again by the sweep
+            self.errors += 1
+            logger.exception("Moderation tasks enqueue failed")
+
+    def start(self, session_factory: async_sessionmaker) -> None:
+        """Run worker in the current event loop"""
+        self.session_factory = session_factory
+        self._task = asyncio.create_task(self._run(), name="moderation-worker")
+
+    async def stop(self) -> None:
+        """Cancel worker, unfinished batch is rolled back and checked later"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_sweep_at = loop.time()
+        is_ready = False
+        while True:
+            try:
+                if not is_ready:
+                    await self.queue.setup()
+                    is_ready = True
+                if loop.time() >= next_sweep_at:
+                    await self.sweep()
+                    next_sweep_at = loop.time() + self.sweep_interval
+                batch = await self.queue.get_batch(self.batch_size, self.batch_wait)
+                if batch:
+                    await self.process_batch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1
+                logger.exception("Moderation batch failed")
+                await asyncio.sleep(self.batch_wait)
+
+    async def sweep(self) -> None:
+        """Enqueue rows pending longer than `sweep_interval`"""
+        stale_before = get_default_now() - timedelta(seconds=self.sweep_interval)
+        tasks = []
+        async with self.session_factory() as session:
+            for name, model in MODERATED_MODELS.items():
+                pending_query = model.get_all(
+                    fields=["id"],
+                    filters=[model.is_pending, model.updated_at < stale_before],
+                ).limit(self.batch_size * 10)
+                for pk in (await session.scalars(pending_query)).all():
+                    tasks.append(ModerationTask(model=name, id=pk))
+        if tasks:
+            logger.warning(f"{len(tasks)} pending rows are enqueued again")
+            await self.enqueue(tasks)
+
+    async def process_batch(self, tasks: List[ModerationTask]) -> None:
+        """Check texts of the batch rows and save verdicts in one transaction"""
+        started_at = time.perf_counter()
+        ids_by_model: Dict[str, Set[int]] = defaultdict(set)
+        for task in tasks:
+            ids_by_model[task.model].add(task.id)
+        blocked_posts = []
+        approved_posts = []
+        async with self.session_factory() as session:
+            for name, ids in ids_by_model.items():
+                blocked_rows, approved_rows = await self._moderate(
+                    session, MODERATED_MODELS[name], ids
+                )
+                if name == "post":
+                    blocked_posts = [FeedPost(*row) for row in blocked_rows]
+                    approved_posts = [FeedPost(*row) for row in approved_rows]
+            # Post is nested in cached comments, so they are invalidated as well
+            comment_ids = set(ids_by_model["comment"])
+            if ids_by_model["post"]:
+                comment_ids_query = models.Comment.get_all(
+                    fields=["id"],
+                    filters=[models.Comment.post_id.in_(ids_by_model["post"])],
+                )
+                comment_ids.update((await session.scalars(comment_ids_query)).all())
+            await session.commit()
+        await invalidate_responses(
+            post_ids=ids_by_model["post"], comment_ids=comment_ids
+        )
+        await post_timelines.remove_posts(blocked_posts)
+        # Pending posts are added to timelines only after they are checked
+        await post_timelines.add_posts(approved_posts)
+        self.batches += 1
+        self.last_batch_time = time.perf_counter() - started_at
+        MODERATION_BATCH_DURATION.observe(self.last_batch_time)
+
+    async def _moderate(
+        self,
+        session: AsyncSession,
+        model: type[models.Post] | type[models.Comment],
+        ids: Set[int],
+    ) -> Tuple[List[Row], List[Row]]:
+        """
+        Block bad rows, return (id, owner id, created_at) of newly blocked
+        and approved (pending clean) ones
+        """
+        # Current text is checked, so task of an edited row is never stale
+        rows_query = model.get_all(fields=["id", "text"], filters=[model.id.in_(ids)])
+        rows = (await session.execute(rows_query)).all()
+        verdicts = await self.matcher.check_batch(row.text for row in rows)
+        blocked_ids = [row.id for row, verdict in zip(rows, verdicts) if verdict]
+        blocked_rows = []
+        owner_id = model.user_id if model is models.Post else model.creator_id
+        if blocked_ids:
+            # Already blocked rows are skipped, so rollup is changed only once
+            block_query = model.update(
+                new_data={"is_blocked": True},
+                filters=[model.id.in_(blocked_ids), ~model.is_blocked],
+            ).returning(model.id, owner_id, model.created_at)
+            blocked_rows = (await session.execute(block_query)).all()
+            if model is models.Comment:
+                days = Counter(row.created_at.date() for row in blocked_rows)
+                await update_daily_stats(
+                    session, {day: (count, -count) for day, count in days.items()}
+                )
+        done_query = model.update(
+            new_data={"is_pending": False},
+            filters=[model.id.in_([row.id for row in rows]), model.is_pending],
+        ).returning(model.id, owner_id, model.created_at, model.is_blocked)
+        done_rows = (await session.execute(done_query)).all()
+        approved_rows = [row[:3] for row in done_rows if not row.is_blocked]
+        self.checked += len(rows)
+        self.blocked += len(blocked_ids)
+        name = model.__name__.lower()
+        MODERATION_ROWS.labels(name, "blocked").inc(len(blocked_ids))
+        MODERATION_ROWS.labels(name, "clean").inc(len(rows) - len(blocked_ids))
+        return blocked_rows, approved_rows
+
+    def stats(self) -> Dict[str, Any]:
+        """Return worker metrics"""
+        return {
+            "mode": settings.MODERATION_MODE,
+            "queue": self.queue.name,
+            "running": self.running,
+            "queue_depth": self.queue.depth(),
+            "batches": self.batches,
+            "checked": self.checked,
+            "blocked": self.blocked,
+            "errors": self.errors,
+            "last_batch_time": self.last_batch_time,
+        }
+
+
+def get_moderation_queue() -> MemoryModerationQueue | RedisModerationQueue:
+    """Create queue selected in settings"""
+    if settings.MODERATION_QUEUE == "redis":
+        return RedisModerationQueue(settings.REDIS_URL)
+    return MemoryModerationQueue()
+
+
+moderation_worker = ModerationWorker(queue=get_moderation_queue())
@@ -0,0 +1,184 @@
+import re
+import threading
+import time
+from hashlib import blake2b
+from typing import Any, Dict, Iterable, List, Optional
+
+from better_profanity.utils import get_complete_path_of_file, read_wordlist
+from fastapi.concurrency import run_in_threadpool
+
+from service.core import settings
+from service.core.cache import LRUCache
+from service.core.metrics import MODERATION_CHECK_DURATION
+from service.core.profiling import profile_span
+
+CHECK_HIT_DURATION = MODERATION_CHECK_DURATION.labels("hit")
+CHECK_MISS_DURATION = MODERATION_CHECK_DURATION.labels("miss")
+
+# Word characters are the same as in better_profanity: letters, digits and @$*"'
+WORD_CHAR = r"[^\W_]|[@$*\"']"
+WORD_START = r"(?<![^\W_])(?<![@$*\"'])"
+WORD_END = r"(?![^\W_])(?![@$*\"'])"
+# Any run of non-word characters separates words of multi-word phrases
+SEPARATOR = r"(?:[^\w@$*\"']|_)+"
+# Letters of a single word can be split into tokens too ("blow jobs",
+# "b i t c h e s"), better_profanity matches concatenated tokens
+OPTIONAL_SEPARATOR = f"(?:{SEPARATOR})?"
+
+# Leetspeak characters with a single meaning are replaced before matching
+LEET_TABLE = str.maketrans(
+    {"4": "a", "0": "o", "3": "e", "$": "s", "5": "s", "7": "t", "v": "u"}
+)
+# Ambiguous characters stay in the text, so wordlist letters accept all of them
+LETTER_VARIANTS = {
+    "a": "a@*",
+    "o": "o@*",
+    "i": "il1*",
+    "l": "l1",
+    "e": "e*",
+    "u": "u*",
+}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase text and replace unambiguous leetspeak characters"""
+    return text.lower().translate(LEET_TABLE)
+
+
+def split_phrase(phrase: str) -> List[str]:
+    """Split normalized phrase into letters and separators (as `SEPARATOR`)"""
+    units = []
+    for char in phrase:
+        if re.fullmatch(WORD_CHAR, char):
+            units.append(char)
+        elif units and units[-1] != SEPARATOR:
+            units.append(SEPARATOR)
+    if units and units[-1] == SEPARATOR:
+        units.pop()
+    return units
+
+
+def trie_to_regex(node: Dict[str, Any]) -> str:
+    """Convert trie to regex, common prefixes are matched only once"""
+    branches = []
+    for unit, child in sorted(node.items()):
+        if unit == "":
+            continue
+        if unit in (SEPARATOR, OPTIONAL_SEPARATOR):
+            unit_regex = unit
+        elif unit in LETTER_VARIANTS:
+            unit_regex = f"[{re.escape(LETTER_VARIANTS[unit])}]"
+        else:
+            unit_regex = re.escape(unit)
+        branches.append(unit_regex + trie_to_regex(child))
+    if not branches:
+        return ""
+    # "" key marks end of a word, the rest of the branch becomes optional
+    if "" in node:
+        return f"(?:{'|'.join(branches)})?"
+    if len(branches) == 1:
+        return branches[0]
+    return f"(?:{'|'.join(branches)})"
+
+
+def compile_wordlist(words: Iterable[str]) -> re.Pattern:
+    """Compile wordlist into one regex built from the words trie"""
+    trie: Dict[str, Any] = {}
+    for word in words:
+        units = split_phrase(normalize_text(word))
+        if not units:
+            continue
+        if SEPARATOR not in units:
+            units = [unit for letter in units for unit in (OPTIONAL_SEPARATOR, letter)]
+            units = units[1:]
+        node = trie
+        for unit in units:
+            node = node.setdefault(unit, {})
+        node[""] = {}
+    return re.compile(f"{WORD_START}(?:{trie_to_regex(trie)}){WORD_END}")
+
+
+class ProfanityMatcher:
+    """
+    Check texts for swear words with a wordlist compiled once
+
+    Matches whole words and phrases like better_profanity does (including
+    leetspeak variants), verdicts are memoized by text hash
+    """
+
+    name = "profanity"
+
+    def __init__(
+        self,
+        words: Optional[Iterable[str]] = None,
+        cache_size: int = settings.PROFANITY_CACHE_SIZE,
+        cache_ttl: int = settings.PROFANITY_CACHE_TTL,
+    ) -> None:
+        if words is None:
+            words = read_wordlist(get_complete_path_of_file("profanity_wordlist.txt"))
+        self.pattern = compile_wordlist(words)
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        # Batches are checked in the thread pool, cache is shared with the loop
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_key(text: str) -> bytes:
+        """Return short text hash, so long texts aren't kept in cache"""
+        return blake2b(text.encode(), digest_size=16).digest()
+
+    def match(self, text: str) -> bool:
+        """Check text without cache"""
+        return self.pattern.search(normalize_text(text)) is not None
+
+    def contains_profanity(self, text: Optional[str]) -> bool:
+        """Return True if text has any swear words"""
+        with profile_span("moderation"):
+            return self._check(text)
+
+    def check_many(self, texts: Iterable[Optional[str]]) -> List[bool]:
+        """Return verdict for every text (in the same order)"""
+        with profile_span("moderation"):
+            return [self._check(text) for text in texts]
+
+    async def check_batch(self, texts: Iterable[Optional[str]]) -> List[bool]:
+        """
+        Return verdict for every text of a big batch (bulk create, moderation)
+
+        Texts are matched in the thread pool, so the event loop isn't blocked
+        """
+        return await run_in_threadpool(self.check_many, list(texts))
+
+    def _check(self, text: Optional[str]) -> bool:
+        if not text:
+            return False
+        started_at = time.perf_counter()
+        key = self.get_key(text)
+        with self.lock:
+            verdict = self.cache.get(key)
+        if verdict is None:
+            verdict = self.match(text)
+            with self.lock:
+                self.cache.set(key, verdict)
+            check_time = CHECK_MISS_DURATION
+        else:
+            check_time = CHECK_HIT_DURATION
+        check_time.observe(time.perf_counter() - started_at)
+        return verdict
+
+    def stats(self) -> Dict[str, Any]:
+        """Return verdicts cache metrics"""
+        return {
+            "name": self.name,
+            "size": len(self.cache),
+            "maxsize": self.cache.maxsize,
+            "ttl": self.cache.ttl,
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+            "redis_enabled": False,
+            "redis_hits": 0,
+            "redis_misses": 0,
+            "redis_errors": 0,
+        }
+
+
+profanity_matcher = ProfanityMatcher()
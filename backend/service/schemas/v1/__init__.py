@@ -1,14 +1,38 @@
 from .auth import Auth, SignUp
-from .comment import (Comment, CommentCreate, CommentsDailyBreakdownResponse,
-                      CommentUpdate, DailyCommentStats, DailyCommentStatsResponse)
+from .bulk import BulkCreateItemResult, BulkCreateResponse
+from .comment import (
+    Comment,
+    CommentBulkCreate,
+    CommentCreate,
+    CommentsDailyBreakdownResponse,
+    CommentSearchResult,
+    CommentTreeNode,
+    CommentUpdate,
+    DailyCommentStats,
+    DailyCommentStatsResponse,
+)
 from .home import HomeResponse
 from .jwt_token import JWTTokenPayload, JWTTokensResponse
-from .post import Post, PostCreate
+from .pagination import CursorPage
+from .post import Post, PostBulkCreate, PostCreate, PostSearchResult
+from .system import (
+    CacheStats,
+    ExecutorStats,
+    ModerationStats,
+    PoolStats,
+    RateLimitRuleStats,
+    RateLimitStats,
+)
 from .user import UserBase
 
 __all__ = (
     # Home
     "HomeResponse",
+    # Pagination
+    "CursorPage",
+    # Bulk
+    "BulkCreateItemResult",
+    "BulkCreateResponse",
     # Auth
     "Auth",
     "SignUp",
@@ -19,12 +43,24 @@ __all__ = (
     "UserBase",
     # Post
     "PostCreate",
+    "PostBulkCreate",
     "Post",
+    "PostSearchResult",
     # comment
     "CommentCreate",
+    "CommentBulkCreate",
     "Comment",
+    "CommentSearchResult",
     "CommentUpdate",
+    "CommentTreeNode",
     "DailyCommentStats",
     "DailyCommentStatsResponse",
     "CommentsDailyBreakdownResponse",
+    # System
+    "ExecutorStats",
+    "CacheStats",
+    "ModerationStats",
+    "PoolStats",
+    "RateLimitRuleStats",
+    "RateLimitStats",
 )
@@ -0,0 +1,20 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class BulkCreateItemResult(BaseModel):
+    """Result of one item, `index` is its position in the request"""
+
+    index: int
+    id: Optional[int] = None
+    is_blocked: bool = False
+    is_pending: bool = False
+    error: Optional[str] = None
+
+
+class BulkCreateResponse(BaseModel):
+    created: int
+    blocked: int
+    failed: int
+    items: List[BulkCreateItemResult]
@@ -4,6 +4,7 @@ from typing import List, Optional
 from pydantic import BaseModel, Field, PositiveInt
 
 from db import constants
+from service.core import settings
 
 from .post import Post
 from .user import UserBase
@@ -15,16 +16,46 @@ class CommentCreate(BaseModel):
     parent_id: Optional[PositiveInt] = None
 
 
+class CommentBulkCreate(BaseModel):
+    items: List[CommentCreate] = Field(
+        min_length=1, max_length=settings.BULK_CREATE_MAX_ITEMS
+    )
+
+
 class Comment(BaseModel):
     id: int
     text: str
     is_blocked: bool
+    is_pending: bool = False
     post_id: PositiveInt
+    creator_id: PositiveInt
     parent_id: Optional[PositiveInt] = None
     updated_at: datetime
     created_at: datetime
-    user: UserBase
-    post: Post
+    # Returned only if requested with `?expand=post,user`
+    user: Optional[UserBase] = None
+    post: Optional[Post] = None
+
+
+class CommentSearchResult(Comment):
+    """Comment with search rank and highlighted fragments (HTML escaped)"""
+
+    rank: float
+    headline: Optional[str] = None
+
+
+class CommentTreeNode(BaseModel):
+    """Comment with nested replies"""
+
+    id: int
+    parent_id: Optional[int] = None
+    creator_id: int
+    text: Optional[str] = None
+    is_blocked: bool
+    created_at: datetime
+    updated_at: datetime
+    depth: int
+    children: List["CommentTreeNode"] = []
 
 
 class CommentUpdate(BaseModel):
@@ -44,3 +75,4 @@ class CommentsDailyBreakdownResponse(BaseModel):
 class DailyCommentStatsResponse(BaseModel):
     blocked: int
     unblocked: int
+    breakdown: List[DailyCommentStats] = []
@@ -0,0 +1,13 @@
+from typing import Generic, List, Optional, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+class CursorPage(BaseModel, Generic[T]):
+    """Page of keyset pagination, `next_cursor` is null on the last page"""
+
+    items: List[T]
+    next_cursor: Optional[str] = None
+    size: int
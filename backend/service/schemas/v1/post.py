@@ -1,8 +1,10 @@
 from datetime import datetime
+from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
 from db import constants
+from service.core import settings
 
 from .user import UserBase
 
@@ -11,11 +13,25 @@ class PostCreate(BaseModel):
     text: str = Field(max_length=constants.MAX_LENGTH_TEXT)
 
 
+class PostBulkCreate(BaseModel):
+    items: List[PostCreate] = Field(
+        min_length=1, max_length=settings.BULK_CREATE_MAX_ITEMS
+    )
+
+
 class Post(BaseModel):
     id: int
     text: str
     is_blocked: bool
+    is_pending: bool = False
     updated_at: datetime
     created_at: datetime
     user: UserBase
     model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+class PostSearchResult(Post):
+    """Post with search rank and highlighted fragments (HTML escaped)"""
+
+    rank: float
+    headline: Optional[str] = None
@@ -0,0 +1,86 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class ExecutorStats(BaseModel):
+    """Worker pool metrics"""
+
+    name: str
+    pool: str
+    max_workers: int
+    queue_limit: int
+    running: int
+    queue_depth: int
+    completed: int
+    rejected: int
+
+
+class CacheStats(BaseModel):
+    """Cache metrics"""
+
+    name: str
+    size: int
+    maxsize: int
+    ttl: int
+    hits: int
+    misses: int
+    redis_enabled: bool
+    redis_hits: int
+    redis_misses: int
+    redis_errors: int
+
+
+class ModerationStats(BaseModel):
+    """Moderation worker metrics"""
+
+    mode: str
+    queue: str
+    running: bool
+    queue_depth: Optional[int] = None
+    batches: int
+    checked: int
+    blocked: int
+    errors: int
+    last_batch_time: float
+
+
+class PoolStats(BaseModel):
+    """DB connection pool metrics (current backend worker)"""
+
+    pool: str
+    size: int
+    max_overflow: int
+    timeout: float
+    recycle: int
+    pre_ping: bool
+    checked_out: int
+    checked_in: int
+    checkouts: int
+    timeouts: int
+    avg_wait_time: float
+    max_wait_time: float
+    avg_hold_time: float
+    max_hold_time: float
+
+
+class RateLimitRuleStats(BaseModel):
+    """Rate limit rule and its counters (current backend worker)"""
+
+    name: str
+    key: str
+    rate: Optional[str] = None
+    concurrency: int
+    in_flight: int
+    allowed: int
+    limited: int
+    shed: int
+
+
+class RateLimitStats(BaseModel):
+    """Rate limiter metrics, `limited` got 429 and `shed` got 503"""
+
+    enabled: bool
+    storage: str
+    redis_errors: int
+    rules: List[RateLimitRuleStats]
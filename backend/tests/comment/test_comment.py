@@ -1,9 +1,12 @@
 import random
 
+import orjson
 from fastapi import status
 
+from db import models
+from db.utils import get_default_now
 from tests import factories
-from tests.conftests import TestCase
+from tests.conftests import TestCase, TestSession
 from tests.factories.utils import fake
 from tests.utils import get_headers
 
@@ -20,6 +23,18 @@ class CreateCommentTestCase(TestCase):
         response.json()
         assert response.status_code == status.HTTP_201_CREATED
 
+    def test_success_create_comment_with_expand(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        body = {"text": fake.text(), "post_id": post.id, "parent_id": None}
+        response = self.client.post(
+            f"{self.url}?expand=post,user", json=body, headers=get_headers(user.id)
+        )
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_201_CREATED
+        assert resp_data["post"]["id"] == post.id
+        assert resp_data["user"]["id"] == user.id
+
     def test_success_create_comment_for_comment(self) -> None:
         user_1 = factories.UserFactory()
         user_2 = factories.UserFactory()
@@ -27,8 +42,27 @@ class CreateCommentTestCase(TestCase):
         comment = factories.CommentFactory(post_id=post.id, creator_id=user_2.id)
         body = {"text": fake.text(), "post_id": post.id, "parent_id": comment.id}
         response = self.client.post(self.url, json=body, headers=get_headers(user_2.id))
-        response.json()
+        resp_data = response.json()
         assert response.status_code == status.HTTP_201_CREATED
+        reply = (
+            TestSession.scalars(models.Comment.get_one(id=resp_data["id"]))
+            .unique()
+            .one()
+        )
+        assert reply.parent_comment_id == comment.id
+
+    def test_invalid_create_comment_invalid_parent_id(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        body = {
+            "text": fake.text(),
+            "post_id": post.id,
+            "parent_id": random.randint(99, 9999),
+        }
+        response = self.client.post(self.url, json=body, headers=get_headers(user.id))
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert resp_data["detail"] == "Parent comment not found"
 
     def test_invalid_create_comment_empty_post_id(self) -> None:
         user = factories.UserFactory()
@@ -69,6 +103,53 @@ class CreateCommentTestCase(TestCase):
         assert resp_data["detail"] == "Comment contains inappropriate language."
 
 
+class BulkCreateCommentTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/comment/bulk"
+
+    def test_success_bulk_create_comments(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        other_post = factories.PostFactory(user_id=user.id)
+        comment = factories.CommentFactory(post_id=post.id, creator_id=user.id)
+        items = [
+            {"text": fake.text(), "post_id": post.id, "parent_id": comment.id},
+            {"text": fake.text(), "post_id": random.randint(10_000, 99_999)},
+            {"text": "some bitch", "post_id": other_post.id},
+            # Parent comment belongs to another post
+            {"text": fake.text(), "post_id": other_post.id, "parent_id": comment.id},
+        ]
+        response = self.client.post(
+            self.url, json={"items": items}, headers=get_headers(user.id)
+        )
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_201_CREATED
+        assert resp_data["created"] == 2
+        assert resp_data["blocked"] == 1
+        assert resp_data["failed"] == 2
+        assert [item["index"] for item in resp_data["items"]] == [0, 1, 2, 3]
+        assert [item["error"] for item in resp_data["items"]] == [
+            None,
+            "Post not found",
+            "Comment contains inappropriate language.",
+            "Parent comment not found",
+        ]
+        reply = (
+            TestSession.scalars(models.Comment.get_one(id=resp_data["items"][0]["id"]))
+            .unique()
+            .one()
+        )
+        assert reply.parent_comment_id == comment.id
+        today = get_default_now().date().isoformat()
+        response = self.client.get(
+            f"/api/v1/comment/daily-breakdown/?date_from={today}&date_to={today}",
+            headers=get_headers(user.id),
+        )
+        resp_data = response.json()
+        assert resp_data["blocked"] == 1
+        assert resp_data["unblocked"] == 1
+
+
 class UpdateCommentTestCase(TestCase):
     def setUp(self) -> None:
         self.url = "/api/v1/comment/"
@@ -133,6 +214,48 @@ class DeleteCommentTestCase(TestCase):
         assert response.status_code == status.HTTP_204_NO_CONTENT
 
 
+class SearchCommentsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/comment/search"
+
+    def test_success_search_comments_with_expand(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        comment = factories.CommentFactory(
+            post_id=post.id, creator_id=user.id, text="Indexes make queries fast"
+        )
+        factories.CommentFactory(post_id=post.id, creator_id=user.id, text="Hello")
+        response = self.client.get(
+            f"{self.url}?q=indexed query&expand=post", headers=get_headers(user.id)
+        )
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["id"] for item in resp_data["items"]] == [comment.id]
+        assert resp_data["items"][0]["post"]["id"] == post.id
+        assert "<mark>Indexes</mark>" in resp_data["items"][0]["headline"]
+
+
+class ExportCommentsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/comment/export/"
+
+    def test_success_export_comments_by_creator(self) -> None:
+        user_1 = factories.UserFactory()
+        user_2 = factories.UserFactory()
+        post = factories.PostFactory(user_id=user_1.id)
+        comment = factories.CommentFactory(post_id=post.id, creator_id=user_2.id)
+        factories.CommentFactory(post_id=post.id, creator_id=user_1.id)
+        response = self.client.get(
+            f"{self.url}?user_id={user_2.id}", headers=get_headers(user_1.id)
+        )
+        assert response.status_code == status.HTTP_200_OK
+        rows = [orjson.loads(line) for line in response.content.splitlines()]
+        assert len(rows) == 1
+        assert rows[0]["id"] == comment.id
+        assert rows[0]["post_id"] == post.id
+        assert list(rows[0]) == list(models.Comment.EXPORT_FIELDS)
+
+
 class GetCommentByIdTestCase(TestCase):
     def setUp(self) -> None:
         self.url = "/api/v1/comment/"
@@ -145,9 +268,105 @@ class GetCommentByIdTestCase(TestCase):
         response = self.client.get(url, headers=get_headers(user.id))
         assert response.status_code == status.HTTP_200_OK
 
+    def test_success_get_comment_without_expand(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        comment = factories.CommentFactory(post_id=post.id, creator_id=user.id)
+        url = f"{self.url}{comment.id}"
+        response = self.client.get(url, headers=get_headers(user.id))
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert resp_data["post_id"] == post.id
+        assert resp_data["creator_id"] == user.id
+        assert resp_data["post"] is None
+        assert resp_data["user"] is None
+
+    def test_success_get_comment_with_expand(self) -> None:
+        user_1 = factories.UserFactory()
+        user_2 = factories.UserFactory()
+        post = factories.PostFactory(user_id=user_1.id)
+        comment = factories.CommentFactory(post_id=post.id, creator_id=user_2.id)
+        url = f"{self.url}{comment.id}?expand=user,post"
+        response = self.client.get(url, headers=get_headers(user_2.id))
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert resp_data["user"]["id"] == user_2.id
+        assert resp_data["post"]["text"] == post.text
+        assert resp_data["post"]["user"]["id"] == user_1.id
+
+    def test_invalid_get_comment_unknown_expand(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        comment = factories.CommentFactory(post_id=post.id, creator_id=user.id)
+        url = f"{self.url}{comment.id}?expand=password"
+        response = self.client.get(url, headers=get_headers(user.id))
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert response.json()["detail"] == "Unknown expand fields: password"
+
     def test_invalid_get_comment_invalid_comment_id(self) -> None:
         user = factories.UserFactory()
         url = f"{self.url}{random.randint(99, 9999)}"
         response = self.client.get(url, headers=get_headers(user.id))
         assert response.status_code == status.HTTP_404_NOT_FOUND
         assert response.json()["detail"] == "Comment not found"
+
+    def test_success_get_comment_after_post_update(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        comment = factories.CommentFactory(post_id=post.id, creator_id=user.id)
+        url = f"{self.url}{comment.id}?expand=post"
+        self.client.get(url, headers=get_headers(user.id))
+        text = fake.text()
+        self.client.put(
+            f"/api/v1/post/{post.id}", json={"text": text}, headers=get_headers(user.id)
+        )
+        response = self.client.get(url, headers=get_headers(user.id))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["post"]["text"] == text
+
+    def test_invalid_get_comment_after_delete(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        comment = factories.CommentFactory(post_id=post.id, creator_id=user.id)
+        url = f"{self.url}{comment.id}"
+        self.client.get(url, headers=get_headers(user.id))
+        self.client.delete(url, headers=get_headers(user.id))
+        response = self.client.get(url, headers=get_headers(user.id))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class CommentsDailyBreakdownTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/comment/"
+        today = get_default_now().date().isoformat()
+        self.breakdown_url = (
+            f"{self.url}daily-breakdown/?date_from={today}&date_to={today}"
+        )
+
+    def test_success_breakdown_counts_created_comments(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        for text in (fake.text(), fake.text(), "some bitch"):
+            body = {"text": text, "post_id": post.id, "parent_id": None}
+            self.client.post(self.url, json=body, headers=get_headers(user.id))
+        response = self.client.get(self.breakdown_url, headers=get_headers(user.id))
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert resp_data["blocked"] == 1
+        assert resp_data["unblocked"] == 2
+        assert len(resp_data["breakdown"]) == 1
+
+    def test_success_breakdown_after_delete_comment_with_reply(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        body = {"text": fake.text(), "post_id": post.id, "parent_id": None}
+        response = self.client.post(self.url, json=body, headers=get_headers(user.id))
+        comment_id = response.json()["id"]
+        body = {"text": fake.text(), "post_id": post.id, "parent_id": comment_id}
+        self.client.post(self.url, json=body, headers=get_headers(user.id))
+        self.client.delete(f"{self.url}{comment_id}", headers=get_headers(user.id))
+        response = self.client.get(self.breakdown_url, headers=get_headers(user.id))
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert resp_data["unblocked"] == 0
+        assert resp_data["breakdown"] == []
@@ -1,26 +1,116 @@
+import functools
+import threading
 import unittest
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
 
+import anyio
+from anyio.from_thread import BlockingPortal
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
-from sqlalchemy_utils import create_database, database_exists, drop_database
+from sqlalchemy import NullPool, create_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session
+from sqlalchemy.util import greenlet_spawn
 
-from db.models import BaseModel
 from service.core import settings
-from service.core.dependencies import get_session
+from service.core.cache import user_cache
+from service.core.dependencies import get_session_factory
+from service.core.metrics import instrument_queries
+from service.core.profiling import instrument_profiling
+from service.core.rate_limit import rate_limiter
+from service.core.response_cache import comment_response_cache, post_response_cache
+from service.core.timeline import post_timelines
 from service.main import app
+from tests.database import get_db_uri, get_test_db_name, prepare_test_database
 
-# Create test engine
-test_engine = create_engine(settings.PSQL_TEST_DB_URI, pool_pre_ping=True)
-# Create test Session
-TestSession = scoped_session(
-    sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+# Create sync test engine (psycopg2 tools, it doesn't see rows of the test)
+test_engine = create_engine(
+    get_db_uri(settings.PSQL_TEST_DB_URI, get_test_db_name()), poolclass=NullPool
+)
+# Create async test engine, every test runs in a transaction of its own
+# connection, which is rolled back after the test
+test_async_engine = create_async_engine(
+    get_db_uri(settings.PSQL_TEST_ASYNC_DB_URI, get_test_db_name()),
+    poolclass=NullPool,
 )
+instrument_queries(test_async_engine)
+instrument_profiling(test_async_engine)
+# Create async test Session (used by the API), commits release savepoints
+# of the test transaction
+AsyncTestSession = async_sessionmaker(
+    autoflush=False, expire_on_commit=False, join_transaction_mode="create_savepoint"
+)
+
+
+def start_portal() -> BlockingPortal:
+    """Run event loop of the tests in a daemon thread (it doesn't block exit)"""
+    portal: "Future[BlockingPortal]" = Future()
+
+    async def serve() -> None:
+        async with BlockingPortal() as blocking_portal:
+            portal.set_result(blocking_portal)
+            await blocking_portal.sleep_until_stopped()
+
+    threading.Thread(target=anyio.run, args=(serve,), daemon=True).start()
+    return portal.result()
+
+
+@functools.lru_cache(maxsize=None)
+def get_portal() -> BlockingPortal:
+    # Requests and test sessions share the loop, so they share the connection
+    return start_portal()
+
+
+class GreenletSession:
+    """
+    Sync test Session (used by factories and asserts)
+
+    It's bound to the connection of the current test, so it sees rows
+    created by the API in the same transaction. Calls run in the test event
+    loop, attributes of loaded rows aren't expired (they can't be lazy loaded)
+    """
+
+    def __init__(self) -> None:
+        self.session: Optional[Session] = None
+
+    def bind(self, connection: AsyncConnection) -> None:
+        self.session = Session(
+            bind=connection.sync_connection,
+            autoflush=False,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        )
+
+    def call(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        return get_portal().call(
+            functools.partial(greenlet_spawn, func, *args, **kwargs)
+        )
+
+    def close(self) -> None:
+        if self.session is not None:
+            self.call(self.session.close)
+            self.session = None
+
+    def __getattr__(self, name: str) -> Any:
+        if self.session is None:
+            raise RuntimeError("Test session is used outside of a test")
+        attr = getattr(self.session, name)
+        if not callable(attr):
+            return attr
+        return functools.partial(self.call, attr)
+
+
+# Create test Session
+TestSession = GreenletSession()
 
 
 def get_test_db():
-    # Function for overwrite get_db() dependencies which return a normal Session
-    return TestSession
+    # Function for overwrite get_session_factory() dependencies
+    return AsyncTestSession
 
 
 class BaseTestCase(unittest.TestCase):
@@ -28,19 +118,22 @@ class BaseTestCase(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls) -> None:
-        cls.addClassCleanup(drop_database, settings.PSQL_TEST_DB_URI)
-        if not database_exists(settings.PSQL_TEST_DB_URI):
-            # Crete test database
-            create_database(settings.PSQL_TEST_DB_URI)
-        # with test_engine.connect() as connection:
-        #     connection.execute(text("CREATE EXTENSION IF NOT EXISTS postgis;"))
-        #     connection.commit()
+        # Clone test database from the template once per process
+        prepare_test_database()
+        cls.portal = get_portal()
 
-    @classmethod
-    def tearDownClass(cls) -> None:
-        for table in reversed(BaseModel.metadata.sorted_tables):
-            TestSession.execute(table.delete())
-        TestSession.commit()
+    def run(self, result=None):
+        """Run the test in a transaction, it is rolled back instead of deleting rows"""
+        connection = self.portal.call(test_async_engine.connect)
+        self.portal.call(connection.begin)
+        AsyncTestSession.configure(bind=connection)
+        TestSession.bind(connection)
+        try:
+            return super().run(result)
+        finally:
+            TestSession.close()
+            self.portal.call(connection.rollback)
+            self.portal.call(connection.close)
 
 
 class TestCase(BaseTestCase):
@@ -48,17 +141,18 @@ class TestCase(BaseTestCase):
     def setUpClass(cls) -> None:
         super().setUpClass()
         # Overwrite get_db() dependencies
-        app.dependency_overrides[get_session] = get_test_db
-        # Create client with overwrited get_db()
+        app.dependency_overrides[get_session_factory] = get_test_db
+        # Create client with overwrited get_db(), requests run in the test event loop
         cls.client = TestClient(app)
+        cls.client.portal = cls.portal
         # Add test session to body
         cls.session = get_test_db
-        # Create all tables
-        BaseModel.metadata.create_all(test_engine)
 
     @classmethod
     def tearDown(self) -> None:
-        with test_engine.connect() as connection:
-            for table in reversed(BaseModel.metadata.sorted_tables):
-                connection.execute(table.delete())
-            connection.commit()
+        # Rolled back rows must not be served from caches
+        user_cache.clear()
+        post_response_cache.clear()
+        comment_response_cache.clear()
+        post_timelines.clear()
+        rate_limiter.clear()
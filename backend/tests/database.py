@@ -0,0 +1,101 @@
+import atexit
+import functools
+import hashlib
+import os
+
+from sqlalchemy import NullPool, create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Connection, make_url
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from db.models import BaseModel
+from service.core import settings
+
+# Workers clone the template one by one (Postgres doesn't allow
+# connections to the template while it's copied)
+TEMPLATE_LOCK_ID = 7_243_001
+
+
+def get_test_db_name() -> str:
+    """Return DB name of the current process, every pytest-xdist worker has its own"""
+    worker = os.getenv("PYTEST_XDIST_WORKER")
+    if worker:
+        return f"{settings.PSQL_TEST_DB_NAME}_{worker}"
+    return settings.PSQL_TEST_DB_NAME
+
+
+def get_db_uri(uri: str, name: str) -> str:
+    return make_url(uri).set(database=name).render_as_string(hide_password=False)
+
+
+def get_schema_hash() -> str:
+    """Hash DDL of the models, template is rebuilt when it changes"""
+    dialect = postgresql.dialect()
+    ddl = []
+    for table in BaseModel.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            ddl.append(str(CreateIndex(index).compile(dialect=dialect)))
+    return hashlib.sha1("\n".join(ddl).encode()).hexdigest()
+
+
+def create_template(connection: Connection, name: str, schema_hash: str) -> None:
+    connection.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+    connection.execute(text(f'CREATE DATABASE "{name}"'))
+    template_engine = create_engine(
+        get_db_uri(settings.PSQL_TEST_DB_URI, name), poolclass=NullPool
+    )
+    BaseModel.metadata.create_all(template_engine)
+    template_engine.dispose()
+    connection.execute(text(f"COMMENT ON DATABASE \"{name}\" IS '{schema_hash}'"))
+
+
+def drop_database(name: str) -> None:
+    admin_engine = create_engine(
+        get_db_uri(settings.PSQL_TEST_DB_URI, "postgres"),
+        isolation_level="AUTOCOMMIT",
+        poolclass=NullPool,
+    )
+    with admin_engine.connect() as connection:
+        connection.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+    admin_engine.dispose()
+
+
+@functools.lru_cache(maxsize=None)
+def prepare_test_database() -> None:
+    """
+    Create test DB of the process as a copy of the template DB
+
+    Template has all tables and is created once (and again if models change),
+    so tests don't run `create_all()`. Test DB is dropped on exit
+    """
+    template = f"{settings.PSQL_TEST_DB_NAME}_template"
+    name = get_test_db_name()
+    schema_hash = get_schema_hash()
+    admin_engine = create_engine(
+        get_db_uri(settings.PSQL_TEST_DB_URI, "postgres"),
+        isolation_level="AUTOCOMMIT",
+        poolclass=NullPool,
+    )
+    with admin_engine.connect() as connection:
+        connection.execute(
+            text("SELECT pg_advisory_lock(:id)"), {"id": TEMPLATE_LOCK_ID}
+        )
+        try:
+            template_hash = connection.scalar(
+                text(
+                    "SELECT shobj_description(oid, 'pg_database') "
+                    "FROM pg_database WHERE datname = :name"
+                ),
+                {"name": template},
+            )
+            if template_hash != schema_hash:
+                create_template(connection, template, schema_hash)
+            connection.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+            connection.execute(text(f'CREATE DATABASE "{name}" TEMPLATE "{template}"'))
+        finally:
+            connection.execute(
+                text("SELECT pg_advisory_unlock(:id)"), {"id": TEMPLATE_LOCK_ID}
+            )
+    admin_engine.dispose()
+    atexit.register(drop_database, name)
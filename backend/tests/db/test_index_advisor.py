@@ -0,0 +1,45 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from db import models
+from db.index_advisor import explain, find_seq_scans, get_hot_queries, seed_dataset
+from db.utils import get_default_now
+from tests.conftests import TestCase, test_engine
+
+
+class IndexAdvisorTestCase(TestCase):
+    def test_success_explain_hot_queries(self) -> None:
+        sample = {
+            "comment_id": 1,
+            "user_id": 1,
+            "post_id": 1,
+            "created_at": get_default_now(),
+        }
+        with Session(test_engine) as session:
+            for name, query in get_hot_queries(sample).items():
+                plan = explain(session, query, analyze=False)
+                assert "Node Type" in plan, name
+
+    def test_success_find_seq_scans(self) -> None:
+        plan = {
+            "Node Type": "Hash Join",
+            "Plans": [
+                {"Node Type": "Seq Scan", "Relation Name": "comment", "Plan Rows": 10},
+                {"Node Type": "Index Scan", "Relation Name": "post", "Plan Rows": 1},
+            ],
+        }
+        assert find_seq_scans(plan) == [("comment", 10)]
+
+    def test_success_seed_dataset_not_committed(self) -> None:
+        with Session(test_engine) as session:
+            seed_dataset(session, users=2, posts=3, comments=4)
+            assert session.scalar(select(func.count(models.Post.id))) == 3
+            stats_query = select(
+                func.sum(
+                    models.CommentDailyStats.blocked_count
+                    + models.CommentDailyStats.unblocked_count
+                )
+            )
+            assert session.scalar(stats_query) == 4
+            session.rollback()
+            assert session.scalar(select(func.count(models.User.id))) == 0
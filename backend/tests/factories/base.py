@@ -1,3 +1,5 @@
+from typing import List
+
 from factory.alchemy import SQLAlchemyModelFactory
 
 from tests.conftests import TestSession
@@ -8,3 +10,12 @@ class BaseFactory(SQLAlchemyModelFactory):
         abstract = True
         sqlalchemy_session = TestSession
         sqlalchemy_session_persistence = "commit"
+
+    @classmethod
+    def create_batch(cls, size: int, **kwargs) -> List:
+        """Insert the batch with one commit (multi-row INSERT), not one per row"""
+        instances = cls.build_batch(size, **kwargs)
+        session = cls._meta.sqlalchemy_session
+        session.add_all(instances)
+        session.commit()
+        return instances
@@ -1,6 +1,8 @@
 from fastapi import status
 
+from tests import factories
 from tests.conftests import TestCase
+from tests.utils import get_headers
 
 
 class HomeTestCase(TestCase):
@@ -10,3 +12,24 @@ class HomeTestCase(TestCase):
         assert response.status_code == status.HTTP_200_OK
         assert "backend_status" in resp_data
         assert "Backend" in resp_data["backend_status"]["message"]
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/metrics"
+
+    def test_success_get_metrics(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        self.client.get(f"/api/v1/post/{post.id}", headers=get_headers(user.id))
+        response = self.client.get(self.url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        labels = 'method="GET",route="/api/v1/post/{post_id}"'
+        metrics = response.text
+        # Route template is the label, not the requested path
+        assert f'http_requests_total{{{labels},status="200"}}' in metrics
+        assert f"http_request_duration_seconds_count{{{labels}}}" in metrics
+        assert f"http_request_db_queries_count{{{labels}}}" in metrics
+        assert 'db_query_duration_seconds_count{operation="select"}' in metrics
+        assert "moderation_check_duration_seconds" in metrics
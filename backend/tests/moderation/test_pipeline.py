@@ -0,0 +1,105 @@
+import asyncio
+
+from fastapi import status
+
+from db import models
+from db.utils import get_default_now
+from service.core import settings
+from service.core.timeline import LATEST_FEED, post_timelines
+from service.moderation import moderation_worker
+from tests import factories
+from tests.conftests import AsyncTestSession, TestCase, TestSession
+from tests.factories.utils import fake
+from tests.utils import get_admin_headers, get_headers
+
+
+class AsyncModerationTestCase(TestCase):
+    def setUp(self) -> None:
+        settings.MODERATION_MODE = "async"
+        moderation_worker.session_factory = AsyncTestSession
+        moderation_worker.queue.tasks.clear()
+
+    def tearDown(self) -> None:
+        settings.MODERATION_MODE = "sync"
+        moderation_worker.queue.tasks.clear()
+        super().tearDown()
+
+    def run_worker(self) -> None:
+        """Check all enqueued tasks like the background worker does"""
+        batch = asyncio.run(moderation_worker.queue.get_batch(100, 0))
+        # Worker session uses the connection of the test
+        self.portal.call(moderation_worker.process_batch, batch)
+
+    def test_success_create_pending_post(self) -> None:
+        user = factories.UserFactory()
+        response = self.client.post(
+            "/api/v1/post/", json={"text": "some bitch"}, headers=get_headers(user.id)
+        )
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_201_CREATED
+        assert resp_data["is_pending"] is True
+        assert resp_data["is_blocked"] is False
+        self.run_worker()
+        post = (
+            TestSession.scalars(models.Post.get_one(id=resp_data["id"])).unique().one()
+        )
+        TestSession.refresh(post)
+        assert post.is_pending is False
+        assert post.is_blocked is True
+
+    def test_success_add_checked_post_to_feed(self) -> None:
+        user = factories.UserFactory()
+        headers = get_headers(user.id)
+        self.client.get("/api/v1/post/latest", headers=headers)
+        post_ids = [
+            self.client.post(
+                "/api/v1/post/", json={"text": text}, headers=headers
+            ).json()["id"]
+            for text in ("Pending words", "Pending bitch")
+        ]
+        # Pending posts aren't in the feed and search until they are checked
+        entries = asyncio.run(post_timelines.storage.get(LATEST_FEED, None, 10))
+        assert entries == []
+        response = self.client.get("/api/v1/post/latest", headers=headers)
+        assert response.json()["items"] == []
+        response = self.client.get("/api/v1/post/search?q=pending", headers=headers)
+        assert response.json()["items"] == []
+        self.run_worker()
+        entries = asyncio.run(post_timelines.storage.get(LATEST_FEED, None, 10))
+        assert [pk for _, pk in entries] == [post_ids[0]]
+        response = self.client.get("/api/v1/post/latest", headers=headers)
+        assert [item["id"] for item in response.json()["items"]] == [post_ids[0]]
+        response = self.client.get("/api/v1/post/search?q=pending", headers=headers)
+        assert [item["id"] for item in response.json()["items"]] == [post_ids[0]]
+
+    def test_success_moderate_comments_batch(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        for text in (fake.text(), "some bitch"):
+            body = {"text": text, "post_id": post.id, "parent_id": None}
+            response = self.client.post(
+                "/api/v1/comment/", json=body, headers=get_headers(user.id)
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+        assert len(moderation_worker.queue.tasks) == 2
+        self.run_worker()
+        comments = TestSession.scalars(models.Comment.get_all()).unique().all()
+        assert sorted(comment.is_blocked for comment in comments) == [False, True]
+        assert not any(comment.is_pending for comment in comments)
+        today = get_default_now().date().isoformat()
+        response = self.client.get(
+            f"/api/v1/comment/daily-breakdown/?date_from={today}&date_to={today}",
+            headers=get_headers(user.id),
+        )
+        resp_data = response.json()
+        assert resp_data["blocked"] == 1
+        assert resp_data["unblocked"] == 1
+
+    def test_success_get_moderation_stats(self) -> None:
+        response = self.client.get(
+            "/api/v1/system/moderation/", headers=get_admin_headers(self)
+        )
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert resp_data["mode"] == "async"
+        assert resp_data["queue"] == "memory"
@@ -0,0 +1,63 @@
+import threading
+from unittest import mock
+
+from service.moderation import ProfanityMatcher
+from tests.conftests import TestCase
+
+
+class ProfanityMatcherTestCase(TestCase):
+    def setUp(self) -> None:
+        self.matcher = ProfanityMatcher()
+
+    def test_success_match_swear_words(self) -> None:
+        for text in ("some bitch", "sHiT!", "bull   shit", "hand_job", "fuck-tard"):
+            assert self.matcher.contains_profanity(text), text
+
+    def test_success_match_leetspeak(self) -> None:
+        for text in ("b1tch", "sh*t happens", "a$$hole", "fvck", "@ss"):
+            assert self.matcher.contains_profanity(text), text
+
+    def test_success_match_split_words(self) -> None:
+        # Tokens forming a listed word are matched like in better_profanity
+        for text in ("blow jobs", "gang bangs!", "b i t c h e s", "sh it", "a$$ hole"):
+            assert self.matcher.contains_profanity(text), text
+
+    def test_success_skip_clean_words(self) -> None:
+        for text in (
+            "shot",
+            "class",
+            "assassin",
+            "cocktail",
+            "shit's",
+            "blow the job",
+            "",
+            None,
+        ):
+            assert not self.matcher.contains_profanity(text), text
+
+    def test_success_check_many(self) -> None:
+        verdicts = self.matcher.check_many(["hello world", "some bitch", "hello world"])
+        assert verdicts == [False, True, False]
+        assert self.matcher.cache.hits == 1
+        assert len(self.matcher.cache) == 2
+
+    def test_success_check_batch_in_thread_pool(self) -> None:
+        check_many = self.matcher.check_many
+        threads = []
+
+        def check_in_thread(texts: list) -> list:
+            threads.append(threading.current_thread())
+            return check_many(texts)
+
+        loop_thread = self.portal.call(threading.current_thread)
+        with mock.patch.object(self.matcher, "check_many", check_in_thread):
+            verdicts = self.portal.call(
+                self.matcher.check_batch, iter(["hello world", "some bitch"])
+            )
+        assert verdicts == [False, True]
+        assert threads and threads[0] is not loop_thread
+
+    def test_success_custom_wordlist(self) -> None:
+        matcher = ProfanityMatcher(words=["darn it"])
+        assert matcher.contains_profanity("oh, DARN...it")
+        assert not matcher.contains_profanity("darn")
@@ -1,9 +1,21 @@
+import csv
+import io
 import random
+from datetime import timedelta, timezone
+from unittest import mock
 
+import orjson
 from fastapi import status
 
+from db import models
+from db.utils import get_default_now
+from service.controllers.v1.post import post as post_controller
+from service.core import response_cache, settings
+from service.core.pagination import encode_cursor
+from service.core.response_cache import create_response_cache
+from service.core.timeline import FeedPost, post_timelines
 from tests import factories
-from tests.conftests import TestCase
+from tests.conftests import AsyncTestSession, TestCase, TestSession
 from tests.factories.utils import fake
 from tests.utils import get_headers
 
@@ -29,6 +41,9 @@ class CreatePostTestCase(TestCase):
         resp_data = response.json()
         assert response.status_code == status.HTTP_400_BAD_REQUEST
         assert resp_data["detail"] == "Post contains inappropriate language."
+        # Blocked post is stored for moderation
+        post = TestSession.scalars(models.Post.get_one(user_id=user.id)).unique().one()
+        assert post.is_blocked is True
 
     def test_invalid_create_post_without_text(self) -> None:
         user = factories.UserFactory()
@@ -47,6 +62,69 @@ class CreatePostTestCase(TestCase):
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 
+class BulkCreatePostTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/post/bulk"
+
+    def test_success_bulk_create_posts(self) -> None:
+        user = factories.UserFactory()
+        texts = [fake.text(), "some fucking test", fake.text()]
+        response = self.client.post(
+            self.url,
+            json={"items": [{"text": text} for text in texts]},
+            headers=get_headers(user.id),
+        )
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_201_CREATED
+        assert resp_data["created"] == 3
+        assert resp_data["blocked"] == 1
+        assert [item["index"] for item in resp_data["items"]] == [0, 1, 2]
+        assert resp_data["items"][1]["error"] == "Post contains inappropriate language."
+        posts = TestSession.scalars(
+            models.Post.get_all(user_id=user.id, order_by=[models.Post.id])
+        ).all()
+        assert [post.id for post in posts] == [
+            item["id"] for item in resp_data["items"]
+        ]
+        assert [post.text for post in posts] == texts
+        assert [post.is_blocked for post in posts] == [False, True, False]
+
+    def test_success_bulk_create_posts_with_copy(self) -> None:
+        user = factories.UserFactory()
+        texts = [fake.text() for _ in range(3)]
+        with mock.patch.object(settings, "BULK_COPY_MIN_ITEMS", 2):
+            response = self.client.post(
+                self.url,
+                json={"items": [{"text": text} for text in texts]},
+                headers=get_headers(user.id),
+            )
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_201_CREATED
+        assert resp_data["created"] == 3
+        post = (
+            TestSession.scalars(models.Post.get_one(id=resp_data["items"][2]["id"]))
+            .unique()
+            .one()
+        )
+        assert post.text == texts[2]
+        assert post.user_id == user.id
+
+    def test_invalid_bulk_create_posts_too_many_items(self) -> None:
+        user = factories.UserFactory()
+        items = [{"text": "text"}] * (settings.BULK_CREATE_MAX_ITEMS + 1)
+        response = self.client.post(
+            self.url, json={"items": items}, headers=get_headers(user.id)
+        )
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_invalid_bulk_create_posts_without_items(self) -> None:
+        user = factories.UserFactory()
+        response = self.client.post(
+            self.url, json={"items": []}, headers=get_headers(user.id)
+        )
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 class UpdatePostTestCase(TestCase):
     def setUp(self) -> None:
         self.url = "/api/v1/post/"
@@ -55,11 +133,14 @@ class UpdatePostTestCase(TestCase):
         user = factories.UserFactory()
         post = factories.PostFactory(user_id=user.id)
         url = f"{self.url}{post.id}"
+        text = fake.text()
         response = self.client.put(
-            url, json={"text": fake.text()}, headers=get_headers(user.id)
+            url, json={"text": text}, headers=get_headers(user.id)
         )
-        response.json()
+        resp_data = response.json()
         assert response.status_code == status.HTTP_200_OK
+        assert resp_data["text"] == text
+        assert resp_data["user"]["id"] == user.id
 
     def test_invalid_update_post_contain_inappropriate_language(self) -> None:
         user = factories.UserFactory()
@@ -122,6 +203,219 @@ class DeletePostTestCase(TestCase):
         assert response.status_code == status.HTTP_204_NO_CONTENT
 
 
+class LatestPostsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/post/latest"
+
+    def get_feed_ids(self, user_id: int, size: int = 50) -> list:
+        ids = []
+        cursor = ""
+        while True:
+            response = self.client.get(
+                f"{self.url}?size={size}&cursor={cursor}", headers=get_headers(user_id)
+            )
+            assert response.status_code == status.HTTP_200_OK
+            resp_data = response.json()
+            ids += [item["id"] for item in resp_data["items"]]
+            cursor = resp_data["next_cursor"]
+            if not cursor:
+                return ids
+
+    def test_success_get_latest_posts_pages(self) -> None:
+        user = factories.UserFactory()
+        posts = [factories.PostFactory(user_id=user.id) for _ in range(5)]
+        factories.PostFactory(user_id=user.id, is_blocked=True)
+        # Pages older than the timeline are read from DB
+        with mock.patch.object(post_timelines.storage, "size", 3):
+            ids = self.get_feed_ids(user.id, size=2)
+        assert ids == [post.id for post in reversed(posts)]
+
+    def test_success_get_latest_posts_after_delete_from_trimmed_feed(self) -> None:
+        user = factories.UserFactory()
+        posts = [factories.PostFactory(user_id=user.id) for _ in range(5)]
+        with mock.patch.object(post_timelines.storage, "size", 3):
+            self.get_feed_ids(user.id, size=1)
+            self.client.delete(
+                f"/api/v1/post/{posts[3].id}", headers=get_headers(user.id)
+            )
+            # Feed is shorter than its size, older posts are still read from DB
+            ids = self.get_feed_ids(user.id, size=1)
+        assert ids == [post.id for post in reversed(posts) if post != posts[3]]
+
+    def test_success_get_latest_posts_after_create_and_delete(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        assert self.get_feed_ids(user.id) == [post.id]
+        response = self.client.post(
+            "/api/v1/post/", json={"text": fake.text()}, headers=get_headers(user.id)
+        )
+        new_post_id = response.json()["id"]
+        hits = post_timelines.stats()["hits"]
+        # Feed is updated in place, not rebuilt
+        assert self.get_feed_ids(user.id) == [new_post_id, post.id]
+        assert post_timelines.stats()["hits"] == hits + 1
+        self.client.delete(f"/api/v1/post/{post.id}", headers=get_headers(user.id))
+        assert self.get_feed_ids(user.id) == [new_post_id]
+
+    def test_success_get_latest_posts_created_during_rebuild(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        new_posts = []
+        set_feed = post_timelines.storage.set
+
+        async def set_after_create(feed: str, entries: list) -> None:
+            # Post is committed after the rebuild read, the feed is still missing
+            if not new_posts:
+                async with AsyncTestSession() as session:
+                    new_post = models.Post(text=fake.text(), user_id=user.id)
+                    session.add(new_post)
+                    await session.commit()
+                new_posts.append(new_post)
+                await post_timelines.add_posts(
+                    [FeedPost(new_post.id, user.id, new_post.created_at)]
+                )
+            await set_feed(feed, entries)
+
+        with mock.patch.object(post_timelines.storage, "set", set_after_create):
+            ids = self.get_feed_ids(user.id)
+        assert ids == [new_posts[0].id, post.id]
+        assert self.get_feed_ids(user.id) == ids
+
+    def test_invalid_get_latest_posts_invalid_cursor(self) -> None:
+        user = factories.UserFactory()
+        response = self.client.get(
+            f"{self.url}?cursor=invalid", headers=get_headers(user.id)
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class SearchPostsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/post/search"
+
+    def test_success_search_posts(self) -> None:
+        user = factories.UserFactory()
+        best = factories.PostFactory(
+            user_id=user.id, text="Postgres search: <b>search</b> with indexes"
+        )
+        other = factories.PostFactory(user_id=user.id, text="Search the archive")
+        factories.PostFactory(user_id=user.id, text="Nothing to see here")
+        factories.PostFactory(user_id=user.id, text="Blocked search", is_blocked=True)
+        response = self.client.get(
+            f"{self.url}?q=searching", headers=get_headers(user.id)
+        )
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["id"] for item in resp_data["items"]] == [best.id, other.id]
+        assert resp_data["items"][0]["user"]["id"] == user.id
+        assert resp_data["items"][0]["rank"] > resp_data["items"][1]["rank"]
+        # Post text is escaped, only matches are tags
+        headline = resp_data["items"][0]["headline"]
+        assert "&lt;b&gt;<mark>search</mark>&lt;/b&gt;" in headline
+
+    def test_success_search_posts_pages(self) -> None:
+        user = factories.UserFactory()
+        posts = [
+            factories.PostFactory(user_id=user.id, text="same words") for _ in range(5)
+        ]
+        ids = []
+        cursor = ""
+        for _ in range(3):
+            response = self.client.get(
+                f"{self.url}?q=word&size=2&cursor={cursor}",
+                headers=get_headers(user.id),
+            )
+            resp_data = response.json()
+            ids += [item["id"] for item in resp_data["items"]]
+            cursor = resp_data["next_cursor"]
+            if not cursor:
+                break
+        # Equal ranks are ordered by id, newest first
+        assert ids == [post.id for post in reversed(posts)]
+        assert cursor is None
+
+    def test_invalid_search_posts_empty_query(self) -> None:
+        user = factories.UserFactory()
+        response = self.client.get(f"{self.url}?q=", headers=get_headers(user.id))
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_invalid_search_posts_invalid_cursor(self) -> None:
+        user = factories.UserFactory()
+        response = self.client.get(
+            f"{self.url}?q=word&cursor=invalid", headers=get_headers(user.id)
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class ExportPostsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/post/export/"
+
+    def test_success_export_posts_ndjson(self) -> None:
+        user = factories.UserFactory()
+        posts = [factories.PostFactory(user_id=user.id) for _ in range(3)]
+        with mock.patch.object(settings, "EXPORT_CHUNK_SIZE", 2):
+            response = self.client.get(self.url, headers=get_headers(user.id))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [orjson.loads(line) for line in response.content.splitlines()]
+        assert [row["id"] for row in rows] == [post.id for post in posts]
+        assert list(rows[0]) == list(models.Post.EXPORT_FIELDS)
+        assert rows[0]["text"] == posts[0].text
+
+    def test_success_export_posts_csv(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        response = self.client.get(
+            f"{self.url}?format=csv", headers=get_headers(user.id)
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0] == list(models.Post.EXPORT_FIELDS)
+        assert len(rows) == 2
+        assert rows[1][0] == str(post.id)
+        assert rows[1][2] == post.text
+
+    def test_success_export_posts_with_filters(self) -> None:
+        user_1 = factories.UserFactory()
+        user_2 = factories.UserFactory()
+        old_post = factories.PostFactory(
+            user_id=user_1.id, created_at=get_default_now() - timedelta(days=10)
+        )
+        post = factories.PostFactory(user_id=user_1.id)
+        factories.PostFactory(user_id=user_1.id, is_blocked=True)
+        factories.PostFactory(user_id=user_2.id)
+        today = get_default_now().date()
+        response = self.client.get(
+            f"{self.url}?user_id={user_1.id}&is_blocked=false&date_from={today}",
+            headers=get_headers(user_1.id),
+        )
+        ids = [orjson.loads(line)["id"] for line in response.content.splitlines()]
+        assert ids == [post.id]
+        response = self.client.get(
+            f"{self.url}?date_to={today - timedelta(days=1)}",
+            headers=get_headers(user_1.id),
+        )
+        ids = [orjson.loads(line)["id"] for line in response.content.splitlines()]
+        assert ids == [old_post.id]
+
+    def test_invalid_export_posts_invalid_date_range(self) -> None:
+        user = factories.UserFactory()
+        response = self.client.get(
+            f"{self.url}?date_from=2024-02-01&date_to=2024-01-01",
+            headers=get_headers(user.id),
+        )
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_invalid_export_posts_unknown_format(self) -> None:
+        user = factories.UserFactory()
+        response = self.client.get(
+            f"{self.url}?format=xml", headers=get_headers(user.id)
+        )
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 class GetPostByIdTestCase(TestCase):
     def setUp(self) -> None:
         self.url = "/api/v1/post/"
@@ -140,3 +434,149 @@ class GetPostByIdTestCase(TestCase):
         response = self.client.get(url, headers=get_headers(user.id))
         assert response.status_code == status.HTTP_404_NOT_FOUND
         assert response.json()["detail"] == "Post not found"
+
+    def test_success_get_post_by_id_not_modified(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        url = f"{self.url}{post.id}"
+        response = self.client.get(url, headers=get_headers(user.id))
+        etag = response.headers["ETag"]
+        headers = {**get_headers(user.id), "If-None-Match": etag}
+        response = self.client.get(url, headers=headers)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["ETag"] == etag
+
+    def test_success_get_post_by_id_after_update(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        url = f"{self.url}{post.id}"
+        etag = self.client.get(url, headers=get_headers(user.id)).headers["ETag"]
+        text = fake.text()
+        self.client.put(url, json={"text": text}, headers=get_headers(user.id))
+        headers = {**get_headers(user.id), "If-None-Match": etag}
+        response = self.client.get(url, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["text"] == text
+
+    def test_success_get_post_by_id_after_update_by_other_worker(self) -> None:
+        # Gunicorn disables local tier for more workers without Redis
+        with mock.patch.object(settings, "RESPONSE_CACHE_SIZE", 0):
+            worker_cache = create_response_cache("post_response")
+            other_worker_cache = create_response_cache("post_response")
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        url = f"{self.url}{post.id}"
+        with mock.patch.object(post_controller, "post_response_cache", worker_cache):
+            etag = self.client.get(url, headers=get_headers(user.id)).headers["ETag"]
+        text = fake.text()
+        with mock.patch.object(
+            response_cache, "post_response_cache", other_worker_cache
+        ):
+            self.client.put(url, json={"text": text}, headers=get_headers(user.id))
+        headers = {**get_headers(user.id), "If-None-Match": etag}
+        with mock.patch.object(post_controller, "post_response_cache", worker_cache):
+            response = self.client.get(url, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["text"] == text
+        assert response.headers["ETag"] != etag
+
+    def test_invalid_get_post_by_id_after_delete(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        url = f"{self.url}{post.id}"
+        self.client.get(url, headers=get_headers(user.id))
+        self.client.delete(url, headers=get_headers(user.id))
+        response = self.client.get(url, headers=get_headers(user.id))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class GetPostsCursorPageTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/post/cursor/"
+
+    def test_success_get_posts_cursor_pages(self) -> None:
+        user = factories.UserFactory()
+        posts = [factories.PostFactory(user_id=user.id) for _ in range(3)]
+        response = self.client.get(
+            self.url, params={"size": 2}, headers=get_headers(user.id)
+        )
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["id"] for item in resp_data["items"]] == [
+            posts[2].id,
+            posts[1].id,
+        ]
+        assert resp_data["next_cursor"] is not None
+
+        response = self.client.get(
+            self.url,
+            params={"size": 2, "cursor": resp_data["next_cursor"]},
+            headers=get_headers(user.id),
+        )
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["id"] for item in resp_data["items"]] == [posts[0].id]
+        assert resp_data["next_cursor"] is None
+
+    def test_invalid_get_posts_cursor_page_invalid_cursor(self) -> None:
+        user = factories.UserFactory()
+        response = self.client.get(
+            self.url, params={"cursor": fake.word()}, headers=get_headers(user.id)
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == "Invalid cursor"
+
+    def test_invalid_get_posts_cursor_page_cursor_with_time_zone(self) -> None:
+        user = factories.UserFactory()
+        cursor = encode_cursor(get_default_now().replace(tzinfo=timezone.utc), 1)
+        response = self.client.get(
+            self.url, params={"cursor": cursor}, headers=get_headers(user.id)
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == "Invalid cursor"
+
+
+class GetPostCommentsTreeTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/post/"
+
+    def test_success_get_post_comments_tree(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        root = factories.CommentFactory(post_id=post.id, creator_id=user.id)
+        reply = factories.CommentFactory(
+            post_id=post.id, creator_id=user.id, parent_comment_id=root.id
+        )
+        factories.CommentFactory(
+            post_id=post.id, creator_id=user.id, parent_comment_id=reply.id
+        )
+        url = f"{self.url}{post.id}/comments"
+        response = self.client.get(url, headers=get_headers(user.id))
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert len(resp_data) == 1
+        assert resp_data[0]["id"] == root.id
+        assert resp_data[0]["children"][0]["id"] == reply.id
+        assert resp_data[0]["children"][0]["children"][0]["depth"] == 3
+
+    def test_success_get_post_comments_tree_with_max_depth(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        root = factories.CommentFactory(post_id=post.id, creator_id=user.id)
+        factories.CommentFactory(
+            post_id=post.id, creator_id=user.id, parent_comment_id=root.id
+        )
+        url = f"{self.url}{post.id}/comments"
+        response = self.client.get(
+            url, params={"max_depth": 1}, headers=get_headers(user.id)
+        )
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert resp_data[0]["children"] == []
+
+    def test_invalid_get_post_comments_tree_invalid_post_id(self) -> None:
+        user = factories.UserFactory()
+        url = f"{self.url}{random.randint(99, 9999)}/comments"
+        response = self.client.get(url, headers=get_headers(user.id))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json()["detail"] == "Post not found"
@@ -0,0 +1,90 @@
+import os
+import tempfile
+from unittest import mock
+
+import orjson
+from fastapi import status
+from sqlalchemy import text
+
+from service.core import settings
+from service.core.profiling import explain, stop_file_loggers
+from tests import factories
+from tests.conftests import TestCase, test_engine
+from tests.utils import get_headers
+
+
+class ProfilingTestCase(TestCase):
+    def setUp(self) -> None:
+        self.log_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch.object(settings, "PROFILING_ENABLED", True),
+            mock.patch.object(settings, "PROFILING_LOG_DIR", self.log_dir),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self) -> None:
+        for patch in self.patches:
+            patch.stop()
+        # Log files are opened once per logger
+        stop_file_loggers()
+        super().tearDown()
+
+    def read_log(self, file_name: str) -> list:
+        # Records are written by listener threads
+        stop_file_loggers()
+        with open(os.path.join(self.log_dir, file_name)) as log_file:
+            return [orjson.loads(line) for line in log_file]
+
+    def test_success_profile_request_with_header(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        headers = {**get_headers(user.id), settings.PROFILING_HEADER: "1"}
+        response = self.client.get(f"/api/v1/post/{post.id}", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        # Requests without the header aren't profiled
+        self.client.get(f"/api/v1/post/{post.id}", headers=get_headers(user.id))
+        profiles = self.read_log("profile.log")
+        assert len(profiles) == 1
+        profile = profiles[0]
+        assert profile["route"] == "/api/v1/post/{post_id}"
+        assert profile["status"] == status.HTTP_200_OK
+        span_names = [span["name"] for span in profile["spans"]]
+        for name in (
+            "get_jwt_token",
+            "get_current_user",
+            "dependencies",
+            "endpoint",
+            "serialization",
+        ):
+            assert name in span_names
+        assert profile["db_queries"] == len(profile["queries"]) > 0
+        # Tests run in a transaction, so sessions start with a savepoint
+        selects = [
+            query
+            for query in profile["queries"]
+            if query["statement"].startswith("SELECT")
+        ]
+        assert selects[0]["rows"] == 1
+
+    def test_success_log_slow_query_with_plan(self) -> None:
+        user = factories.UserFactory()
+        post = factories.PostFactory(user_id=user.id)
+        with mock.patch.object(settings, "SLOW_QUERY_THRESHOLD", 0.000001):
+            with mock.patch.object(settings, "SLOW_QUERY_EXPLAIN", True):
+                response = self.client.get(
+                    f"/api/v1/post/{post.id}", headers=get_headers(user.id)
+                )
+        assert response.status_code == status.HTTP_200_OK
+        slow_queries = self.read_log("slow_queries.log")
+        assert slow_queries
+        select_query = next(
+            query for query in slow_queries if query["statement"].startswith("SELECT")
+        )
+        assert "Scan" in select_query["plan"]
+
+    def test_success_explain_error_keeps_transaction(self) -> None:
+        with test_engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            assert explain(connection, "SELECT * FROM missing_table", {}) is None
+            assert connection.scalar(text("SELECT 1")) == 1
@@ -0,0 +1,150 @@
+import asyncio
+from unittest import mock
+
+from fastapi import status
+from fastapi.responses import PlainTextResponse
+from prometheus_client import REGISTRY
+
+from service.core.rate_limit import (
+    MemoryTokenBuckets,
+    RateLimiter,
+    RateLimitMiddleware,
+    RateLimitRule,
+    parse_rate,
+    rate_limiter,
+)
+from tests import factories
+from tests.conftests import TestCase
+from tests.factories.utils import fake
+from tests.utils import get_admin_headers, get_headers
+
+
+class RateLimitTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/post/"
+        self.rules = [
+            RateLimitRule(
+                name="post_write",
+                methods=("POST",),
+                paths=(self.url,),
+                rate=parse_rate("2/minute"),
+            )
+        ]
+
+    def test_fail_create_post_over_rate_limit(self) -> None:
+        user, other_user = factories.UserFactory.create_batch(2)
+        with mock.patch.object(rate_limiter, "rules", self.rules):
+            responses = [
+                self.client.post(
+                    self.url, json={"text": fake.text()}, headers=get_headers(user.id)
+                )
+                for _ in range(3)
+            ]
+            # Buckets are per user
+            other_response = self.client.post(
+                self.url, json={"text": fake.text()}, headers=get_headers(other_user.id)
+            )
+            stats = rate_limiter.stats()["rules"][0]
+        assert [response.status_code for response in responses] == [
+            status.HTTP_201_CREATED,
+            status.HTTP_201_CREATED,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        ]
+        assert int(responses[-1].headers["Retry-After"]) > 0
+        assert other_response.status_code == status.HTTP_201_CREATED
+        assert stats["allowed"] == 3
+        assert stats["limited"] == 1
+
+    def test_fail_over_rate_limit_metrics_have_route(self) -> None:
+        user = factories.UserFactory()
+        labels = {"method": "POST", "route": self.url, "status": "429"}
+        limited = REGISTRY.get_sample_value("http_requests_total", labels) or 0
+        with mock.patch.object(rate_limiter, "rules", self.rules):
+            for _ in range(3):
+                self.client.post(
+                    self.url, json={"text": fake.text()}, headers=get_headers(user.id)
+                )
+        # Response of the middleware is labeled with the route, not "unmatched"
+        assert REGISTRY.get_sample_value("http_requests_total", labels) == limited + 1
+
+    def test_success_memory_bucket_refill(self) -> None:
+        buckets = MemoryTokenBuckets(max_keys=10)
+        rate = parse_rate("1/second")
+        assert asyncio.run(buckets.take("key", rate)) == 0
+        assert asyncio.run(buckets.take("key", rate)) > 0
+        with mock.patch("time.monotonic", return_value=10**9):
+            assert asyncio.run(buckets.take("key", rate)) == 0
+
+    def test_success_tokens_not_taken_if_other_bucket_is_empty(self) -> None:
+        buckets = MemoryTokenBuckets(max_keys=10)
+        rule_rate = parse_rate("1/minute")
+        default_rate = parse_rate("2/minute")
+        requests = [("rule", rule_rate), ("default", default_rate)]
+        assert asyncio.run(buckets.take_all(requests)) == [0, 0]
+        waits = asyncio.run(buckets.take_all(requests))
+        assert waits[0] > 0
+        assert waits[1] == 0
+        # Rejected request didn't take a token of the default bucket
+        assert asyncio.run(buckets.take("default", default_rate)) == 0
+
+    def test_fail_request_over_concurrency_limit(self) -> None:
+        rule = RateLimitRule(
+            name="export", methods=("GET",), paths=("/",), rate=None, concurrency=1
+        )
+        limiter = RateLimiter([rule], MemoryTokenBuckets(max_keys=10))
+        release = asyncio.Event()
+
+        async def slow_app(scope, receive, send) -> None:
+            await release.wait()
+            await PlainTextResponse("ok")(scope, receive, send)
+
+        async def request(middleware) -> int:
+            messages = []
+
+            async def send(message) -> None:
+                messages.append(message)
+
+            scope = {
+                "type": "http",
+                "method": "GET",
+                "path": "/",
+                "headers": [],
+                "query_string": b"",
+            }
+            await middleware(scope, None, send)
+            return messages[0]["status"]
+
+        async def run() -> list:
+            middleware = RateLimitMiddleware(slow_app, limiter)
+            first = asyncio.create_task(request(middleware))
+            await asyncio.sleep(0)
+            shed_status = await request(middleware)
+            release.set()
+            return [await first, shed_status]
+
+        assert asyncio.run(run()) == [
+            status.HTTP_200_OK,
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+        ]
+        assert limiter.shed["export"] == 1
+        assert limiter.in_flight["export"] == 0
+
+
+class RateLimitStatsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/system/rate-limits/"
+        self.headers = get_admin_headers(self)
+
+    def test_success_get_rate_limit_stats(self) -> None:
+        response = self.client.get(self.url, headers=self.headers)
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert resp_data["storage"] == "memory"
+        assert [rule["name"] for rule in resp_data["rules"]] == [
+            "auth",
+            "bulk",
+            "write",
+            "export",
+            "search",
+            "default",
+        ]
@@ -0,0 +1,89 @@
+import asyncio
+from unittest import mock
+
+from fastapi import status
+
+from db.pool import check_pool_capacity, get_workers_count
+from service.core import settings
+from tests import factories
+from tests.conftests import TestCase, test_async_engine
+from tests.utils import get_admin_headers, get_headers
+
+
+class PasswordHasherStatsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/system/password-hasher/"
+        self.headers = get_admin_headers(self)
+
+    def test_success_get_password_hasher_stats(self) -> None:
+        response = self.client.get(self.url, headers=self.headers)
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert resp_data["name"] == "password_hasher"
+        assert resp_data["queue_depth"] == 0
+        assert "rejected" in resp_data
+
+    def test_invalid_get_password_hasher_stats_without_user_token(self) -> None:
+        response = self.client.get(self.url)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_invalid_get_password_hasher_stats_not_admin(self) -> None:
+        user = factories.UserFactory()
+        response = self.client.get(self.url, headers=get_headers(user.id))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert response.json()["detail"] == "Admin access required"
+
+
+class CachesStatsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/system/caches/"
+        self.headers = get_admin_headers(self)
+
+    def test_success_get_caches_stats(self) -> None:
+        response = self.client.get(self.url, headers=self.headers)
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert [cache["name"] for cache in resp_data] == [
+            "user",
+            "post_response",
+            "comment_response",
+            "profanity",
+            "jwt",
+            "post_timeline",
+        ]
+        assert "hits" in resp_data[0]
+
+
+class DBPoolStatsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.url = "/api/v1/system/db-pool/"
+        self.headers = get_admin_headers(self)
+
+    def test_success_get_db_pool_stats(self) -> None:
+        response = self.client.get(self.url, headers=self.headers)
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert resp_data["pool"] == "InstrumentedAsyncPool"
+        assert resp_data["size"] == settings.PSQL_POOL_SIZE
+        assert "avg_wait_time" in resp_data
+
+
+class PoolCapacityTestCase(TestCase):
+    def test_success_check_pool_capacity(self) -> None:
+        with mock.patch.object(settings, "PSQL_POOL_CHECK", "error"):
+            with mock.patch.object(settings, "BACKEND_WORKERS", 1):
+                asyncio.run(check_pool_capacity(test_async_engine))
+
+    def test_invalid_check_pool_capacity_too_many_workers(self) -> None:
+        with mock.patch.object(settings, "PSQL_POOL_CHECK", "error"):
+            with mock.patch.object(settings, "BACKEND_WORKERS", 10_000):
+                with self.assertRaises(RuntimeError):
+                    asyncio.run(check_pool_capacity(test_async_engine))
+
+    def test_success_get_workers_count_limited_by_connections(self) -> None:
+        with mock.patch.object(settings, "BACKEND_WORKERS", 8):
+            with mock.patch.object(settings, "PSQL_POOL_SIZE", 5):
+                with mock.patch.object(settings, "PSQL_POOL_MAX_OVERFLOW", 5):
+                    assert get_workers_count(None) == 8
+                    assert get_workers_count(35) == 3
+                    assert get_workers_count(5) == 1
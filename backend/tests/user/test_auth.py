@@ -2,7 +2,7 @@ import random
 
 from fastapi import status
 
-from service.core.security import hash_password
+from service.core.security import hash_password, password_hasher
 from tests import factories
 from tests.conftests import TestCase
 from tests.factories.utils import fake
@@ -45,6 +45,23 @@ class LoginTestCase(TestCase):
         assert response.status_code == status.HTTP_403_FORBIDDEN
         assert resp_data["detail"] == "Invalid credentials"
 
+    def test_fail_login_with_saturated_password_hasher(self) -> None:
+        factories.UserFactory(
+            email=self.data["email"], password=hash_password(self.data["password"])
+        )
+        # Emulate full hasher queue
+        password_hasher.in_flight = password_hasher.capacity
+        try:
+            response = self.client.post(self.url, data=self.data)
+        finally:
+            password_hasher.in_flight = 0
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers["Retry-After"] == "1"
+        assert resp_data["detail"] == (
+            "Too many authentication requests, try again later"
+        )
+
 
 class RefreshTokenTestCase(TestCase):
     def setUp(self) -> None:
@@ -0,0 +1,69 @@
+import time
+from datetime import datetime, timedelta
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from jose import jwt
+
+from service.core.security import JWTCodec
+from tests.conftests import TestCase
+
+
+def get_ec_keys() -> tuple[str, str]:
+    """Generate PEM keys for ES256"""
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem.decode(), public_pem.decode()
+
+
+def get_claims(minutes: int = 5) -> dict:
+    return {
+        "pk": "1",
+        "type": "access",
+        "exp": datetime.utcnow() + timedelta(minutes=minutes),
+    }
+
+
+class JWTCodecTestCase(TestCase):
+    def test_success_decode_cached_token(self) -> None:
+        codec = JWTCodec(algorithm="HS256", secret_key="secret")
+        token = codec.encode(get_claims())
+        payload = codec.decode(token)
+        assert codec.decode(token) is payload
+        assert payload.pk == "1"
+        assert codec.cache.hits == 1
+
+    def test_success_cached_token_expires_with_token(self) -> None:
+        codec = JWTCodec(algorithm="HS256", secret_key="secret", cache_ttl=300)
+        codec.decode(codec.encode(get_claims(minutes=1)))
+        expires_at, _ = next(iter(codec.cache._data.values()))
+        assert expires_at - time.monotonic() <= 60
+
+    def test_invalid_decode_expired_token(self) -> None:
+        codec = JWTCodec(algorithm="HS256", secret_key="secret")
+        with self.assertRaises(jwt.JWTError):
+            codec.decode(codec.encode(get_claims(minutes=-1)))
+        assert len(codec.cache) == 0
+
+    def test_invalid_decode_token_with_another_secret(self) -> None:
+        token = JWTCodec(algorithm="HS256", secret_key="another").encode(get_claims())
+        with self.assertRaises(jwt.JWTError):
+            JWTCodec(algorithm="HS256", secret_key="secret").decode(token)
+
+    def test_success_verify_es256_token_with_public_key(self) -> None:
+        private_key, public_key = get_ec_keys()
+        issuer = JWTCodec(
+            algorithm="ES256", private_key=private_key, public_key=public_key
+        )
+        verifier = JWTCodec(algorithm="ES256", public_key=public_key)
+        payload = verifier.decode(issuer.encode(get_claims()))
+        assert payload.pk == "1"
+        with self.assertRaises(RuntimeError):
+            verifier.encode(get_claims())
@@ -1,7 +1,11 @@
+import asyncio
+from unittest import mock
+
 from fastapi import status
 
+from service.core.cache import TieredCache, user_cache
 from tests import factories
-from tests.conftests import TestCase
+from tests.conftests import TestCase, TestSession
 from tests.utils import get_headers
 
 
@@ -16,9 +20,71 @@ class UserMeTestCase(TestCase):
         assert response.status_code == status.HTTP_200_OK
         assert resp_data["id"] == user.id
 
+    def test_success_get_user_me_from_cache(self) -> None:
+        user = factories.UserFactory()
+        self.client.get(self.url, headers=get_headers(user.id))
+        hits = user_cache.stats()["hits"]
+        response = self.client.get(self.url, headers=get_headers(user.id))
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert resp_data["id"] == user.id
+        assert resp_data["email"] == user.email
+        assert user_cache.stats()["hits"] == hits + 1
+
+    def test_success_invalidate_cached_user_after_commit(self) -> None:
+        user = factories.UserFactory()
+        self.client.get(self.url, headers=get_headers(user.id))
+        user.name = "New name"
+        TestSession.flush()
+        # Row can be cached again until the change is committed
+        assert user_cache.local.peek(user.id) is not None
+        TestSession.commit()
+        assert user_cache.local.peek(user.id) is None
+        response = self.client.get(self.url, headers=get_headers(user.id))
+        assert response.json()["name"] == "New name"
+
+    def test_success_discard_keeps_redis_delete_tasks(self) -> None:
+        cache = TieredCache(name="test", maxsize=10, ttl=60)
+        cache.remote = mock.AsyncMock()
+
+        async def discard() -> int:
+            cache.discard("key")
+            pending = len(cache.tasks)
+            await asyncio.gather(*cache.tasks)
+            return pending
+
+        assert asyncio.run(discard()) == 1
+        cache.remote.delete.assert_awaited_once_with("key")
+        assert not cache.tasks
+
     def test_fail_get_user_me_without_authorization(self) -> None:
         factories.UserFactory()
         response = self.client.get(self.url)
         resp_data = response.json()
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
         assert resp_data["detail"] == "Not authenticated"
+
+
+class UserPostsTestCase(TestCase):
+    def test_success_get_user_posts(self) -> None:
+        user_1 = factories.UserFactory()
+        user_2 = factories.UserFactory()
+        posts = [factories.PostFactory(user_id=user_1.id) for _ in range(3)]
+        factories.PostFactory(user_id=user_1.id, is_blocked=True)
+        factories.PostFactory(user_id=user_2.id)
+        response = self.client.get(
+            f"/api/v1/user/{user_1.id}/posts?size=2", headers=get_headers(user_2.id)
+        )
+        resp_data = response.json()
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["id"] for item in resp_data["items"]] == [
+            posts[2].id,
+            posts[1].id,
+        ]
+        response = self.client.get(
+            f"/api/v1/user/{user_1.id}/posts?size=2&cursor={resp_data['next_cursor']}",
+            headers=get_headers(user_2.id),
+        )
+        resp_data = response.json()
+        assert [item["id"] for item in resp_data["items"]] == [posts[0].id]
+        assert resp_data["next_cursor"] is None
@@ -1,5 +1,9 @@
+from unittest import TestCase, mock
+
 from db import constants
+from service.core import settings
 from service.core.security import create_jwt_token
+from tests import factories
 
 
 def get_headers(user_id: int) -> dict[str, str]:
@@ -12,3 +16,10 @@ def get_refresh_headers(user_id: int) -> dict[str, str]:
     """Create and return headers for refresh token tests"""
     refresh_token = create_jwt_token(user_id, jwt_type=constants.JWTType.REFRESH)
     return {"Authorization": f"Bearer {refresh_token}"}
+
+
+def get_admin_headers(test_case: TestCase) -> dict[str, str]:
+    """Create admin user of the test and return its headers"""
+    admin = factories.UserFactory()
+    test_case.enterContext(mock.patch.object(settings, "ADMIN_EMAILS", [admin.email]))
+    return get_headers(admin.id)